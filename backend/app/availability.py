@@ -0,0 +1,143 @@
+"""Bucketed slot availability computed from bookings.
+
+Occupancy per time bucket is found with a single difference-array sweep over
+the bookings overlapping a window: each booking adds +1 at its first bucket
+and -1 after its last, and a running sum gives the number of concurrent
+bookings per bucket.
+"""
+import json
+import math
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, Any, List, Iterable
+from zoneinfo import ZoneInfo
+
+from app.config import LOCAL_TIMEZONE
+from app.database import get_bookings_in_window
+from app.redis_client import get_version, bump_version
+
+BUCKET_MINUTES = 15
+BOOKING_VERSION_KEY = "bookings:version:{parking_id}"
+CALENDAR_CACHE_KEY = "availability:calendar:{parking_id}:{date}:v{version}"
+CALENDAR_CACHE_TTL = 24 * 60 * 60
+
+
+def parse_booking_time(value: str) -> datetime:
+    """Parse a booking timestamp, treating naive values as UTC."""
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def occupancy_buckets(bookings: Iterable[Dict[str, Any]], window_start: datetime, n_buckets: int,
+                      bucket_minutes: int = BUCKET_MINUTES) -> List[int]:
+    """Count concurrent bookings in each bucket of the window starting at window_start.
+
+    A booking occupies every bucket it overlaps, even partially.
+    """
+    bucket_seconds = bucket_minutes * 60
+    diff = [0] * (n_buckets + 1)
+    for booking in bookings:
+        start = (parse_booking_time(booking["start_time"]) - window_start).total_seconds()
+        end = (parse_booking_time(booking["end_time"]) - window_start).total_seconds()
+        first = max(0, math.floor(start / bucket_seconds))
+        last = min(n_buckets, math.ceil(end / bucket_seconds))
+        if first >= last:
+            continue
+        diff[first] += 1
+        diff[last] -= 1
+
+    counts = []
+    running = 0
+    for delta in diff[:n_buckets]:
+        running += delta
+        counts.append(running)
+    return counts
+
+
+async def invalidate_parking_availability(redis_client, parking_id: int) -> int:
+    """Bump the booking version so cached availability for the parking is ignored."""
+    return await bump_version(redis_client, BOOKING_VERSION_KEY.format(parking_id=parking_id))
+
+
+async def get_availability_calendar(redis_client, parking: Dict[str, Any], day: date) -> Dict[str, Any]:
+    """Free slot counts per 15-minute bucket of a local calendar day.
+
+    Results are cached under the parking's booking version, so a cached
+    calendar stays valid until the next booking change for that parking.
+    """
+    parking_id = parking["id"]
+    version = await get_version(redis_client, BOOKING_VERSION_KEY.format(parking_id=parking_id))
+    cache_key = CALENDAR_CACHE_KEY.format(parking_id=parking_id, date=day.isoformat(), version=version)
+    cached = await redis_client.get(cache_key)
+    if cached:
+        return json.loads(cached)
+
+    tz = ZoneInfo(LOCAL_TIMEZONE)
+    day_start = datetime.combine(day, time.min, tzinfo=tz).astimezone(timezone.utc)
+    day_end = datetime.combine(day + timedelta(days=1), time.min, tzinfo=tz).astimezone(timezone.utc)
+    # DST transitions make some days shorter or longer than 96 buckets
+    n_buckets = int((day_end - day_start).total_seconds() // (BUCKET_MINUTES * 60))
+
+    bookings = await get_bookings_in_window([parking_id], day_start, day_end)
+    occupied = occupancy_buckets(bookings, day_start, n_buckets)
+    slots = parking.get("slots", 0)
+
+    calendar = {
+        "parking_id": parking_id,
+        "date": day.isoformat(),
+        "timezone": LOCAL_TIMEZONE,
+        "bucket_minutes": BUCKET_MINUTES,
+        "slots": slots,
+        "version": version,
+        "buckets": [
+            {
+                "start": (day_start + timedelta(minutes=i * BUCKET_MINUTES)).astimezone(tz).isoformat(),
+                "free": max(slots - count, 0),
+            }
+            for i, count in enumerate(occupied)
+        ],
+    }
+    await redis_client.set(cache_key, json.dumps(calendar), ex=CALENDAR_CACHE_TTL)
+    return calendar
+
+
+def peak_occupancy(bookings: Iterable[Dict[str, Any]], start: datetime, end: datetime) -> int:
+    """Maximum number of bookings active at the same instant within [start, end).
+
+    Sweeps the sorted start/end events once; an end and a start at the same
+    instant do not overlap, so ends are applied first.
+    """
+    events = []
+    for booking in bookings:
+        b_start = max(parse_booking_time(booking["start_time"]), start)
+        b_end = min(parse_booking_time(booking["end_time"]), end)
+        if b_start < b_end:
+            events.append((b_start, 1))
+            events.append((b_end, -1))
+    events.sort(key=lambda event: (event[0], event[1]))
+
+    peak = running = 0
+    for _, delta in events:
+        running += delta
+        peak = max(peak, running)
+    return peak
+
+
+async def free_slots_in_window(parkings: List[Dict[str, Any]], start: datetime, end: datetime,
+                               chunk_size: int = 200) -> Dict[int, int]:
+    """Free slots over the whole window for each parking, keyed by parking id.
+
+    Bookings for all candidates are fetched in one query per chunk of ids
+    rather than one overlap query per parking.
+    """
+    ids = [p["id"] for p in parkings]
+    by_parking: Dict[int, List[Dict[str, Any]]] = {pid: [] for pid in ids}
+    for i in range(0, len(ids), chunk_size):
+        for booking in await get_bookings_in_window(ids[i:i + chunk_size], start, end):
+            by_parking[booking["parking_id"]].append(booking)
+
+    return {
+        p["id"]: max(p.get("slots", 0) - peak_occupancy(by_parking[p["id"]], start, end), 0)
+        for p in parkings
+    }
@@ -0,0 +1,165 @@
+"""Timer-driven booking expiry.
+
+Every outstanding booking is scheduled in a Redis sorted set scored by its
+end time. The expiry engine pops due entries in batches, marks the bookings
+COMPLETED and gives their slots back to each parking's available counter, so
+availability stays correct without recounting the bookings table.
+
+Slots owed by completed bookings are recorded per parking in a Redis hash
+before they are given back, and stay there until the counter update
+succeeds, so a failed update is retried on the next tick instead of lost.
+
+Bookings made before the engine existed never took a slot off the counter,
+yet the engine gives one back when they expire. On its first start the
+engine therefore recounts available (slots minus outstanding bookings) once
+for every parking with outstanding bookings, and records that in
+BACKFILL_KEY.
+"""
+import asyncio
+import time
+from collections import Counter
+from typing import Dict, Any, List, Tuple
+
+from app.availability import parse_booking_time, invalidate_parking_availability
+from app.config import BOOKING_EXPIRY_INTERVAL, BOOKING_EXPIRY_BATCH
+from app.database import complete_bookings, adjust_available, get_outstanding_bookings, recount_available
+
+EXPIRY_KEY = "bookings:expiry"
+# parking_id -> slots owed back to its available counter
+OWED_KEY = "bookings:expiry:owed"
+# Set once available has been recounted for bookings that predate the engine
+BACKFILL_KEY = "bookings:expiry:backfilled"
+
+# Atomically take up to ARGV[2] entries due at ARGV[1], so several workers can
+# run the engine without completing the same booking twice.
+_POP_DUE = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'WITHSCORES', 'LIMIT', 0, ARGV[2])
+for i = 1, #due, 2 do
+    redis.call('ZREM', KEYS[1], due[i])
+end
+return due
+"""
+
+
+# Atomically take what is owed to parking ARGV[1], so only one worker applies it
+_TAKE_OWED = """
+local owed = redis.call('HGET', KEYS[1], ARGV[1])
+if owed then
+    redis.call('HDEL', KEYS[1], ARGV[1])
+end
+return owed
+"""
+
+
+def _member(booking: Dict[str, Any]) -> str:
+    return f"{booking['id']}:{booking['parking_id']}"
+
+
+async def schedule_booking_expiry(redis_client, booking: Dict[str, Any]):
+    """Schedule (or reschedule, after an end time change) a booking's expiry."""
+    end_time = parse_booking_time(booking["end_time"]).timestamp()
+    await redis_client.zadd(EXPIRY_KEY, {_member(booking): end_time})
+
+
+async def unschedule_booking_expiry(redis_client, booking: Dict[str, Any]):
+    await redis_client.zrem(EXPIRY_KEY, _member(booking))
+
+
+class BookingExpiryEngine:
+    def __init__(self, redis_client, interval: float = BOOKING_EXPIRY_INTERVAL, batch_size: int = BOOKING_EXPIRY_BATCH):
+        self.redis = redis_client
+        self.interval = interval
+        self.batch_size = batch_size
+
+    async def run(self):
+        await self._seed_schedule()
+        while True:
+            try:
+                # Keep draining while full batches come back
+                while await self.expire_due() == self.batch_size:
+                    pass
+                await self.release_owed()
+            except Exception as e:
+                print(f"Booking expiry error: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    async def _seed_schedule(self):
+        """Schedule bookings created before the engine existed (ZADD is idempotent)."""
+        try:
+            bookings = await get_outstanding_bookings()
+            if bookings:
+                mapping = {_member(b): parse_booking_time(b["end_time"]).timestamp() for b in bookings}
+                await self.redis.zadd(EXPIRY_KEY, mapping)
+            print(f"Booking expiry scheduled {len(bookings)} outstanding bookings")
+            if not await self.redis.exists(BACKFILL_KEY):
+                await self._backfill_available(bookings)
+        except Exception as e:
+            print(f"Failed to seed booking expiry schedule: {str(e)}")
+
+    async def _backfill_available(self, bookings: List[Dict[str, Any]]):
+        """Recount available once, so pre-engine bookings are subtracted before they expire.
+
+        A recount is idempotent, so workers racing here on first start agree.
+        """
+        outstanding = Counter(booking["parking_id"] for booking in bookings)
+        failed = 0
+        for parking_id, count in outstanding.items():
+            if await recount_available(parking_id, count) is None:
+                failed += 1
+            else:
+                await invalidate_parking_availability(self.redis, parking_id)
+        if failed:
+            # Retried on the next start
+            print(f"Availability backfill left {failed} parkings unchanged")
+            return
+        await self.redis.set(BACKFILL_KEY, int(time.time()))
+        print(f"Availability backfilled for {len(outstanding)} parkings")
+
+    async def _pop_due(self) -> List[Tuple[str, float]]:
+        raw = await self.redis.eval(_POP_DUE, 1, EXPIRY_KEY, time.time(), self.batch_size)
+        return [(raw[i].decode(), float(raw[i + 1])) for i in range(0, len(raw), 2)]
+
+    async def expire_due(self) -> int:
+        """Complete one batch of due bookings; returns how many entries were popped."""
+        due = await self._pop_due()
+        if not due:
+            return 0
+
+        booking_ids = [int(member.split(":")[0]) for member, _ in due]
+        try:
+            completed = await complete_bookings(booking_ids)
+        except Exception:
+            # Put the batch back so the next tick retries it
+            await self.redis.zadd(EXPIRY_KEY, dict(due))
+            raise
+
+        # Only bookings that actually transitioned free a slot; cancelled or
+        # already completed ones were filtered out by the status condition.
+        released = Counter(booking["parking_id"] for booking in completed)
+        for parking_id, count in released.items():
+            await self.redis.hincrby(OWED_KEY, parking_id, count)
+        for parking_id in released:
+            await self._release(parking_id)
+        return len(due)
+
+    async def release_owed(self):
+        """Retry every release still owed, e.g. after a failed counter update."""
+        for parking_id in await self.redis.hkeys(OWED_KEY):
+            await self._release(int(parking_id))
+
+    async def _release(self, parking_id: int):
+        owed = await self.redis.eval(_TAKE_OWED, 1, OWED_KEY, parking_id)
+        if not owed or int(owed) <= 0:
+            return
+        try:
+            await adjust_available(parking_id, int(owed), strict=True)
+        except Exception as e:
+            # Owed again; the next tick retries it
+            await self.redis.hincrby(OWED_KEY, parking_id, int(owed))
+            print(f"Failed to release {int(owed)} slots of parking {parking_id}: {str(e)}")
+            return
+        try:
+            await invalidate_parking_availability(self.redis, parking_id)
+        except Exception as e:
+            # The slots are back; the cached availability just expires later
+            print(f"Failed to invalidate availability of parking {parking_id}: {str(e)}")
@@ -0,0 +1,202 @@
+"""Sequenced booking admission.
+
+In sequenced mode a booking request is appended to a Redis stream instead of
+contending for the booking lock. Parkings are hashed onto a fixed number of
+shard streams and each shard is consumed by exactly one sequencer at a time
+(whichever backend worker holds the shard lease), so requests for the same
+parking are admitted or rejected strictly in arrival order. The caller waits
+on a per-request result list with a deadline.
+
+Each request is claimed by request_id before it is admitted, so an entry
+read twice (by a holder that lost its lease mid-batch and the new holder
+re-reading the pending entries) is booked at most once. A booking admitted
+after the caller stopped waiting is cancelled again rather than left behind.
+"""
+import asyncio
+import json
+import math
+import time
+import uuid
+from typing import Dict, Any, Optional
+
+from redis.exceptions import ResponseError
+
+from app.config import BOOKING_SEQUENCER_SHARDS, BOOKING_SEQUENCER_TIMEOUT
+from app.database import admit_booking, delete_booking, get_parking_by_id
+from app.models import BookingCreate
+from app.redis_client import acquire_lock
+
+STREAM_KEY = "booking:queue:{shard}"
+RESULT_KEY = "booking:result:{request_id}"
+CLAIM_KEY = "booking:claim:{request_id}"
+LEASE_KEY = "lock:booking-sequencer:{shard}"
+GROUP = "booking-sequencer"
+
+LEASE_TTL = 15
+BATCH_SIZE = 100
+BLOCK_MS = 1000
+RESULT_TTL = 60
+# Requests this close to their deadline are not admitted, so the result
+# still reaches the caller before it gives up
+DEADLINE_MARGIN_SECONDS = 1.0
+
+# Extend the lease only if we still own it
+_RENEW_LEASE = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+def shard_for(parking_id: int) -> int:
+    return parking_id % BOOKING_SEQUENCER_SHARDS
+
+
+async def submit_booking(redis_client, create_data: BookingCreate, user_id: str,
+                         timeout: float = BOOKING_SEQUENCER_TIMEOUT) -> Dict[str, Any]:
+    """Queue a booking request and wait for the sequencer's decision.
+
+    Raises ValueError when the booking is rejected and TimeoutError when no
+    decision arrives before the deadline. Requests whose deadline has passed
+    are dropped by the sequencer without being booked.
+    """
+    request_id = uuid.uuid4().hex
+    payload = {
+        "request_id": request_id,
+        "user_id": user_id,
+        "deadline": time.time() + timeout,
+        "booking": create_data.model_dump(mode="json"),
+    }
+    stream = STREAM_KEY.format(shard=shard_for(create_data.parkingId))
+    await redis_client.xadd(stream, {"payload": json.dumps(payload)})
+
+    reply = await redis_client.blpop([RESULT_KEY.format(request_id=request_id)], timeout=max(1, math.ceil(timeout)))
+    if reply is None:
+        raise TimeoutError("Booking request timed out")
+
+    result = json.loads(reply[1])
+    if result["status"] == "ok":
+        return result["booking"]
+    raise ValueError(result["detail"])
+
+
+class BookingSequencer:
+    """Consumes the shard streams whose lease this worker holds."""
+
+    def __init__(self, redis_client):
+        self.redis = redis_client
+        self._leases: Dict[int, str] = {}
+        self._tasks: Dict[int, asyncio.Task] = {}
+
+    async def run(self):
+        """Claim free shard leases forever, starting a consumer for each one won."""
+        while True:
+            for shard in range(BOOKING_SEQUENCER_SHARDS):
+                task = self._tasks.get(shard)
+                if task is not None and not task.done():
+                    continue
+                lease_id = await acquire_lock(self.redis, LEASE_KEY.format(shard=shard), ttl=LEASE_TTL)
+                if lease_id:
+                    self._leases[shard] = lease_id
+                    self._tasks[shard] = asyncio.create_task(self._consume(shard))
+            await asyncio.sleep(LEASE_TTL / 3)
+
+    async def _renew_lease(self, shard: int) -> bool:
+        renewed = await self.redis.eval(_RENEW_LEASE, 1, LEASE_KEY.format(shard=shard), self._leases[shard], LEASE_TTL)
+        return bool(renewed)
+
+    async def _consume(self, shard: int):
+        stream = STREAM_KEY.format(shard=shard)
+        # The consumer name is per shard, not per worker, so a new lease holder
+        # picks up entries a crashed holder read but never acknowledged.
+        consumer = f"shard-{shard}"
+        try:
+            await self.redis.xgroup_create(stream, GROUP, id="0", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+        cursor = "0"
+        while await self._renew_lease(shard):
+            try:
+                response = await self.redis.xreadgroup(GROUP, consumer, {stream: cursor}, count=BATCH_SIZE, block=BLOCK_MS)
+                entries = response[0][1] if response else []
+                if not entries and cursor == "0":
+                    # Pending backlog drained, switch to new entries
+                    cursor = ">"
+                    continue
+                for entry_id, fields in entries:
+                    # A batch can outlast LEASE_TTL; stop as soon as another
+                    # worker may have taken the shard over
+                    if not await self._renew_lease(shard):
+                        break
+                    await self._process(fields)
+                    await self.redis.xack(stream, GROUP, entry_id)
+                    await self.redis.xdel(stream, entry_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Booking sequencer error on shard {shard}: {str(e)}")
+                await asyncio.sleep(1)
+        print(f"Booking sequencer lost lease for shard {shard}")
+
+    async def _process(self, fields: Dict[bytes, bytes]):
+        """Decide one entry and push its result.
+
+        Malformed entries never raise: an entry that always fails would be
+        read again on every pass and stall the shard. They get a "rejected"
+        result, or are dropped when they have no request_id to answer.
+        """
+        try:
+            payload = json.loads(fields[b"payload"])
+            request_id = payload["request_id"]
+        except (KeyError, ValueError, TypeError):
+            print("Booking sequencer dropped an entry without a readable request_id")
+            return
+        try:
+            deadline = float(payload["deadline"])
+            create_data = BookingCreate(**payload["booking"])
+            user_id = payload["user_id"]
+        except (KeyError, ValueError, TypeError) as e:
+            # pydantic's ValidationError is a ValueError
+            print(f"Booking sequencer rejected malformed request {request_id}: {str(e)}")
+            result = {"status": "rejected", "detail": "Malformed booking request"}
+        else:
+            claim_ttl = max(RESULT_TTL, math.ceil(deadline - time.time()) + 1)
+            claimed = await self.redis.set(CLAIM_KEY.format(request_id=request_id), 1, nx=True, ex=claim_ttl)
+            if not claimed:
+                # Already decided (or being decided) by a previous lease holder
+                print(f"Booking sequencer skipped already claimed request {request_id}")
+                return
+            result = await self._decide(create_data, user_id, deadline)
+        result_key = RESULT_KEY.format(request_id=request_id)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.rpush(result_key, json.dumps(result, default=str))
+            pipe.expire(result_key, RESULT_TTL)
+            await pipe.execute()
+
+    async def _decide(self, create_data: BookingCreate, user_id: str, deadline: float) -> Dict[str, Any]:
+        if time.time() > deadline - DEADLINE_MARGIN_SECONDS:
+            # The caller has given up (or will before the result arrives);
+            # booking now would leave an orphaned reservation nobody was told about.
+            return {"status": "expired", "detail": "Booking request expired"}
+
+        parking: Optional[Dict[str, Any]] = await get_parking_by_id(create_data.parkingId)
+        if not parking:
+            return {"status": "rejected", "detail": "Parking not found"}
+        try:
+            booking = await admit_booking(create_data, user_id, parking)
+        except ValueError as e:
+            return {"status": "rejected", "detail": str(e)}
+        except Exception as e:
+            print(f"Booking sequencer failed to admit booking: {str(e)}")
+            return {"status": "rejected", "detail": "Failed to create booking"}
+        if time.time() > deadline:
+            # Admitted too late for the caller to hear about it: give the slot back
+            try:
+                await delete_booking(booking["id"], user_id)
+            except Exception as e:
+                print(f"Booking sequencer failed to cancel late booking {booking['id']}: {str(e)}")
+            return {"status": "expired", "detail": "Booking request expired"}
+        return {"status": "ok", "booking": booking}
@@ -0,0 +1,144 @@
+"""Server-side clustering of listings for low-zoom map views.
+
+Listings are bucketed into a hierarchical grid aligned with Web Mercator
+tiles: at zoom z every tile is split into 2^CLUSTER_GRID_BITS x
+2^CLUSTER_GRID_BITS cells, and each cell's aggregate is the merge of its four
+children one level down. The index is built once per listing version and each
+tile's clusters are cached in Redis per zoom and tile.
+"""
+import asyncio
+import hashlib
+import json
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+from app.config import CLUSTER_MAX_ZOOM, CLUSTER_CACHE_TTL
+from app.database import get_all_parkings
+from app.geo import lnglat_to_tile_fraction, tile_count, tiles_in_bbox, in_bbox
+from app.redis_client import get_version, bump_version
+
+CLUSTER_GRID_BITS = 2
+MAX_TILES_PER_REQUEST = 64
+PARKINGS_VERSION_KEY = "parkings:version"
+CLUSTER_CACHE_KEY = "clusters:v{version}:{zoom}:{x}:{y}"
+
+
+def parking_point(parking: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Flatten a parkings row into the listing shape used by the map endpoints."""
+    coordinates = (parking.get("geom") or {}).get("coordinates") or parking.get("location")
+    if not coordinates or len(coordinates) < 2:
+        return None
+    return {
+        "id": parking["id"],
+        "name": parking.get("name", ""),
+        "location": [float(coordinates[0]), float(coordinates[1])],
+        "price_per_hour": float(parking.get("price_per_hour") or 0),
+        "slots": parking.get("slots", 0),
+        "available": parking.get("available", 0),
+        "amenities": parking.get("amenities") or [],
+        "rating": parking.get("rating") or 0,
+    }
+
+
+class ParkingGridIndex:
+    def __init__(self, parkings: List[Dict[str, Any]], version: int):
+        self.version = version
+        self.built_at = time.time()
+        self.points = [p for p in (parking_point(row) for row in parkings) if p is not None]
+        # Content digest, identical on every worker that indexed the same rows
+        self.digest = hashlib.blake2b(json.dumps(self.points, sort_keys=True).encode(), digest_size=8).hexdigest()
+
+        # cells[level][(cx, cy)] = [count, min_price, total_available, sum_lng, sum_lat]
+        finest = CLUSTER_MAX_ZOOM - 1 + CLUSTER_GRID_BITS
+        self.cells: Dict[int, Dict[Tuple[int, int], List[float]]] = {finest: {}}
+        for point in self.points:
+            lng, lat = point["location"]
+            fx, fy = lnglat_to_tile_fraction(lng, lat, finest)
+            self._merge(self.cells[finest], (int(fx), int(fy)),
+                        [1, point["price_per_hour"], point["available"], lng, lat])
+
+        for level in range(finest - 1, CLUSTER_GRID_BITS - 1, -1):
+            parents: Dict[Tuple[int, int], List[float]] = {}
+            for (cx, cy), agg in self.cells[level + 1].items():
+                self._merge(parents, (cx >> 1, cy >> 1), agg)
+            self.cells[level] = parents
+
+    @staticmethod
+    def _merge(cells: Dict[Tuple[int, int], List[float]], key: Tuple[int, int], agg: List[float]):
+        current = cells.get(key)
+        if current is None:
+            cells[key] = list(agg)
+            return
+        current[0] += agg[0]
+        current[1] = min(current[1], agg[1])
+        current[2] += agg[2]
+        current[3] += agg[3]
+        current[4] += agg[4]
+
+    def tile_clusters(self, zoom: int, x: int, y: int) -> List[Dict[str, Any]]:
+        cells = self.cells[zoom + CLUSTER_GRID_BITS]
+        side = 1 << CLUSTER_GRID_BITS
+        clusters = []
+        for cx in range(x * side, (x + 1) * side):
+            for cy in range(y * side, (y + 1) * side):
+                agg = cells.get((cx, cy))
+                if agg is None:
+                    continue
+                count = int(agg[0])
+                clusters.append({
+                    "lng": agg[3] / count,
+                    "lat": agg[4] / count,
+                    "count": count,
+                    "min_price": agg[1],
+                    "total_available": int(agg[2]),
+                })
+        return clusters
+
+    def listings_in_bbox(self, bbox: List[float]) -> List[Dict[str, Any]]:
+        return [p for p in self.points if in_bbox(p["location"][0], p["location"][1], bbox)]
+
+
+_index: Optional[ParkingGridIndex] = None
+_index_lock = asyncio.Lock()
+
+
+async def invalidate_parking_index(redis_client) -> int:
+    """Bump the listing version so cluster indexes and tiles are rebuilt."""
+    return await bump_version(redis_client, PARKINGS_VERSION_KEY)
+
+
+async def get_parking_index(redis_client) -> ParkingGridIndex:
+    """Current grid index, rebuilt when listings change or it is older than the cache TTL."""
+    global _index
+    version = await get_version(redis_client, PARKINGS_VERSION_KEY)
+    async with _index_lock:
+        if _index is None or _index.version != version or time.time() - _index.built_at > CLUSTER_CACHE_TTL:
+            _index = ParkingGridIndex(await get_all_parkings(), version)
+        return _index
+
+
+async def get_clusters(redis_client, bbox: List[float], zoom: int) -> Dict[str, Any]:
+    index = await get_parking_index(redis_client)
+    if zoom >= CLUSTER_MAX_ZOOM:
+        listings = index.listings_in_bbox(bbox)
+        return {"zoom": zoom, "mode": "listings", "count": len(listings), "parkings": listings}
+
+    # Checked from the corner tiles, before a huge bbox builds millions of tuples
+    if tile_count(bbox, zoom) > MAX_TILES_PER_REQUEST:
+        raise ValueError("Bounding box too large for this zoom level")
+    tiles = tiles_in_bbox(bbox, zoom)
+
+    keys = [CLUSTER_CACHE_KEY.format(version=index.version, zoom=zoom, x=x, y=y) for x, y in tiles]
+    cached = await redis_client.mget(keys)
+    clusters = []
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for (x, y), key, hit in zip(tiles, keys, cached):
+            if hit is not None:
+                tile = json.loads(hit)
+            else:
+                tile = index.tile_clusters(zoom, x, y)
+                pipe.set(key, json.dumps(tile), ex=CLUSTER_CACHE_TTL)
+            clusters.extend(c for c in tile if in_bbox(c["lng"], c["lat"], bbox))
+        await pipe.execute()
+
+    return {"zoom": zoom, "mode": "clusters", "count": len(clusters), "clusters": clusters}
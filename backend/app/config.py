@@ -14,4 +14,28 @@ COLLECTOR_SERVICE_URL = os.getenv("COLLECTOR_SERVICE_URL", "http://127.0.0.1:808
 ML_SERVICE_URL = os.getenv("ML_SERVICE_URL", "http://127.0.0.1:8000")
 
 # Secret shared with ML service for price callbacks. Set in env as ML_CALLBACK_SECRET.
-ML_CALLBACK_SECRET = os.getenv("ML_CALLBACK_SECRET")
\ No newline at end of file
+ML_CALLBACK_SECRET = os.getenv("ML_CALLBACK_SECRET")
+
+# Opt-in sequenced booking mode. When enabled, POST /bookings/ appends the
+# request to a per-shard Redis stream and waits for the booking sequencer to
+# admit or reject it instead of contending on the booking lock.
+BOOKING_SEQUENCER_ENABLED = os.getenv("BOOKING_SEQUENCER_ENABLED", "false").lower() in ("1", "true", "yes")
+BOOKING_SEQUENCER_SHARDS = int(os.getenv("BOOKING_SEQUENCER_SHARDS", "16"))
+# Seconds a caller waits for the sequencer's decision before giving up
+BOOKING_SEQUENCER_TIMEOUT = float(os.getenv("BOOKING_SEQUENCER_TIMEOUT", "10"))
+
+# Timezone used to interpret calendar dates for availability queries (Pune)
+LOCAL_TIMEZONE = os.getenv("LOCAL_TIMEZONE", "Asia/Kolkata")
+
+# Booking expiry engine: how often due bookings are popped and how many at once
+BOOKING_EXPIRY_INTERVAL = float(os.getenv("BOOKING_EXPIRY_INTERVAL", "5"))
+BOOKING_EXPIRY_BATCH = int(os.getenv("BOOKING_EXPIRY_BATCH", "100"))
+
+# Map clustering: below this zoom /parkings/clusters returns aggregated
+# clusters, at or above it the individual listings
+CLUSTER_MAX_ZOOM = int(os.getenv("CLUSTER_MAX_ZOOM", "15"))
+# Seconds a built cluster index / cached cluster tile may lag availability changes
+CLUSTER_CACHE_TTL = int(os.getenv("CLUSTER_CACHE_TTL", "60"))
+
+# Seconds between refreshes of the ML free-parking hotspots served as map tiles
+HOTSPOT_REFRESH_SECONDS = int(os.getenv("HOTSPOT_REFRESH_SECONDS", "300"))
@@ -2,7 +2,7 @@ from supabase import create_client, Client
 from app.config import SUPABASE_URL, SUPABASE_ANON_KEY, SUPABASE_SERVICE_ROLE_KEY
 from app.models import ParkingCreate, BookingCreate
 from typing import List, Dict, Any, Optional
-from datetime import datetime
+from datetime import datetime, timezone
 import json
 import random
 from app.redis_client import acquire_lock, release_lock, acquire_lock_with_retry
@@ -60,6 +60,22 @@ async def get_parkings_near(query: Dict[str, Any]) -> List[Dict[str, Any]]:
     }).execute()
     return response.data or []
 
+async def get_all_parkings(page_size: int = 1000) -> List[Dict[str, Any]]:
+    """Every listing with the fields the map endpoints need, read in pages."""
+    parkings = []
+    offset = 0
+    while True:
+        response = client.table("parkings")\
+            .select("id,name,geom,price_per_hour,slots,available,amenities,rating")\
+            .order("id")\
+            .range(offset, offset + page_size - 1)\
+            .execute()
+        rows = response.data or []
+        parkings.extend(rows)
+        if len(rows) < page_size:
+            return parkings
+        offset += page_size
+
 async def get_parking_by_id(parking_id: int) -> Optional[Dict[str, Any]]:
     response = client.table("parkings").select("*").eq("id", parking_id).execute()
     return response.data[0] if response.data else None
@@ -87,13 +103,88 @@ async def update_availability(parking_id: int, available: int, operator_id: str)
 
 # Helper for count
 async def count_confirmed_bookings(parking_id: int) -> int:
+    # Counts outstanding (CONFIRMED/ACTIVE) bookings; expired ones are COMPLETED
     response = client.rpc("count_overlapping_bookings", {
-        "parking_id": parking_id,
-        "start_time": "1900-01-01T00:00:00Z",  # All time
-        "end_time": "2100-01-01T00:00:00Z"
+        "p_parking_id": parking_id,
+        "p_start_time": "1900-01-01T00:00:00Z",  # All time
+        "p_end_time": "2100-01-01T00:00:00Z"
     }).execute()
     return response.data[0]["count"] if response.data else 0
 
+async def adjust_available(parking_id: int, delta: int, retries: int = 5, strict: bool = False) -> Optional[int]:
+    """Shift a parking's available counter by delta, clamped to [0, slots].
+
+    Uses compare-and-set on the current value so concurrent adjustments from
+    several workers never overwrite each other. Returns None for an unknown
+    parking, and also when every retry lost the race unless strict, which
+    raises instead so the caller can try again later.
+    """
+    for _ in range(retries):
+        response = client.table("parkings").select("available,slots").eq("id", parking_id).execute()
+        if not response.data:
+            return None
+        current = response.data[0]["available"]
+        new_value = min(max(current + delta, 0), response.data[0]["slots"])
+        if new_value == current:
+            return current
+        updated = client.table("parkings").update({"available": new_value}).eq("id", parking_id).eq("available", current).execute()
+        if updated.data:
+            return new_value
+    if strict:
+        raise RuntimeError(f"Availability of parking {parking_id} kept changing; not adjusted by {delta}")
+    # Left for the next recount in update_parking rather than failing the caller
+    print(f"Failed to adjust availability for parking {parking_id} by {delta}")
+    return None
+
+async def recount_available(parking_id: int, outstanding: int, retries: int = 5) -> Optional[int]:
+    """Set a parking's available counter to slots minus its outstanding bookings.
+
+    Compare-and-set like adjust_available, so a concurrent adjustment makes it
+    retry instead of being overwritten. Returns None for an unknown parking or
+    when every retry lost the race.
+    """
+    for _ in range(retries):
+        response = client.table("parkings").select("available,slots").eq("id", parking_id).execute()
+        if not response.data:
+            return None
+        current = response.data[0]["available"]
+        new_value = min(max(response.data[0]["slots"] - outstanding, 0), response.data[0]["slots"])
+        if new_value == current:
+            return current
+        updated = client.table("parkings").update({"available": new_value}).eq("id", parking_id).eq("available", current).execute()
+        if updated.data:
+            return new_value
+    print(f"Failed to recount availability for parking {parking_id}")
+    return None
+
+async def complete_bookings(booking_ids: List[int]) -> List[Dict[str, Any]]:
+    """Mark outstanding bookings COMPLETED, returning the rows that changed."""
+    response = client.table("bookings")\
+        .update({"status": "COMPLETED"})\
+        .in_("id", booking_ids)\
+        .in_("status", ["CONFIRMED", "ACTIVE"])\
+        .execute()
+    for booking in response.data or []:
+        print(f"Event: booking.completed - ID: {booking['id']}")
+    return response.data or []
+
+async def get_outstanding_bookings(page_size: int = 1000) -> List[Dict[str, Any]]:
+    """All CONFIRMED/ACTIVE bookings, used to seed the expiry schedule."""
+    bookings = []
+    offset = 0
+    while True:
+        response = client.table("bookings")\
+            .select("id,parking_id,end_time")\
+            .in_("status", ["CONFIRMED", "ACTIVE"])\
+            .order("id")\
+            .range(offset, offset + page_size - 1)\
+            .execute()
+        rows = response.data or []
+        bookings.extend(rows)
+        if len(rows) < page_size:
+            return bookings
+        offset += page_size
+
 # Bookings
 async def create_booking(create_data: BookingCreate, user_id: str, redis_client) -> Dict[str, Any]:
     parking = await get_parking_by_id(create_data.parkingId)
@@ -106,38 +197,75 @@ async def create_booking(create_data: BookingCreate, user_id: str, redis_client)
         raise ValueError("Could not acquire lock - try again")
 
     try:
-        overlap_response = client.rpc("count_overlapping_bookings", {
-            "p_parking_id": create_data.parkingId,
-            "p_start_time": create_data.startTime.isoformat(),
-            "p_end_time": create_data.endTime.isoformat()
-        }).execute()
-
-        overlap = overlap_response.data[0]["count"] if overlap_response.data else 0
-        print("overlap: ", overlap)
-        print("Available: " , parking["available"])
-        if overlap >= parking["available"]:
-            raise ValueError("No available slots")
-
-        # Generate 6-digit OTP
-        otp = str(random.randint(100000, 999999))
-
-        data = {
-            "parking_id": create_data.parkingId,
-            "user_id": user_id,
-            "start_time": create_data.startTime.isoformat(),
-            "end_time": create_data.endTime.isoformat(),
-            "status": "CONFIRMED",  # <-- uppercase
-            "otp": otp
-        }
-        response = client.table("bookings").insert(data).execute()
-        if response.data:
-            print(f"Event: booking.created - ID: {response.data[0]['id']}, OTP: {otp}")
-            return response.data[0]
-        raise ValueError("Failed to create booking")
+        return await admit_booking(create_data, user_id, parking)
     finally:
         await release_lock(redis_client, lock_key, lock_id)
 
 
+async def admit_booking(create_data: BookingCreate, user_id: str, parking: Dict[str, Any]) -> Dict[str, Any]:
+    """Check slot availability and insert the booking.
+
+    Callers must serialise admissions for the parking themselves, either by
+    holding the booking lock or by running inside the booking sequencer.
+    """
+    overlap_response = client.rpc("count_overlapping_bookings", {
+        "p_parking_id": create_data.parkingId,
+        "p_start_time": create_data.startTime.isoformat(),
+        "p_end_time": create_data.endTime.isoformat()
+    }).execute()
+
+    overlap = overlap_response.data[0]["count"] if overlap_response.data else 0
+    print("overlap: ", overlap)
+    print("Slots: " , parking["slots"])
+    print("Available: " , parking["available"])
+    # "available" already has every outstanding booking subtracted, so the
+    # window check compares overlapping bookings against total slots. It is
+    # still checked on its own: operators close a parking by setting it to 0.
+    if overlap >= parking["slots"] or parking["available"] <= 0:
+        raise ValueError("No available slots")
+
+    # Generate 6-digit OTP
+    otp = str(random.randint(100000, 999999))
+
+    data = {
+        "parking_id": create_data.parkingId,
+        "user_id": user_id,
+        "start_time": create_data.startTime.isoformat(),
+        "end_time": create_data.endTime.isoformat(),
+        "status": "CONFIRMED",  # <-- uppercase
+        "otp": otp
+    }
+    response = client.table("bookings").insert(data).execute()
+    if response.data:
+        print(f"Event: booking.created - ID: {response.data[0]['id']}, OTP: {otp}")
+        await adjust_available(create_data.parkingId, -1)
+        return response.data[0]
+    raise ValueError("Failed to create booking")
+
+
+async def get_bookings_in_window(parking_ids: List[int], start: datetime, end: datetime, page_size: int = 1000) -> List[Dict[str, Any]]:
+    """Fetch CONFIRMED/ACTIVE bookings of the given parkings overlapping [start, end)."""
+    # Booking times are stored as naive UTC timestamps
+    start_utc = start.astimezone(timezone.utc).replace(tzinfo=None).isoformat()
+    end_utc = end.astimezone(timezone.utc).replace(tzinfo=None).isoformat()
+    bookings = []
+    offset = 0
+    while True:
+        response = client.table("bookings")\
+            .select("id,parking_id,start_time,end_time")\
+            .in_("parking_id", parking_ids)\
+            .in_("status", ["CONFIRMED", "ACTIVE"])\
+            .lt("start_time", end_utc)\
+            .gt("end_time", start_utc)\
+            .order("id")\
+            .range(offset, offset + page_size - 1)\
+            .execute()
+        rows = response.data or []
+        bookings.extend(rows)
+        if len(rows) < page_size:
+            return bookings
+        offset += page_size
+
 async def get_bookings_by_user(user_id: str) -> List[Dict[str, Any]]:
     response = client.table("bookings").select("*").eq("user_id", user_id).execute()
     return response.data or []
@@ -153,12 +281,15 @@ async def update_booking(booking_id: int, update_data: Dict[str, Any], user_id:
         return response.data[0]
     raise ValueError("Failed to update booking")
 
-async def delete_booking(booking_id: int, user_id: str) -> bool:
+async def delete_booking(booking_id: int, user_id: str) -> Optional[Dict[str, Any]]:
+    """Delete a booking, returning the deleted row (None if nothing matched)."""
     response = client.table("bookings").delete().eq("id", booking_id).eq("user_id", user_id).execute()
     if response.data:
         print(f"Event: booking.cancelled - ID: {booking_id}")
-        return True
-    return False
+        if response.data[0].get("status") in ("CONFIRMED", "ACTIVE"):
+            await adjust_available(response.data[0]["parking_id"], 1)
+        return response.data[0]
+    return None
 
 # Seller
 async def get_analytics(user_id: str) -> Dict[str, Any]:
@@ -0,0 +1,54 @@
+"""Web Mercator (slippy map) tile helpers shared by the map endpoints."""
+import math
+from typing import List, Tuple
+
+MAX_LATITUDE = 85.05112878
+
+
+def lnglat_to_tile_fraction(lng: float, lat: float, zoom: int) -> Tuple[float, float]:
+    """Position of a point in tile units at the given zoom (integer part = tile x/y)."""
+    lat = max(min(lat, MAX_LATITUDE), -MAX_LATITUDE)
+    n = 2 ** zoom
+    x = (lng + 180.0) / 360.0 * n
+    lat_rad = math.radians(lat)
+    y = (1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n
+    # Clamp so lng=180 / lat=-MAX_LATITUDE stay inside the last tile
+    return min(max(x, 0.0), n - 1e-9), min(max(y, 0.0), n - 1e-9)
+
+
+def lnglat_to_tile(lng: float, lat: float, zoom: int) -> Tuple[int, int]:
+    x, y = lnglat_to_tile_fraction(lng, lat, zoom)
+    return int(x), int(y)
+
+
+def tile_bounds(zoom: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """(west, south, east, north) of a tile in degrees."""
+    n = 2 ** zoom
+
+    def lat_at(ty: float) -> float:
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * ty / n))))
+
+    return x / n * 360.0 - 180.0, lat_at(y + 1), (x + 1) / n * 360.0 - 180.0, lat_at(y)
+
+
+def tile_range(bbox: List[float], zoom: int) -> Tuple[int, int, int, int]:
+    """(min_x, min_y, max_x, max_y) of the tiles at zoom covering bbox [min_lng, min_lat, max_lng, max_lat]."""
+    min_x, min_y = lnglat_to_tile(bbox[0], bbox[3], zoom)
+    max_x, max_y = lnglat_to_tile(bbox[2], bbox[1], zoom)
+    return min_x, min_y, max_x, max_y
+
+
+def tile_count(bbox: List[float], zoom: int) -> int:
+    """Number of tiles tiles_in_bbox would return, without building the list."""
+    min_x, min_y, max_x, max_y = tile_range(bbox, zoom)
+    return (max_x - min_x + 1) * (max_y - min_y + 1)
+
+
+def tiles_in_bbox(bbox: List[float], zoom: int) -> List[Tuple[int, int]]:
+    """Tiles at zoom covering bbox [min_lng, min_lat, max_lng, max_lat]."""
+    min_x, min_y, max_x, max_y = tile_range(bbox, zoom)
+    return [(x, y) for x in range(min_x, max_x + 1) for y in range(min_y, max_y + 1)]
+
+
+def in_bbox(lng: float, lat: float, bbox: List[float]) -> bool:
+    return bbox[0] <= lng <= bbox[2] and bbox[1] <= lat <= bbox[3]
@@ -0,0 +1,53 @@
+"""Free-parking hotspots from the ML service, cached for the map endpoints."""
+import asyncio
+import hashlib
+import json
+import time
+from typing import Dict, Any, List, Optional
+
+import httpx
+
+from app.config import ML_SERVICE_URL, HOTSPOT_REFRESH_SECONDS
+
+# Pune city centre, used as the query point when fetching the city-wide set
+CITY_CENTER = (18.5204, 73.8567)
+
+
+class HotspotCache:
+    def __init__(self, refresh_seconds: int = HOTSPOT_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self.spots: List[Dict[str, Any]] = []
+        self.version: Optional[str] = None
+        self.fetched_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def get(self) -> List[Dict[str, Any]]:
+        """Current hotspots; refetched when older than refresh_seconds.
+
+        A failed refresh keeps serving the last good set.
+        """
+        async with self._lock:
+            if self.version is None or time.time() - self.fetched_at > self.refresh_seconds:
+                try:
+                    await self._refresh()
+                except httpx.HTTPError as e:
+                    print(f"Failed to refresh hotspots from ML service: {str(e)}")
+                    if self.version is None:
+                        raise
+            return self.spots
+
+    async def _refresh(self):
+        async with httpx.AsyncClient(timeout=30.0) as client:
+            response = await client.get(
+                f"{ML_SERVICE_URL.rstrip('/')}/free-parking/predictions",
+                params={"lat": CITY_CENTER[0], "lon": CITY_CENTER[1]}
+            )
+            response.raise_for_status()
+        spots = response.json().get("parking_spots", [])
+        self.spots = spots
+        # Content-derived so every backend worker agrees on the version
+        self.version = hashlib.blake2b(json.dumps(spots, sort_keys=True).encode(), digest_size=8).hexdigest()
+        self.fetched_at = time.time()
+
+
+hotspot_cache = HotspotCache()
@@ -0,0 +1,24 @@
+"""Listing events for the ML service's pricing worker.
+
+A listing-created event is appended to a Redis stream once the collector has
+stored the listing's features; the ML service consumes the stream with a
+consumer group, so its progress survives restarts and bursts are not lost.
+"""
+import json
+import time
+
+LISTING_EVENTS_STREAM = "listings:events"
+# Approximate cap; consumed entries older than this are trimmed
+STREAM_MAXLEN = 100000
+
+
+async def publish_listing_created(redis_client, parking_id: int) -> str:
+    event = {
+        "type": "listing.created",
+        "parking_id": parking_id,
+        "system_code": f"LISTING_{parking_id}",
+        "created_at": time.time(),
+    }
+    return await redis_client.xadd(
+        LISTING_EVENTS_STREAM, {"payload": json.dumps(event)}, maxlen=STREAM_MAXLEN, approximate=True
+    )
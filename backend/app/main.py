@@ -1,7 +1,11 @@
 from fastapi import FastAPI
-from app.routers import parkings, bookings, seller, predictions
-from app.config import SUPABASE_URL, REDIS_URL
+from app.routers import parkings, bookings, seller, predictions, tiles
+from app.config import SUPABASE_URL, REDIS_URL, BOOKING_SEQUENCER_ENABLED
+from app.booking_sequencer import BookingSequencer
+from app.booking_expiry import BookingExpiryEngine
+from app.redis_client import redis_client
 from datetime import datetime
+import asyncio
 
 app = FastAPI(title="Parking Marketplace API", version="1.0.0")
 
@@ -9,6 +13,7 @@ app.include_router(parkings.router)
 app.include_router(bookings.router)
 app.include_router(seller.router)
 app.include_router(predictions.router)
+app.include_router(tiles.router)
 
 @app.get("/")
 async def root():
@@ -31,6 +36,13 @@ async def health_check():
         }
     }
 
+@app.on_event("startup")
+async def startup_event():
+    """Start background booking workers."""
+    asyncio.create_task(BookingExpiryEngine(redis_client).run())
+    if BOOKING_SEQUENCER_ENABLED:
+        asyncio.create_task(BookingSequencer(redis_client).run())
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
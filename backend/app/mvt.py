@@ -0,0 +1,104 @@
+"""Minimal Mapbox Vector Tile (MVT 2.1) encoder for point layers.
+
+Only what the map needs is implemented: point geometries and scalar feature
+properties. See https://github.com/mapbox/vector-tile-spec for the format.
+"""
+import struct
+from typing import Dict, Any, List, Optional, Tuple
+
+from app.geo import lnglat_to_tile_fraction
+
+EXTENT = 4096
+BUFFER = 64
+GEOM_POINT = 1
+
+# (lng, lat, properties, feature id)
+PointFeature = Tuple[float, float, Dict[str, Any], Optional[int]]
+
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _zigzag(value: int) -> int:
+    return (value << 1) ^ (value >> 63)
+
+
+def _key(field: int, wire_type: int) -> bytes:
+    return _varint((field << 3) | wire_type)
+
+
+def _bytes_field(field: int, payload: bytes) -> bytes:
+    return _key(field, 2) + _varint(len(payload)) + payload
+
+
+def _uint_field(field: int, value: int) -> bytes:
+    return _key(field, 0) + _varint(value)
+
+
+def _packed_field(field: int, values: List[int]) -> bytes:
+    return _bytes_field(field, b"".join(_varint(v) for v in values))
+
+
+def _encode_value(value: Any) -> bytes:
+    if isinstance(value, bool):
+        return _uint_field(7, int(value))
+    if isinstance(value, int):
+        return _uint_field(5, value) if value >= 0 else _uint_field(6, _zigzag(value))
+    if isinstance(value, float):
+        return _key(3, 1) + struct.pack("<d", value)
+    return _bytes_field(1, str(value).encode("utf-8"))
+
+
+def _encode_layer(name: str, features: List[PointFeature], zoom: int, x: int, y: int, extent: int, buffer: int) -> bytes:
+    keys: Dict[str, int] = {}
+    values: Dict[Tuple[type, Any], int] = {}
+    encoded_features = []
+
+    for lng, lat, properties, feature_id in features:
+        fx, fy = lnglat_to_tile_fraction(lng, lat, zoom)
+        px = int(round((fx - x) * extent))
+        py = int(round((fy - y) * extent))
+        if not (-buffer <= px <= extent + buffer and -buffer <= py <= extent + buffer):
+            continue
+
+        tags = []
+        for prop, value in properties.items():
+            if value is None:
+                continue
+            key_index = keys.setdefault(prop, len(keys))
+            value_index = values.setdefault((type(value), value), len(values))
+            tags.extend((key_index, value_index))
+
+        feature = b""
+        if feature_id is not None:
+            feature += _uint_field(1, feature_id)
+        feature += _packed_field(2, tags)
+        feature += _uint_field(3, GEOM_POINT)
+        # One MoveTo command (id 1, count 1) followed by the zigzagged position
+        feature += _packed_field(4, [(1 & 0x7) | (1 << 3), _zigzag(px), _zigzag(py)])
+        encoded_features.append(feature)
+
+    layer = _uint_field(15, 2) + _bytes_field(1, name.encode("utf-8"))
+    layer += b"".join(_bytes_field(2, f) for f in encoded_features)
+    layer += b"".join(_bytes_field(3, k.encode("utf-8")) for k in keys)
+    layer += b"".join(_bytes_field(4, _encode_value(v)) for _, v in values)
+    layer += _uint_field(5, extent)
+    return layer
+
+
+def encode_tile(layers: Dict[str, List[PointFeature]], zoom: int, x: int, y: int,
+                extent: int = EXTENT, buffer: int = BUFFER) -> bytes:
+    """Encode point layers into one vector tile; features outside the tile (plus buffer) are dropped."""
+    return b"".join(
+        _bytes_field(3, _encode_layer(name, features, zoom, x, y, extent, buffer))
+        for name, features in layers.items()
+    )
@@ -28,4 +28,12 @@ async def acquire_lock_with_retry(redis_client, key, retries=3, delay=0.2):
         if lock_id:
             return lock_id
         await asyncio.sleep(delay)
-    return None
\ No newline at end of file
+    return None
+
+async def get_version(client, key: str) -> int:
+    value = await client.get(key)
+    return int(value) if value else 0
+
+async def bump_version(client, key: str) -> int:
+    """Increment a change counter used to key caches derived from mutable data."""
+    return await client.incr(key)
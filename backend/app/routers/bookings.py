@@ -4,6 +4,10 @@ from app.database import create_booking, get_bookings_by_user, get_booking_by_id
 from app.dependencies import get_current_user
 from typing import List, Dict
 from app.redis_client import redis_client
+from app.availability import invalidate_parking_availability
+from app.booking_expiry import schedule_booking_expiry, unschedule_booking_expiry
+from app.booking_sequencer import submit_booking
+from app.config import BOOKING_SEQUENCER_ENABLED
 from pydantic import BaseModel
 
 
@@ -12,12 +16,19 @@ router = APIRouter(prefix="/bookings", tags=["bookings"])
 @router.post("/", response_model=dict)
 async def create_booking_endpoint(booking: BookingCreate, current_user: Dict = Depends(get_current_user)):
     # Ignore booking.userId if present; use token
-    try: 
-        db_booking = await create_booking(booking, current_user["email"], redis_client)
+    try:
+        if BOOKING_SEQUENCER_ENABLED:
+            db_booking = await submit_booking(redis_client, booking, current_user["email"])
+        else:
+            db_booking = await create_booking(booking, current_user["email"], redis_client)
+        await invalidate_parking_availability(redis_client, db_booking["parking_id"])
+        await schedule_booking_expiry(redis_client, db_booking)
         return {
             "message": "Booking created successfully",
             "booking": BookingResponse(**db_booking)
         }
+    except TimeoutError:
+        raise HTTPException(status_code=504, detail="Booking request timed out. Please try again.")
     except ValueError as e:
         if str(e) == "Could not acquire lock - try again":
             raise HTTPException(status_code=429, detail="System is busy. Please try again in a moment.")
@@ -41,6 +52,8 @@ async def update_booking_endpoint(booking_id: int, update: BookingUpdate, curren
     if not update_dict:
         raise HTTPException(400, "No updates provided")
     db_booking = await update_booking(booking_id, update_dict, current_user["email"])
+    await invalidate_parking_availability(redis_client, db_booking["parking_id"])
+    await schedule_booking_expiry(redis_client, db_booking)
     return {
         "message": "Booking updated successfully",
         "booking": BookingResponse(**db_booking)
@@ -48,7 +61,10 @@ async def update_booking_endpoint(booking_id: int, update: BookingUpdate, curren
 
 @router.delete("/{booking_id}")
 async def delete_booking_endpoint(booking_id: int, current_user: Dict = Depends(get_current_user)):
-    if await delete_booking(booking_id, current_user["email"]):
+    deleted = await delete_booking(booking_id, current_user["email"])
+    if deleted:
+        await invalidate_parking_availability(redis_client, deleted["parking_id"])
+        await unschedule_booking_expiry(redis_client, deleted)
         return {"message": "Booking canceled successfully"}
     raise HTTPException(404, "Booking not found")
 
@@ -9,11 +9,17 @@ from app.database import (
     update_availability,
     set_price_for_parking,
 )
-from app.config import COLLECTOR_SERVICE_URL, ML_CALLBACK_SECRET, ML_SERVICE_URL
+from app.config import COLLECTOR_SERVICE_URL, ML_CALLBACK_SECRET, ML_SERVICE_URL, LOCAL_TIMEZONE
+from app.availability import get_availability_calendar, invalidate_parking_availability, free_slots_in_window
+from app.listing_events import publish_listing_created
+from app.clustering import get_clusters, invalidate_parking_index
+from app.redis_client import redis_client
 import httpx
 from app.dependencies import get_current_seller
 from typing import List, Dict, Optional
 from decimal import Decimal
+from datetime import date, datetime
+from zoneinfo import ZoneInfo
 
 router = APIRouter(prefix="/parkings", tags=["parkings"])
 
@@ -27,14 +33,31 @@ async def get_parkings(  # Now async
     ),
     radius: int = Query(1000, ge=1, le=50000, description="Radius in meters"),
     price_min: float = Query(0.0, ge=0.0, description="Min price per hour"),
-    price_max: float = Query(99999.0, ge=0.0, description="Max price per hour")
+    price_max: float = Query(99999.0, ge=0.0, description="Max price per hour"),
+    start: Optional[datetime] = Query(None, description="Window start; naive times are local (Asia/Kolkata)"),
+    end: Optional[datetime] = Query(None, description="Window end; naive times are local (Asia/Kolkata)"),
+    min_free: int = Query(1, ge=1, description="Minimum free slots required for the whole window")
 ):
     if len(location) != 2:
         raise HTTPException(status_code=422, detail="Location must be exactly [lng, lat]")
+    if (start is None) != (end is None):
+        raise HTTPException(status_code=422, detail="start and end must be given together")
     
     # Public, no auth
     query = {"location": location, "radius": radius, "price_min": price_min, "price_max": price_max}
     parkings_data = await get_parkings_near(query)  # Await fixed
+
+    if start is not None:
+        tz = ZoneInfo(LOCAL_TIMEZONE)
+        start = start if start.tzinfo else start.replace(tzinfo=tz)
+        end = end if end.tzinfo else end.replace(tzinfo=tz)
+        if end <= start:
+            raise HTTPException(status_code=422, detail="end must be greater than start")
+        # For window queries "available" is the number of slots free for the whole window
+        free = await free_slots_in_window(parkings_data, start, end)
+        parkings_data = [
+            {**p, "available": free[p["id"]]} for p in parkings_data if free[p["id"]] >= min_free
+        ]
     
     # Process: Ensure location is List[float], map price_per_hour to price
     processed = []
@@ -51,11 +74,35 @@ async def get_parkings(  # Now async
         
     return processed
 
+@router.get("/clusters", response_model=dict)
+async def get_parking_clusters(
+    bbox: List[float] = Query(
+        ...,
+        description="Bounding box as [min_lng, min_lat, max_lng, max_lat] – use repeated: bbox=..&bbox=..&bbox=..&bbox=..",
+        min_items=4,
+        max_items=4
+    ),
+    zoom: int = Query(..., ge=0, le=22, description="Map zoom level")
+):
+    """Pre-aggregated listing clusters for a map viewport.
+
+    Each cluster carries count, min price, total available and centroid.
+    Once zoom reaches CLUSTER_MAX_ZOOM the individual listings are returned
+    instead (mode="listings").
+    """
+    if bbox[0] > bbox[2] or bbox[1] > bbox[3]:
+        raise HTTPException(status_code=422, detail="bbox must be [min_lng, min_lat, max_lng, max_lat]")
+    try:
+        return await get_clusters(redis_client, bbox, zoom)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
 # @router.post("/", response_model=dict)
 @router.post("/", response_model=Dict[str, ParkingResponse])
 async def create_parking_endpoint(parking: ParkingCreate, current_user: Dict = Depends(get_current_seller)):
     # Create listing in main DB. Price may be None initially (ML will set it later).
     db_parking = await create_parking(parking, current_user["id"])
+    await invalidate_parking_index(redis_client)
 
     new_parking = {
         "id": db_parking["id"],
@@ -85,6 +132,9 @@ async def create_parking_endpoint(parking: ParkingCreate, current_user: Dict = D
             if resp.status_code >= 400:
                 # log but do not fail the whole request - ML pipeline is asynchronous
                 print(f"Collector ingestion failed: {resp.status_code} - {resp.text}")
+            else:
+                # Features are stored; let the ML pricing worker pick the listing up
+                await publish_listing_created(redis_client, db_parking["id"])
     except Exception as e:
         print(f"Error forwarding to collector: {str(e)}")
 
@@ -112,6 +162,7 @@ async def ml_price_callback(parking_id: int, payload: Dict = Body(...), x_ml_sec
 
     # Update DB without operator check
     db_parking = await set_price_for_parking(parking_id, price_val)
+    await invalidate_parking_index(redis_client)
 
     formatted_parking = {
         "id": db_parking["id"],
@@ -126,6 +177,22 @@ async def ml_price_callback(parking_id: int, payload: Dict = Body(...), x_ml_sec
 
     return {"parking": ParkingResponse(**formatted_parking)}
 
+@router.get("/{parking_id}/availability-calendar", response_model=dict)
+async def get_availability_calendar_endpoint(
+    parking_id: int,
+    day: Optional[date] = Query(None, alias="date", description="Local calendar date (YYYY-MM-DD), defaults to today")
+):
+    """Free slot counts per 15-minute bucket for one day.
+
+    Public, no auth. Lets the app show free windows up front instead of
+    probing POST /bookings/ until one succeeds.
+    """
+    parking = await get_parking_by_id(parking_id)
+    if not parking:
+        raise HTTPException(404, "Parking not found")
+    day = day or datetime.now(ZoneInfo(LOCAL_TIMEZONE)).date()
+    return await get_availability_calendar(redis_client, parking, day)
+
 @router.put("/{parking_id}", response_model=dict)
 async def update_parking_endpoint(parking_id: int, parking: ParkingUpdate, current_user: Dict = Depends(get_current_seller)):
     if not parking.dict(exclude_unset=True):
@@ -137,6 +204,9 @@ async def update_parking_endpoint(parking_id: int, parking: ParkingUpdate, curre
     }
 
     db_parking = await update_parking(parking_id, update_dict, current_user["id"])
+    await invalidate_parking_index(redis_client)
+    if "slots" in update_dict:
+        await invalidate_parking_availability(redis_client, parking_id)
 
     # 🧠 Map Supabase response → ParkingResponse schema
     formatted_parking = {
@@ -158,12 +228,14 @@ async def update_parking_endpoint(parking_id: int, parking: ParkingUpdate, curre
 @router.delete("/{parking_id}")
 async def delete_parking_endpoint(parking_id: int, current_user: Dict = Depends(get_current_seller)):
     if await delete_parking(parking_id, current_user["id"]):
+        await invalidate_parking_index(redis_client)
         return {"message": "Parking spot deleted successfully"}
     raise HTTPException(404, "Parking not found")
 
 @router.put("/{parking_id}/availability", response_model=dict)
 async def update_availability_endpoint(parking_id: int, avail: ParkingAvailabilityUpdate, current_user: Dict = Depends(get_current_seller)):
     db_parking = await update_availability(parking_id, avail.available, current_user["id"])
+    await invalidate_parking_index(redis_client)
     return {
         "message": "Availability updated successfully",
         "parking": {"id": db_parking["id"], "available": db_parking["available"]}
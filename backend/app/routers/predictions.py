@@ -1,58 +1,87 @@
-from fastapi import APIRouter, HTTPException, Query
-from typing import Dict, Any
+from fastapi import APIRouter, HTTPException, Query, Response
+from typing import Dict, Any, Optional
 import httpx
+import time
 from app.config import ML_SERVICE_URL
 
 router = APIRouter(prefix="/predictions", tags=["predictions"])
 
 
+def forward_server_timing(ml_header: Optional[str], ml_call_ms: float) -> str:
+    """The ML service's Server-Timing entries renamed ml-<stage>, plus the round trip as ml-call."""
+    entries = [f"ml-call;dur={ml_call_ms:.1f}"]
+    for entry in (ml_header or "").split(","):
+        entry = entry.strip()
+        if entry:
+            entries.append(f"ml-{entry}")
+    return ", ".join(entries)
+
+
 @router.get("/free-parking")
 async def get_free_parking_predictions(
+    response: Response,
     lat: float = Query(..., description="User latitude"),
-    lon: float = Query(..., description="User longitude")
+    lon: float = Query(..., description="User longitude"),
+    radius_meters: Optional[float] = Query(None, gt=0, description="Only spots within this distance"),
+    limit: Optional[int] = Query(None, ge=1, description="At most this many spots (the nearest)")
 ) -> Dict[str, Any]:
     """
     Get free parking availability predictions near user location.
     
-    This endpoint proxies to the ML service's prediction logic which:
-    1. Fetches all data from parking_features table
+    This endpoint proxies to the ML service's prediction store, which
+    precomputes predictions in one batch whenever features change and at each
+    hour boundary:
+    1. Reads all rows of the parking_features snapshot
     2. Applies ML model to predict occupancy
     3. Converts to availability probability (1 - occupancy)
     4. Computes dynamic radius based on occupancy:
        - Low occupancy (< 0.3): 1500m radius
        - Medium occupancy (0.3-0.6): 800m radius
        - High occupancy (> 0.6): 300m radius
-    5. Returns parking spots with availability predictions and dynamic radius
+    5. Returns parking spots near the user, nearest first, with availability
+       predictions and dynamic radius
     
     Query Parameters:
     - lat: User's latitude
     - lon: User's longitude
+    - radius_meters: Optional search radius; omit for every spot
+    - limit: Optional maximum number of spots (the k nearest)
     
     Returns:
     - parking_spots: List of parking with availability predictions and ML-computed radius
     - count: Number of parking spots found
     - query: Echo of query parameters
+    - freshness: When the predictions were generated and from which feature snapshot
+
+    The ML service's Server-Timing stages are forwarded with an "ml-" prefix,
+    next to "ml-call", the full round trip to it.
     """
     try:
         # Call ML service
         async with httpx.AsyncClient(timeout=30.0) as client:
             ml_url = f"{ML_SERVICE_URL.rstrip('/')}/free-parking/predictions"
-            response = await client.get(
-                ml_url,
-                params={"lat": lat, "lon": lon}
-            )
+            params = {"lat": lat, "lon": lon}
+            if radius_meters is not None:
+                params["radius_meters"] = radius_meters
+            if limit is not None:
+                params["limit"] = limit
+            started = time.perf_counter()
+            ml_response = await client.get(ml_url, params=params)
+            ml_call_ms = (time.perf_counter() - started) * 1000
         
-        if response.status_code != 200:
+        if ml_response.status_code != 200:
             raise HTTPException(
-                status_code=response.status_code,
-                detail=f"ML service error: {response.text}"
+                status_code=ml_response.status_code,
+                detail=f"ML service error: {ml_response.text}"
             )
         
-        predictions = response.json()
+        response.headers["Server-Timing"] = forward_server_timing(ml_response.headers.get("Server-Timing"), ml_call_ms)
+        predictions = ml_response.json()
         return {
             "parking_spots": predictions.get("parking_spots", []),
             "count": predictions.get("count", 0),
-            "query": {"lat": lat, "lon": lon}
+            "query": {"lat": lat, "lon": lon, "radius_meters": radius_meters, "limit": limit},
+            "freshness": predictions.get("freshness")
         }
         
     except httpx.HTTPError as e:
@@ -65,3 +94,62 @@ async def get_free_parking_predictions(
             status_code=500,
             detail=f"Prediction failed: {str(e)}"
         )
+
+
+@router.get("/free-parking/forecast")
+async def get_free_parking_forecast(
+    response: Response,
+    lat: float = Query(..., description="User latitude"),
+    lon: float = Query(..., description="User longitude"),
+    hours: Optional[int] = Query(None, ge=1, description="Hours ahead, from the current hour (default: the ML service maximum, 24)"),
+    radius_meters: Optional[float] = Query(None, gt=0, description="Only spots within this distance"),
+    limit: Optional[int] = Query(None, ge=1, description="At most this many spots (the nearest)")
+) -> Dict[str, Any]:
+    """
+    Free parking availability near the user for each of the next hours, so the
+    app gets a day's outlook in one request. Proxies the ML service's
+    /free-parking/forecast; every spot has a "forecast" list of
+    { hour, availabilityProbability, radius }.
+    """
+    try:
+        async with httpx.AsyncClient(timeout=30.0) as client:
+            ml_url = f"{ML_SERVICE_URL.rstrip('/')}/free-parking/forecast"
+            params = {"lat": lat, "lon": lon}
+            if hours is not None:
+                params["hours"] = hours
+            if radius_meters is not None:
+                params["radius_meters"] = radius_meters
+            if limit is not None:
+                params["limit"] = limit
+            started = time.perf_counter()
+            ml_response = await client.get(ml_url, params=params)
+            ml_call_ms = (time.perf_counter() - started) * 1000
+
+        if ml_response.status_code != 200:
+            raise HTTPException(
+                status_code=ml_response.status_code,
+                detail=f"ML service error: {ml_response.text}"
+            )
+
+        response.headers["Server-Timing"] = forward_server_timing(ml_response.headers.get("Server-Timing"), ml_call_ms)
+        forecast = ml_response.json()
+        return {
+            "parking_spots": forecast.get("parking_spots", []),
+            "count": forecast.get("count", 0),
+            "hours": forecast.get("hours"),
+            "query": {"lat": lat, "lon": lon, "radius_meters": radius_meters, "limit": limit},
+            "freshness": forecast.get("freshness")
+        }
+
+    except HTTPException:
+        raise
+    except httpx.HTTPError as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to connect to ML service: {str(e)}"
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Forecast failed: {str(e)}"
+        )
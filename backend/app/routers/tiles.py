@@ -0,0 +1,100 @@
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from app.clustering import get_parking_index
+from app.hotspots import hotspot_cache
+from app.mvt import encode_tile
+from app.redis_client import redis_client
+from typing import Dict, Any, Callable, Optional
+import hashlib
+import httpx
+
+router = APIRouter(prefix="/tiles", tags=["tiles"])
+
+MVT_MEDIA_TYPE = "application/vnd.mapbox-vector-tile"
+TILE_CACHE_KEY = "tiles:{layer}:{version}:{z}:{x}:{y}"
+TILE_CACHE_TTL = 24 * 60 * 60
+MAX_TILE_ZOOM = 22
+
+
+async def _tile_response(request: Request, layer: str, version: str, z: int, x: int, y: int,
+                         build: Callable[[], bytes], requested_version: Optional[str]) -> Response:
+    """Serve a tile from the Redis tile cache, building it on a miss.
+
+    Every tile gets a content ETag so unchanged tiles revalidate with a 304
+    even after the layer changes elsewhere. Requests that pin the current
+    layer version with ?v= get an immutable response, since any change to the
+    layer changes the URL.
+    """
+    if z > MAX_TILE_ZOOM or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise HTTPException(status_code=404, detail="Tile out of range")
+
+    cache_key = TILE_CACHE_KEY.format(layer=layer, version=version, z=z, x=x, y=y)
+    tile = await redis_client.get(cache_key)
+    if tile is None:
+        tile = build()
+        await redis_client.set(cache_key, tile, ex=TILE_CACHE_TTL)
+
+    etag = f'"{hashlib.blake2b(tile, digest_size=8).hexdigest()}"'
+    if requested_version == version:
+        cache_control = "public, max-age=31536000, immutable"
+    else:
+        cache_control = "public, no-cache"
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=tile, media_type=MVT_MEDIA_TYPE, headers=headers)
+
+
+async def _hotspots_or_503():
+    try:
+        return await hotspot_cache.get()
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=503, detail=f"Failed to load hotspots from ML service: {str(e)}")
+
+
+@router.get("/versions")
+async def get_tile_versions() -> Dict[str, Any]:
+    """Current layer versions, for building cache-forever tile URLs (?v=<version>)."""
+    index = await get_parking_index(redis_client)
+    await _hotspots_or_503()
+    return {"parkings": index.digest, "hotspots": hotspot_cache.version}
+
+
+@router.get("/parkings/{z}/{x}/{y}.mvt")
+async def get_parkings_tile(request: Request, z: int, x: int, y: int, v: Optional[str] = Query(None, description="Layer version from /tiles/versions")):
+    """Paid listings as a Mapbox vector tile (layer "parkings")."""
+    index = await get_parking_index(redis_client)
+
+    def build() -> bytes:
+        features = [
+            (p["location"][0], p["location"][1], {
+                "id": p["id"],
+                "name": p["name"],
+                "price_per_hour": p["price_per_hour"],
+                "slots": p["slots"],
+                "available": p["available"],
+                "rating": float(p["rating"]),
+            }, p["id"])
+            for p in index.points
+        ]
+        return encode_tile({"parkings": features}, z, x, y)
+
+    return await _tile_response(request, "parkings", index.digest, z, x, y, build, v)
+
+
+@router.get("/hotspots/{z}/{x}/{y}.mvt")
+async def get_hotspots_tile(request: Request, z: int, x: int, y: int, v: Optional[str] = Query(None, description="Layer version from /tiles/versions")):
+    """ML free-parking hotspots as a Mapbox vector tile (layer "hotspots")."""
+    spots = await _hotspots_or_503()
+
+    def build() -> bytes:
+        features = [
+            (float(s["lon"]), float(s["lat"]), {
+                "systemCode": s.get("systemCode"),
+                "availabilityProbability": float(s.get("availabilityProbability", 0)),
+                "radius": int(s.get("radius", 0)),
+            }, None)
+            for s in spots
+        ]
+        return encode_tile({"hotspots": features}, z, x, y)
+
+    return await _tile_response(request, "hotspots", hotspot_cache.version, z, x, y, build, v)
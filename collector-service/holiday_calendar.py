@@ -0,0 +1,86 @@
+"""Precomputed public-holiday calendar, looked up by day number.
+
+A calendar for a (country, subdivision) is built once per process with the
+holidays package, as an int8 flag per day over a range of years. Looking up
+a batch is then a single array index: local dates become day numbers (days
+since 1970-01-01, as numpy's datetime64[D]) and index the flags. A batch
+with dates outside the covered years extends the range once.
+
+Both services use this module, so the IsHoliday the collector stores for
+training matches what the ML service derives when serving. The source is
+ml-service/app/holiday_calendar.py; collector-service/holiday_calendar.py is
+a verbatim copy. Edit the source and copy it over:
+ml-service/tests/test_holiday_calendar.py fails while the two differ.
+"""
+import threading
+from functools import lru_cache
+from typing import Optional
+
+import holidays
+import numpy as np
+import pandas as pd
+
+# Years covered up front; batches outside this range extend it
+FIRST_YEAR = 2015
+LAST_YEAR = 2035
+
+
+def _day_number(year: int, month: int = 1, day: int = 1) -> int:
+    return int(np.datetime64(f"{year:04d}-{month:02d}-{day:02d}", "D").astype(np.int64))
+
+
+class HolidayCalendar:
+    def __init__(self, country: str, subdivision: Optional[str] = None,
+                 first_year: int = FIRST_YEAR, last_year: int = LAST_YEAR):
+        self.country = country
+        self.subdivision = subdivision
+        self._lock = threading.Lock()
+        self._build(first_year, last_year)
+
+    def _build(self, first_year: int, last_year: int):
+        days = holidays.country_holidays(self.country, subdiv=self.subdivision,
+                                         years=range(first_year, last_year + 1))
+        first_day = _day_number(first_year)
+        flags = np.zeros(_day_number(last_year + 1) - first_day, dtype=np.int8)
+        for date in days:
+            flags[_day_number(date.year, date.month, date.day) - first_day] = 1
+        # Swapped in together, so concurrent lookups see a consistent table
+        self._table = (first_year, last_year, first_day, flags)
+
+    def _covering(self, first_year: int, last_year: int):
+        table = self._table
+        if first_year < table[0] or last_year > table[1]:
+            with self._lock:
+                table = self._table
+                if first_year < table[0] or last_year > table[1]:
+                    self._build(min(first_year, table[0]), max(last_year, table[1]))
+                table = self._table
+        return table
+
+    def lookup(self, day_numbers: np.ndarray) -> np.ndarray:
+        """1 for holidays, 0 otherwise, for days since 1970-01-01.
+
+        Negative sentinels from NaT (the int64 minimum) give 0.
+        """
+        day_numbers = np.asarray(day_numbers, dtype=np.int64)
+        valid = day_numbers > np.iinfo(np.int64).min
+        if not valid.any():
+            return np.zeros(len(day_numbers), dtype=np.int8)
+        years = day_numbers[valid].min(), day_numbers[valid].max()
+        first_year, last_year = (int(str(np.datetime64(int(d), "D"))[:4]) for d in years)
+        _, _, first_day, flags = self._covering(first_year, last_year)
+        positions = np.where(valid, day_numbers - first_day, 0)
+        return np.where(valid, flags[positions], 0).astype(np.int8)
+
+    def is_holiday(self, local_timestamps: pd.Series) -> np.ndarray:
+        """Holiday flag of each timestamp's local date (tz-aware or naive local wall time)."""
+        if local_timestamps.dt.tz is not None:
+            local_timestamps = local_timestamps.dt.tz_localize(None)
+        days = local_timestamps.to_numpy(dtype="datetime64[ns]").astype("datetime64[D]").astype(np.int64)
+        return self.lookup(days)
+
+
+@lru_cache(maxsize=None)
+def holiday_calendar(country: str, subdivision: Optional[str] = None) -> HolidayCalendar:
+    """The shared calendar for a country and subdivision, built on first use."""
+    return HolidayCalendar(country, subdivision or None)
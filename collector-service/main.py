@@ -15,6 +15,9 @@ from transform import (
     save_to_supabase
 )
 from supabase import create_client
+from holiday_calendar import holiday_calendar
+from utils import load_env
+import pandas as pd
 import logging
 from datetime import datetime
 import os
@@ -242,6 +245,10 @@ async def ingest_parking(record: dict):
 
     logger.info(f"Creating feature record with traffic={traffic_condition}, special_day={is_special_day}")
     
+    env = load_env()
+    local_now = pd.Timestamp(now, tz="UTC").tz_convert(env["LOCAL_TIMEZONE"])
+    is_holiday = int(holiday_calendar(env["HOLIDAY_COUNTRY"], env["HOLIDAY_SUBDIVISION"]).is_holiday(pd.Series([local_now]))[0])
+
     # Generate realistic capacity and occupancy
     capacity = int(record.get("slots", 0))
     if capacity == 0:
@@ -262,13 +269,14 @@ async def ingest_parking(record: dict):
         "QueueLength": random.randint(0, 3),
         "IsSpecialDay": is_special_day,
         "Timestamp": now.strftime('%Y-%m-%d %H:%M:%S'),
-        "Timestamp_WIB": now.strftime('%Y-%m-%d %H:%M:%S'),
-        "Hour": now.hour,
-        "DayOfWeek": now.weekday(),
-        "DayName": now.strftime('%A'),
-        "IsWeekend": 1 if now.weekday() in [5,6] else 0,
-        "IsHoliday": 0,  # Could enhance with actual holiday data
-        "TimeCategory": categorize_time(now.hour),
+        # Time features in local time, as transform._add_time_features derives them
+        "Timestamp_WIB": local_now.strftime('%Y-%m-%d %H:%M:%S'),
+        "Hour": local_now.hour,
+        "DayOfWeek": local_now.weekday(),
+        "DayName": local_now.strftime('%A'),
+        "IsWeekend": 1 if local_now.weekday() in [5,6] else 0,
+        "IsHoliday": is_holiday,
+        "TimeCategory": categorize_time(local_now.hour),
         "Duration_Minutes": 60,
         "EstimatedDuration_Minutes": 60
     }
@@ -8,17 +8,16 @@ Includes timezone conversion, time-based features, and duration calculations.
 import pandas as pd
 import numpy as np
 import pytz
-import holidays
 from datetime import datetime
 from typing import Dict, List, Any
 import logging
 from supabase import create_client
 from supabase.client import ClientOptions
 
-logger = logging.getLogger(__name__)
+from holiday_calendar import holiday_calendar
+from utils import load_env
 
-# Indian holidays calendar
-indian_holidays = holidays.India()
+logger = logging.getLogger(__name__)
 
 
 def transform_parking_data(
@@ -145,31 +144,29 @@ def transform_parking_data(
 
 
 def _add_time_features(df: pd.DataFrame) -> pd.DataFrame:
-    """Add time-based features with Indian timezone."""
+    """Add time-based features in the local timezone (LOCAL_TIMEZONE)."""
     logger.info("Adding time features...")
     
     if df.empty:
         return df
     
-    # Convert to Indian Standard Time (IST)
-    india_tz = pytz.timezone('Asia/Kolkata')
-    india_holidays = holidays.country_holidays("IN")
+    # Convert to local time (Indian Standard Time by default)
+    env = load_env()
+    local_tz = pytz.timezone(env["LOCAL_TIMEZONE"])
     
     df['Timestamp'] = pd.to_datetime(df['Timestamp'])
     # Only localize if Timestamp is naive
     if df['Timestamp'].dt.tz is None:
-        df['Timestamp_WIB'] = df['Timestamp'].dt.tz_localize('UTC').dt.tz_convert(india_tz)
+        df['Timestamp_WIB'] = df['Timestamp'].dt.tz_localize('UTC').dt.tz_convert(local_tz)
     else:
-        df['Timestamp_WIB'] = df['Timestamp'].dt.tz_convert(india_tz)
+        df['Timestamp_WIB'] = df['Timestamp'].dt.tz_convert(local_tz)
     
     # Extract time features
     df['Hour'] = df['Timestamp_WIB'].dt.hour.astype(int)
     df['DayOfWeek'] = df['Timestamp_WIB'].dt.dayofweek.astype(int)
     df['DayName'] = df['Timestamp_WIB'].dt.day_name()
     df['IsWeekend'] = df['DayOfWeek'].isin([5, 6]).astype(int)
-    df['IsHoliday'] = df['Timestamp_WIB'].apply(
-        lambda x: 1 if x.date() in india_holidays else 0
-    )
+    df['IsHoliday'] = holiday_calendar(env["HOLIDAY_COUNTRY"], env["HOLIDAY_SUBDIVISION"]).is_holiday(df['Timestamp_WIB'])
     
     # Time category
     df['TimeCategory'] = df['Hour'].apply(_categorize_time)
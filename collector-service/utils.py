@@ -12,6 +12,10 @@ def load_env() -> Dict[str, Optional[str]]:
         "CALENDARIFIC_API_KEY": os.getenv("CALENDARIFIC_API_KEY"),
         "CALENDARIFIC_COUNTRY": os.getenv("CALENDARIFIC_COUNTRY", "IN"),
         "CALENDARIFIC_YEAR": os.getenv("CALENDARIFIC_YEAR", "2025"),
+        # Time features; must match the ML service's settings of the same names
+        "LOCAL_TIMEZONE": os.getenv("LOCAL_TIMEZONE", "Asia/Kolkata"),
+        "HOLIDAY_COUNTRY": os.getenv("HOLIDAY_COUNTRY", "IN"),
+        "HOLIDAY_SUBDIVISION": os.getenv("HOLIDAY_SUBDIVISION", "MH"),
     }
 
 async def http_get(url: str, params=None, headers=None, timeout: int = 25) -> Any:
@@ -0,0 +1,145 @@
+"""Versioned, precompressed JSON artifacts (free hotspots, paid parkings).
+
+Every publish with changed content becomes a new version named by its
+content hash. The compact JSON is stored next to gzip (and brotli, when the
+brotli package is installed) copies, so requests are served without
+compressing anything. The last ARTIFACT_HISTORY versions are kept, which
+lets clients that hold one of them fetch only the changed entries.
+
+Publishing holds a lock file per artifact, so publishes from several
+threads or workers never lose manifest entries or prune files another
+publish just listed.
+"""
+import fcntl
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import time
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from .config import ARTIFACT_DIR, ARTIFACT_HISTORY
+
+try:
+    import brotli
+except ImportError:  # optional: gzip is always available
+    brotli = None
+
+# Artifact name -> field identifying an entry across versions
+ARTIFACT_KEYS = {
+    "freeHotspots": "label",
+    "paidParkings": "id",
+}
+# Preferred first
+ENCODINGS = [("br", ".br"), ("gzip", ".gz")] if brotli else [("gzip", ".gz")]
+
+
+def _write_atomic(path: str, data: bytes):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+class ArtifactStore:
+    def __init__(self, directory: str = ARTIFACT_DIR, history: int = ARTIFACT_HISTORY):
+        self.directory = directory
+        self.history = history
+
+    def _dir(self, name: str) -> str:
+        if name not in ARTIFACT_KEYS:
+            raise KeyError(f"Unknown artifact: {name}")
+        return os.path.join(self.directory, name)
+
+    def manifest(self, name: str) -> List[Dict]:
+        """Known versions of an artifact, oldest first."""
+        try:
+            with open(os.path.join(self._dir(name), "manifest.json")) as f:
+                return json.load(f)["versions"]
+        except FileNotFoundError:
+            return []
+
+    def latest(self, name: str) -> Optional[Dict]:
+        versions = self.manifest(name)
+        return versions[-1] if versions else None
+
+    def path(self, name: str, version: str, encoding: Optional[str] = None) -> str:
+        if not all(c in "0123456789abcdef" for c in version):
+            raise KeyError(f"Unknown version: {version}")
+        suffix = dict(ENCODINGS).get(encoding, "") if encoding else ""
+        return os.path.join(self._dir(name), f"{version}.json{suffix}")
+
+    def publish(self, name: str, records: List[Dict]) -> Dict:
+        """Store records as a new version unless they equal the latest one."""
+        directory = self._dir(name)
+        os.makedirs(directory, exist_ok=True)
+        body = json.dumps(records, separators=(",", ":"), sort_keys=True).encode("utf-8")
+        with open(os.path.join(directory, ".lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            return self._publish(name, directory, body, len(records))
+
+    def _publish(self, name: str, directory: str, body: bytes, count: int) -> Dict:
+        version = hashlib.blake2b(body, digest_size=8).hexdigest()
+        versions = self.manifest(name)
+        if versions and versions[-1]["version"] == version:
+            return versions[-1]
+
+        sizes = {"identity": len(body)}
+        _write_atomic(self.path(name, version), body)
+        # mtime=0 keeps the gzip bytes a pure function of the content
+        compressed = {"gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+        if brotli:
+            compressed["br"] = brotli.compress(body, quality=11)
+        for encoding, data in compressed.items():
+            _write_atomic(self.path(name, version, encoding), data)
+            sizes[encoding] = len(data)
+
+        entry = {"version": version, "generated_at": time.time(), "count": count, "bytes": sizes}
+        versions = [v for v in versions if v["version"] != version] + [entry]
+        for old in versions[:-self.history]:
+            for encoding in [None] + list(compressed):
+                try:
+                    os.remove(self.path(name, old["version"], encoding))
+                except FileNotFoundError:
+                    pass
+        versions = versions[-self.history:]
+        _write_atomic(os.path.join(directory, "manifest.json"), json.dumps({"versions": versions}).encode("utf-8"))
+        return entry
+
+    def delta(self, name: str, since: str) -> Optional[Dict]:
+        """Changes from version since to the latest; None when since is no longer kept."""
+        latest = self.latest(name)
+        if latest is None:
+            raise KeyError(f"No versions of {name} published yet")
+        if since == latest["version"]:
+            return {"from": since, "to": since, "upserts": [], "removed": []}
+        if since not in {v["version"] for v in self.manifest(name)}:
+            return None
+
+        key = ARTIFACT_KEYS[name]
+        old = {r[key]: r for r in _load_records(self.path(name, since))}
+        new = _load_records(self.path(name, latest["version"]))
+        new_keys = {r[key] for r in new}
+        return {
+            "from": since,
+            "to": latest["version"],
+            "upserts": [r for r in new if old.get(r[key]) != r],
+            "removed": [k for k in old if k not in new_keys],
+        }
+
+
+@lru_cache(maxsize=8)
+def _load_records(path: str) -> List[Dict]:
+    # Versions are immutable, so parsed copies can be cached by path
+    with open(path, "rb") as f:
+        return json.loads(f.read())
+
+
+artifact_store = ArtifactStore()
@@ -0,0 +1,149 @@
+"""Delivery of listing prices to the backend's price-callback endpoint.
+
+Callbacks go out over one shared HTTP client with at most
+CALLBACK_CONCURRENCY requests in flight, so a slow backend response only
+occupies its own slot. Network errors, 429 and 5xx responses are retried
+up to CALLBACK_MAX_ATTEMPTS times with exponential backoff and full jitter
+(a random wait between 0 and min(CALLBACK_BACKOFF_MAX_SECONDS,
+CALLBACK_BACKOFF_SECONDS * 2**retry)). Other 4xx responses are not
+retried. A delivery that never succeeds is reported as failed, and the
+caller dead-letters it.
+
+Metrics (GET /metrics): callback.attempt_ms, callback.delivery_ms
+(including retries), callback.attempts, and the counters callback.delivered,
+callback.retried and callback.failed.
+"""
+import asyncio
+import logging
+import random
+import time
+from typing import Awaitable, Callable, Optional, Set
+
+import httpx
+
+from .config import (BACKEND_URL, ML_CALLBACK_SECRET, CALLBACK_CONCURRENCY, CALLBACK_MAX_INFLIGHT,
+                     CALLBACK_MAX_ATTEMPTS, CALLBACK_BACKOFF_SECONDS, CALLBACK_BACKOFF_MAX_SECONDS,
+                     CALLBACK_TIMEOUT_SECONDS)
+from .metrics import histogram, counter, SIZE_BUCKETS
+
+logger = logging.getLogger(__name__)
+
+attempt_ms = histogram("callback.attempt_ms")
+delivery_ms = histogram("callback.delivery_ms")
+attempts_per_delivery = histogram("callback.attempts", SIZE_BUCKETS)
+delivered = counter("callback.delivered")
+retried = counter("callback.retried")
+failed = counter("callback.failed")
+
+
+class DeliveryResult:
+    def __init__(self, ok: bool, attempts: int, reason: Optional[str] = None):
+        self.ok = ok
+        self.attempts = attempts
+        self.reason = reason
+
+
+def _retryable(status_code: int) -> bool:
+    return status_code == 429 or status_code >= 500
+
+
+class CallbackDispatcher:
+    def __init__(self, client: Optional[httpx.AsyncClient] = None, concurrency: int = CALLBACK_CONCURRENCY,
+                 max_inflight: int = CALLBACK_MAX_INFLIGHT, max_attempts: int = CALLBACK_MAX_ATTEMPTS,
+                 backoff_seconds: float = CALLBACK_BACKOFF_SECONDS,
+                 backoff_max_seconds: float = CALLBACK_BACKOFF_MAX_SECONDS):
+        self.client = client or httpx.AsyncClient(timeout=CALLBACK_TIMEOUT_SECONDS)
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self._requests = asyncio.Semaphore(concurrency)
+        # Deliveries accepted but not finished, including those waiting to retry
+        self._inflight = asyncio.Semaphore(max_inflight)
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def _post(self, parking_id: str, price: float) -> httpx.Response:
+        callback_url = f"{BACKEND_URL.rstrip('/')}/parkings/{parking_id}/price-callback"
+        async with self._requests:
+            started = time.perf_counter()
+            try:
+                return await self.client.post(
+                    callback_url,
+                    headers={"X-ML-Secret": ML_CALLBACK_SECRET, "Content-Type": "application/json"},
+                    json={"price_per_hour": float(price)},
+                )
+            finally:
+                attempt_ms.observe((time.perf_counter() - started) * 1000)
+
+    async def deliver(self, parking_id: str, price: float) -> DeliveryResult:
+        """POST a price to the backend, retrying transient failures."""
+        started = time.perf_counter()
+        reason = None
+        attempt = 0
+        while attempt < self.max_attempts:
+            if attempt:
+                retried.inc()
+                cap = min(self.backoff_max_seconds, self.backoff_seconds * 2 ** (attempt - 1))
+                await asyncio.sleep(random.uniform(0, cap))
+            attempt += 1
+            try:
+                response = await self._post(parking_id, price)
+            except httpx.HTTPError as e:
+                reason = f"{type(e).__name__}: {str(e)}"
+                continue
+            except Exception as e:
+                # Not transient (bad configuration, a broken client): retrying won't help
+                reason = f"{type(e).__name__}: {str(e)}"
+                break
+            if response.status_code == 200:
+                delivered.inc()
+                attempts_per_delivery.observe(attempt)
+                delivery_ms.observe((time.perf_counter() - started) * 1000)
+                logger.info(f"Set price {price} for parking {parking_id} (attempt {attempt})")
+                return DeliveryResult(True, attempt)
+            reason = f"HTTP {response.status_code}: {response.text[:200]}"
+            if not _retryable(response.status_code):
+                break
+
+        failed.inc()
+        attempts_per_delivery.observe(attempt)
+        delivery_ms.observe((time.perf_counter() - started) * 1000)
+        logger.error(f"Failed to set price for parking {parking_id} after {attempt} attempts: {reason}")
+        return DeliveryResult(False, attempt, reason)
+
+    async def submit(self, parking_id: str, price: float,
+                     on_done: Callable[[DeliveryResult], Awaitable[None]]):
+        """Start delivering in the background and call on_done with the result.
+
+        Waits only while CALLBACK_MAX_INFLIGHT deliveries are unfinished.
+        """
+        await self._inflight.acquire()
+
+        async def run():
+            try:
+                try:
+                    result = await self.deliver(parking_id, price)
+                except Exception as e:
+                    result = DeliveryResult(False, 0, f"{type(e).__name__}: {str(e)}")
+                # Always reported, so the caller can settle the event
+                await on_done(result)
+            except Exception as e:
+                logger.error(f"Error finishing price delivery for parking {parking_id}: {str(e)}")
+            finally:
+                self._inflight.release()
+
+        task = asyncio.create_task(run())
+        # Keep a reference until done, so the task is not garbage collected
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    @property
+    def pending(self) -> int:
+        return len(self._tasks)
+
+    async def drain(self, timeout: Optional[float] = None):
+        """Wait for every submitted delivery to finish, or until timeout."""
+        if self._tasks:
+            await asyncio.wait(list(self._tasks), timeout=timeout)
+
+    async def aclose(self):
+        await self.client.aclose()
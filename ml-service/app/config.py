@@ -8,6 +8,13 @@ SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 JSON_OUTPUT_DIR = os.getenv("JSON_OUTPUT_DIR", "./data")
 
+# Local timezone and public-holiday calendar (holidays package country and
+# subdivision codes) for the time features. These must match the collector
+# service, which derives the same features for the rows the models train on.
+LOCAL_TIMEZONE = os.getenv("LOCAL_TIMEZONE", "Asia/Kolkata")
+HOLIDAY_COUNTRY = os.getenv("HOLIDAY_COUNTRY", "IN")
+HOLIDAY_SUBDIVISION = os.getenv("HOLIDAY_SUBDIVISION", "MH")
+
 # Backend service configuration
 BACKEND_URL = os.getenv("BACKEND_URL", "http://localhost:8002")
 ML_CALLBACK_SECRET = os.getenv("ML_CALLBACK_SECRET")
@@ -17,3 +24,94 @@ os.makedirs(JSON_OUTPUT_DIR, exist_ok=True)
 
 # Initialize Supabase client
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+
+# In-memory feature snapshot: rows per paginated read (PostgREST caps responses
+# at 1000 rows by default), seconds between incremental refreshes, and how far
+# behind the created_at watermark each refresh re-reads to catch rows from
+# transactions that committed late.
+SNAPSHOT_PAGE_SIZE = int(os.getenv("SNAPSHOT_PAGE_SIZE", "1000"))
+SNAPSHOT_REFRESH_SECONDS = float(os.getenv("SNAPSHOT_REFRESH_SECONDS", "30"))
+SNAPSHOT_OVERLAP_SECONDS = float(os.getenv("SNAPSHOT_OVERLAP_SECONDS", "60"))
+
+# Seconds between checks of the precomputed prediction store; it is rebuilt when
+# the feature snapshot changed or the hour rolled over since the last batch.
+PREDICTION_REFRESH_SECONDS = float(os.getenv("PREDICTION_REFRESH_SECONDS", "10"))
+
+# Optional JSON rule table for dynamic pricing (base price, traffic/event
+# multipliers, occupancy curve, per-zone overrides); see app/pricing.py.
+# Unset means the built-in default rules.
+PRICING_RULES_PATH = os.getenv("PRICING_RULES_PATH")
+
+# Model registry: directory of joblib model files, the file used when no
+# ACTIVE_MODEL pointer exists there, and seconds between checks of the pointer
+# (how quickly other workers follow a hot swap).
+MODEL_DIR = os.getenv("MODEL_DIR", "./models")
+OCCUPANCY_MODEL_FILE = os.getenv("OCCUPANCY_MODEL_FILE", "occupancy_regressor_model.joblib")
+MODEL_WATCH_SECONDS = float(os.getenv("MODEL_WATCH_SECONDS", "10"))
+
+# Secret for the /admin endpoints (header X-Admin-Secret); unset disables them.
+ML_ADMIN_SECRET = os.getenv("ML_ADMIN_SECRET")
+
+# Micro-batching of concurrent model calls: how long the first request of a
+# batch waits for others, and the row count that flushes a batch immediately.
+INFERENCE_BATCH_WINDOW_MS = float(os.getenv("INFERENCE_BATCH_WINDOW_MS", "5"))
+INFERENCE_MAX_BATCH_ROWS = int(os.getenv("INFERENCE_MAX_BATCH_ROWS", "4096"))
+
+# CPU-bound jobs (full-table predictions, prediction store rebuilds) run off the
+# event loop in a "thread" or "process" pool of CPU_WORKERS workers; at most
+# CPU_MAX_PENDING jobs may be queued or running before requests get a 503.
+# Process workers read the feature snapshot from a pickle in SHARED_DIR
+# (tmpfs-backed /dev/shm where available).
+CPU_EXECUTOR = os.getenv("CPU_EXECUTOR", "thread")
+CPU_WORKERS = int(os.getenv("CPU_WORKERS", str(os.cpu_count() or 1)))
+CPU_MAX_PENDING = int(os.getenv("CPU_MAX_PENDING", str(2 * (os.cpu_count() or 1))))
+SHARED_DIR = os.getenv("SHARED_DIR", "/dev/shm/ml-service" if os.path.isdir("/dev/shm") else os.path.join(JSON_OUTPUT_DIR, "shared"))
+
+# Redis holding the listings:events stream the pricing worker consumes (the
+# backend's REDIS_URL), events priced per batch, and how long an event left
+# unacknowledged by a consumer that stopped waits before another one takes it.
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+PRICING_BATCH_SIZE = int(os.getenv("PRICING_BATCH_SIZE", "100"))
+PRICING_RETRY_SECONDS = float(os.getenv("PRICING_RETRY_SECONDS", "30"))
+
+# Price callbacks to the backend: concurrent requests, deliveries in flight
+# (including those waiting to retry) before the worker stops reading events,
+# attempts per delivery, and the jittered exponential backoff between them.
+# Deliveries that still fail go to the listings:pricing:dead stream.
+CALLBACK_CONCURRENCY = int(os.getenv("CALLBACK_CONCURRENCY", "16"))
+CALLBACK_MAX_INFLIGHT = int(os.getenv("CALLBACK_MAX_INFLIGHT", "1000"))
+CALLBACK_MAX_ATTEMPTS = int(os.getenv("CALLBACK_MAX_ATTEMPTS", "5"))
+CALLBACK_BACKOFF_SECONDS = float(os.getenv("CALLBACK_BACKOFF_SECONDS", "0.5"))
+CALLBACK_BACKOFF_MAX_SECONDS = float(os.getenv("CALLBACK_BACKOFF_MAX_SECONDS", "10"))
+CALLBACK_TIMEOUT_SECONDS = float(os.getenv("CALLBACK_TIMEOUT_SECONDS", "10"))
+
+# Rows per chunk streamed through /predict-entire; bounds its peak memory.
+PREDICT_CHUNK_ROWS = int(os.getenv("PREDICT_CHUNK_ROWS", "20000"))
+
+# Versioned artifacts (freeHotspots, paidParkings) served by /artifacts: where
+# each version and its gzip/brotli copies are stored, and how many versions are
+# kept for delta sync.
+ARTIFACT_DIR = os.getenv("ARTIFACT_DIR", os.path.join(JSON_OUTPUT_DIR, "artifacts"))
+ARTIFACT_HISTORY = int(os.getenv("ARTIFACT_HISTORY", "10"))
+
+# Prediction tables shared between replicas through Redis (REDIS_URL): one
+# replica builds each model/hour table, the others read it. A replica waits up
+# to PREDICTION_CACHE_WAIT_SECONDS for a table another one is building before
+# computing its own.
+PREDICTION_CACHE_ENABLED = os.getenv("PREDICTION_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+PREDICTION_CACHE_WAIT_SECONDS = float(os.getenv("PREDICTION_CACHE_WAIT_SECONDS", "30"))
+
+# Request stage timings are always returned in the Server-Timing header and
+# aggregated in /metrics; with TIMING_DEBUG, requests taking at least
+# SLOW_REQUEST_MS also log their per-stage breakdown.
+TIMING_DEBUG = os.getenv("TIMING_DEBUG", "false").lower() in ("1", "true", "yes")
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "500"))
+
+# Hours ahead covered by /free-parking/forecast (the most a request may ask for).
+FORECAST_MAX_HOURS = int(os.getenv("FORECAST_MAX_HOURS", "24"))
+
+# Local columnar copy of the feature snapshot and prediction table for fast
+# restarts (see app/feature_store.py), rewritten every FEATURE_STORE_SAVE_SECONDS
+# when the snapshot changed and on shutdown. An empty FEATURE_STORE_DIR disables it.
+FEATURE_STORE_DIR = os.getenv("FEATURE_STORE_DIR", os.path.join(JSON_OUTPUT_DIR, "feature-store"))
+FEATURE_STORE_SAVE_SECONDS = float(os.getenv("FEATURE_STORE_SAVE_SECONDS", "300"))
@@ -0,0 +1,177 @@
+"""Runs CPU-bound jobs off the event loop.
+
+Jobs go to a thread pool or a process pool (CPU_EXECUTOR), so /health and
+light endpoints keep answering while preprocessing and inference run. At most
+CPU_MAX_PENDING jobs may be queued or running; beyond that callers get
+ExecutorBusy (503). A job that has not started yet is cancelled when its
+client disconnects; a job that already runs finishes, and its result is
+dropped. Such a job counts as pending until it actually finishes.
+
+The feature snapshot is handed to jobs as a SharedFrame. With threads that
+is just a reference. With processes the snapshot is written once per version
+to SHARED_DIR and every job only ships the path; each worker unpickles a
+version once and keeps it.
+"""
+import asyncio
+import concurrent.futures
+import glob
+import logging
+import multiprocessing
+import os
+import pickle
+import tempfile
+import threading
+from typing import Callable, Optional
+
+import pandas as pd
+from fastapi import Request
+
+from .config import CPU_EXECUTOR, CPU_WORKERS, CPU_MAX_PENDING, SHARED_DIR
+
+logger = logging.getLogger(__name__)
+
+DISCONNECT_POLL_SECONDS = 0.5
+
+
+class ExecutorBusy(Exception):
+    pass
+
+
+class ClientDisconnected(Exception):
+    pass
+
+
+class SharedFrame:
+    """Picklable handle to a snapshot version, resolved with load_shared() inside the job."""
+
+    def __init__(self, version: int, frame: Optional[pd.DataFrame] = None, path: Optional[str] = None):
+        self.version = version
+        self.frame = frame
+        self.path = path
+
+    def __getstate__(self):
+        # Never pickle the frame itself, only where to find it
+        return {"version": self.version, "frame": None, "path": self.path}
+
+
+_worker_frame: Optional[tuple] = None
+
+
+def load_shared(handle: SharedFrame) -> pd.DataFrame:
+    """The frame behind a handle; in a worker process it is read once per version."""
+    global _worker_frame
+    if handle.frame is not None:
+        return handle.frame
+    if _worker_frame is None or _worker_frame[0] != handle.path:
+        with open(handle.path, "rb") as f:
+            _worker_frame = (handle.path, pickle.load(f))
+    return _worker_frame[1]
+
+
+class CpuExecutor:
+    def __init__(self, kind: str = CPU_EXECUTOR, workers: int = CPU_WORKERS, max_pending: int = CPU_MAX_PENDING):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"CPU_EXECUTOR must be 'thread' or 'process', got {kind!r}")
+        self.kind = kind
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self._pool: Optional[concurrent.futures.Executor] = None
+        self._shared: Optional[SharedFrame] = None
+        # share() is called from several refresh threads (predictions, forecast)
+        self._share_lock = threading.Lock()
+
+    @property
+    def pool(self) -> concurrent.futures.Executor:
+        if self._pool is None:
+            if self.kind == "process":
+                # spawn: forking a process that runs an event loop and threads is unsafe
+                self._pool = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+            else:
+                self._pool = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="cpu")
+        return self._pool
+
+    def share(self, frame: pd.DataFrame, version: int) -> SharedFrame:
+        """Handle to a snapshot version for jobs; written to SHARED_DIR once per version in process mode."""
+        if self.kind == "thread":
+            return SharedFrame(version, frame=frame)
+        with self._share_lock:
+            if self._shared is None or self._shared.version != version:
+                os.makedirs(SHARED_DIR, exist_ok=True)
+                prefix = os.path.join(SHARED_DIR, f"snapshot-{os.getpid()}-")
+                path = f"{prefix}{version}.pkl"
+                fd, tmp = tempfile.mkstemp(dir=SHARED_DIR, prefix=os.path.basename(path) + ".", suffix=".tmp")
+                try:
+                    with os.fdopen(fd, "wb") as f:
+                        pickle.dump(frame, f, protocol=pickle.HIGHEST_PROTOCOL)
+                    os.replace(tmp, path)
+                except BaseException:
+                    if os.path.exists(tmp):
+                        os.remove(tmp)
+                    raise
+                # Keep the previous version for jobs still queued with its handle
+                keep = {path, self._shared.path if self._shared is not None else None}
+                for old in glob.glob(f"{prefix}*.pkl"):
+                    if old not in keep:
+                        os.remove(old)
+                self._shared = SharedFrame(version, path=path)
+            return self._shared
+
+    async def run(self, fn: Callable, *args, request: Optional[Request] = None):
+        """Run fn(*args) in the pool; raises ExecutorBusy when too many jobs are pending.
+
+        With request, a client disconnect cancels the job (or abandons it if it
+        already runs) and raises ClientDisconnected.
+        """
+        if self.pending >= self.max_pending:
+            raise ExecutorBusy(f"{self.pending} CPU jobs pending")
+        loop = asyncio.get_running_loop()
+        self.pending += 1
+        try:
+            try:
+                job = self.pool.submit(fn, *args)
+            except BaseException:
+                self.pending -= 1
+                raise
+            # Counted until the job itself finishes: an abandoned job that keeps
+            # running still occupies a worker, so it still counts against CPU_MAX_PENDING
+            job.add_done_callback(lambda _: self._job_done(loop))
+            future = asyncio.wrap_future(job)
+            if request is None:
+                return await future
+            while True:
+                done, _ = await asyncio.wait({future}, timeout=DISCONNECT_POLL_SECONDS)
+                if done:
+                    return future.result()
+                if await request.is_disconnected():
+                    future.cancel()
+                    logger.info(f"Client disconnected, cancelled {getattr(fn, '__name__', fn)}")
+                    raise ClientDisconnected()
+        except concurrent.futures.BrokenExecutor:
+            # A worker died (e.g. OOM-killed); start a fresh pool for the next job
+            logger.error("CPU executor pool broke, recreating it")
+            self._pool = None
+            raise
+
+    def _job_done(self, loop: asyncio.AbstractEventLoop):
+        # Runs in a pool thread; pending is only touched on the event loop
+        try:
+            loop.call_soon_threadsafe(self._release_pending)
+        except RuntimeError:
+            # The loop has closed (shutdown), nobody is counting any more
+            pass
+
+    def _release_pending(self):
+        self.pending -= 1
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+        for path in glob.glob(os.path.join(SHARED_DIR, f"snapshot-{os.getpid()}-*.pkl")):
+            os.remove(path)
+
+
+cpu_executor = CpuExecutor()
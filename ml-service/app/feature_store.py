@@ -0,0 +1,175 @@
+"""Local columnar copy of the feature snapshot and prediction table.
+
+Restarting the service used to mean refetching the whole parking_features
+table over HTTP before it could answer. Instead, the typed snapshot (see
+schema.py) and the latest prediction table are written to FEATURE_STORE_DIR
+as one .npy file per column plus a meta.json holding dtypes, categories and
+the created_at watermark. On startup the columns are memory-mapped, so the
+service serves right away and the snapshot refresh only fetches rows newer
+than the watermark.
+
+Each save writes a new generation directory and then atomically repoints
+CURRENT at it, so a crash mid-save leaves the previous generation intact.
+Saves from several workers are serialized with a lock file, and the
+generation CURRENT named before a save is kept, so a worker still loading
+it keeps its files.
+Categorical and string columns are stored as integer codes plus their
+categories, never pickled.
+"""
+import fcntl
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .config import FEATURE_STORE_DIR
+from .prediction_store import PredictionTable
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+CURRENT = "CURRENT"
+LOCK = "LOCK"
+
+
+def _save_columns(frame: pd.DataFrame, directory: str) -> Dict:
+    """Write each column of frame as .npy; returns the column specs for meta.json."""
+    specs = {}
+    for position, name in enumerate(frame.columns):
+        values = frame[name]
+        path = f"{position}.npy"
+        if isinstance(values.dtype, pd.DatetimeTZDtype):
+            np.save(os.path.join(directory, path), values.dt.tz_convert("UTC").dt.tz_localize(None).to_numpy())
+            specs[name] = {"kind": "datetime", "file": path}
+        elif pd.api.types.is_numeric_dtype(values.dtype) and not isinstance(values.dtype, pd.CategoricalDtype):
+            np.save(os.path.join(directory, path), values.to_numpy())
+            specs[name] = {"kind": "numeric", "file": path}
+        else:
+            categorical = values.astype("category")
+            np.save(os.path.join(directory, path), categorical.cat.codes.to_numpy())
+            specs[name] = {
+                "kind": "category" if isinstance(values.dtype, pd.CategoricalDtype) else "string",
+                "file": path,
+                "categories": [str(c) for c in categorical.cat.categories],
+            }
+    return specs
+
+
+def _load_column(directory: str, spec: Dict):
+    values = np.load(os.path.join(directory, spec["file"]), mmap_mode="r")
+    if spec["kind"] == "datetime":
+        return pd.Series(values).dt.tz_localize("UTC")
+    if spec["kind"] in ("category", "string"):
+        column = pd.Categorical.from_codes(values, categories=spec["categories"])
+        return column if spec["kind"] == "category" else np.asarray(column, dtype=object)
+    return values
+
+
+class FeatureStore:
+    def __init__(self, directory: str = FEATURE_STORE_DIR):
+        self.directory = directory
+
+    def _current(self) -> Optional[str]:
+        try:
+            with open(os.path.join(self.directory, CURRENT)) as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            return None
+
+    def save(self, frame: pd.DataFrame, watermark: Optional[pd.Timestamp], snapshot_version: int,
+             table: Optional[PredictionTable] = None):
+        """Persist a snapshot, and the prediction table if it was built from this snapshot version."""
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, LOCK), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            self._save(frame, watermark, snapshot_version, table)
+
+    def _save(self, frame: pd.DataFrame, watermark: Optional[pd.Timestamp], snapshot_version: int,
+              table: Optional[PredictionTable]):
+        started = time.perf_counter()
+        previous = self._current()
+        generation = f"gen-{time.time_ns()}"
+        path = os.path.join(self.directory, generation)
+        os.makedirs(os.path.join(path, "features"))
+        meta = {
+            "format": FORMAT_VERSION,
+            "saved_at": time.time(),
+            "rows": len(frame),
+            "watermark": watermark.isoformat() if watermark is not None else None,
+            "columns": _save_columns(frame, os.path.join(path, "features")),
+            "predictions": None,
+        }
+        if table is not None and table.snapshot_version == snapshot_version:
+            os.makedirs(os.path.join(path, "predictions"))
+            columns = pd.DataFrame({
+                "system_codes": table.system_codes, "lat": table.lat, "lon": table.lon,
+                "probability": table.probability, "radius": table.radius,
+            })
+            meta["predictions"] = {
+                "hour_bucket": table.hour_bucket,
+                "model_version": table.model_version,
+                "generated_at": table.generated_at,
+                "columns": _save_columns(columns, os.path.join(path, "predictions")),
+            }
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump(meta, f)
+
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=f"{CURRENT}.", suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            f.write(generation)
+        os.replace(tmp, os.path.join(self.directory, CURRENT))
+        # Older generations and ones left by crashed saves (no save is in
+        # progress under the lock). The previous one stays: another worker
+        # may be loading it.
+        for old in os.listdir(self.directory):
+            if old.startswith("gen-") and old not in (generation, previous):
+                shutil.rmtree(os.path.join(self.directory, old), ignore_errors=True)
+        logger.info(f"Feature store saved: {len(frame)} rows{' and predictions' if meta['predictions'] else ''} "
+                    f"in {time.perf_counter() - started:.2f}s ({generation})")
+
+    def load(self) -> Optional[Tuple[pd.DataFrame, Optional[pd.Timestamp], Optional[PredictionTable]]]:
+        """The persisted snapshot, its watermark, and its prediction table.
+
+        The table's snapshot_version is 0; the caller stamps it with the
+        version the restored snapshot gets. None when nothing was saved yet
+        or the files are unreadable.
+        """
+        try:
+            current = self._current()
+            if current is None:
+                return None
+            path = os.path.join(self.directory, current)
+            with open(os.path.join(path, "meta.json")) as f:
+                meta = json.load(f)
+            if meta.get("format") != FORMAT_VERSION:
+                return None
+            features = os.path.join(path, "features")
+            frame = pd.DataFrame({name: _load_column(features, spec) for name, spec in meta["columns"].items()},
+                                 copy=False)
+            watermark = pd.Timestamp(meta["watermark"]) if meta["watermark"] else None
+
+            table = None
+            if meta["predictions"]:
+                saved = meta["predictions"]
+                predictions = os.path.join(path, "predictions")
+                columns = {name: _load_column(predictions, spec) for name, spec in saved["columns"].items()}
+                table = PredictionTable(
+                    columns["system_codes"], columns["lat"], columns["lon"], columns["probability"], columns["radius"],
+                    0, saved["hour_bucket"], saved["model_version"],
+                )
+                table.generated_at = saved["generated_at"]
+            return frame, watermark, table
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError) as e:
+            logger.error(f"Unreadable feature store in {self.directory}: {str(e)}")
+            return None
+
+
+feature_store = FeatureStore()
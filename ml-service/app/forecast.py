@@ -0,0 +1,152 @@
+"""Multi-hour free-parking availability forecasts.
+
+For each spot, its latest feature row is repeated once per forecast hour
+with the Timestamp moved to that hour. Preprocessing derives the time
+features (Hour, DayOfWeek, their sin/cos terms, IsWeekend, IsHoliday,
+TimeCategory, EstimatedDuration_Minutes) just as it does for observed rows,
+and the whole spots x hours matrix is predicted in one model call.
+
+A forecast is computed once per hour and model version, always
+FORECAST_MAX_HOURS ahead from the current hour; requests for fewer hours
+slice it.
+"""
+import logging
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .config import FORECAST_MAX_HOURS
+from .models import model_registry
+from .predictions import preprocess, predict_occupancy, availability_radius
+from .prediction_store import current_hour_bucket, latest_per_spot
+from .spatial import GridIndex
+from .timing import stage
+
+logger = logging.getLogger(__name__)
+
+
+class ForecastTable:
+    """Forecast for every spot: one row per spot, one column per hour."""
+
+    def __init__(self, system_codes: np.ndarray, lat: np.ndarray, lon: np.ndarray,
+                 probability: np.ndarray, radius: np.ndarray,
+                 snapshot_version: int, hour_bucket: int, model_version: str):
+        self.system_codes = system_codes
+        self.lat = lat
+        self.lon = lon
+        self.probability = probability
+        self.radius = radius
+        self.snapshot_version = snapshot_version
+        self.hour_bucket = hour_bucket
+        self.model_version = model_version
+        self.generated_at = time.time()
+        self.index = GridIndex(lat, lon)
+
+    @property
+    def hours(self) -> int:
+        return self.probability.shape[1]
+
+    def __len__(self) -> int:
+        return len(self.system_codes)
+
+    def nearby(self, lat: float, lon: float, hours: int, radius_meters: Optional[float] = None,
+               limit: Optional[int] = None) -> List[Dict]:
+        """Forecasts of spots near (lat, lon), nearest first, for the next `hours` hours."""
+        with stage("spatial"):
+            positions, distances = self.index.query(lat, lon, radius_meters, limit)
+        with stage("serialize"):
+            hour_starts = [
+                pd.Timestamp((self.hour_bucket + h) * 3600, unit="s", tz="UTC").isoformat()
+                for h in range(hours)
+            ]
+            probabilities = self.probability[positions, :hours].tolist()
+            radii = self.radius[positions, :hours].tolist()
+            return [
+                {
+                    "systemCode": code,
+                    "lat": spot_lat,
+                    "lon": spot_lon,
+                    "distanceMeters": round(distance, 1),
+                    "forecast": [
+                        {"hour": start, "availabilityProbability": probability, "radius": radius}
+                        for start, probability, radius in zip(hour_starts, spot_probabilities, spot_radii)
+                    ],
+                }
+                for code, spot_lat, spot_lon, distance, spot_probabilities, spot_radii in zip(
+                    self.system_codes[positions].tolist(),
+                    self.lat[positions].tolist(),
+                    self.lon[positions].tolist(),
+                    distances.tolist(),
+                    probabilities,
+                    radii,
+                )
+            ]
+
+    def freshness(self) -> Dict:
+        return {
+            "generated_at": self.generated_at,
+            "snapshot_version": self.snapshot_version,
+            "hour_bucket": self.hour_bucket,
+            "model_version": self.model_version,
+        }
+
+
+def forecast_rows(df: pd.DataFrame, hour_bucket: int, hours: int) -> pd.DataFrame:
+    """The latest row of every spot, repeated for each of `hours` hours from hour_bucket.
+
+    Row i * hours + h is spot i at hour h.
+    """
+    latest = latest_per_spot(df)
+    rows = latest.loc[latest.index.repeat(hours)].reset_index(drop=True)
+    hour_starts = pd.to_datetime((hour_bucket + np.arange(hours)) * 3600, unit='s', utc=True)
+    rows['Timestamp'] = np.tile(hour_starts, len(latest))
+    return rows
+
+
+def build_forecast(df: pd.DataFrame, snapshot_version: int, hour_bucket: int,
+                   hours: int = FORECAST_MAX_HOURS) -> ForecastTable:
+    """Forecast every spot in a snapshot for `hours` hours, in one model batch."""
+    started = time.perf_counter()
+    model_version = model_registry.current.version
+    if df.empty:
+        empty = np.empty((0, hours))
+        return ForecastTable(np.array([], dtype=object), np.array([], dtype=np.float64), np.array([], dtype=np.float64),
+                             empty.astype(np.float64), empty.astype(np.int16), snapshot_version, hour_bucket, model_version)
+
+    rows = forecast_rows(df, hour_bucket, hours)
+    processed = predict_occupancy(preprocess(rows))
+    ratio = processed['PredOccupancy_Ratio'].to_numpy().reshape(-1, hours)
+    spots = processed.iloc[::hours]
+    table = ForecastTable(
+        rows['SystemCodeNumber'].iloc[::hours].astype(str).to_numpy(dtype=object),
+        spots['Latitude'].to_numpy(dtype=np.float64),
+        spots['Longitude'].to_numpy(dtype=np.float64),
+        (1 - ratio).astype(np.float64),
+        availability_radius(ratio).astype(np.int16),
+        snapshot_version, hour_bucket, model_version,
+    )
+    logger.info(f"Forecast built: {len(table)} spots x {hours} hours in {time.perf_counter() - started:.2f}s "
+                f"(snapshot v{snapshot_version}, hour {hour_bucket})")
+    return table
+
+
+class ForecastStore:
+    def __init__(self):
+        self.table: Optional[ForecastTable] = None
+
+    def is_stale(self) -> bool:
+        # New feature rows are picked up at the next hour, not on every snapshot refresh
+        table = self.table
+        return (
+            table is None
+            or table.hour_bucket != current_hour_bucket()
+            or table.model_version != model_registry.current.version
+        )
+
+    def install(self, table: ForecastTable):
+        self.table = table
+
+
+forecast_store = ForecastStore()
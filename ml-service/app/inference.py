@@ -0,0 +1,91 @@
+"""Micro-batching of concurrent model calls.
+
+Requests arriving within INFERENCE_BATCH_WINDOW_MS of each other (or until
+INFERENCE_MAX_BATCH_ROWS rows are queued) are concatenated into one frame,
+predicted with a single model call in a worker thread, and the results are
+sliced back to the awaiting callers.
+"""
+import asyncio
+import logging
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .config import INFERENCE_BATCH_WINDOW_MS, INFERENCE_MAX_BATCH_ROWS
+from .metrics import histogram, SIZE_BUCKETS
+from .models import model_registry
+
+logger = logging.getLogger(__name__)
+
+batch_rows = histogram("inference.batch_rows", SIZE_BUCKETS)
+batch_requests = histogram("inference.batch_requests", SIZE_BUCKETS)
+queue_wait_ms = histogram("inference.queue_wait_ms")
+predict_ms = histogram("inference.predict_ms")
+
+
+class InferenceScheduler:
+    def __init__(self, window_ms: float = INFERENCE_BATCH_WINDOW_MS, max_batch_rows: int = INFERENCE_MAX_BATCH_ROWS):
+        self.window = window_ms / 1000
+        self.max_batch_rows = max_batch_rows
+        self._pending: List[Tuple[pd.DataFrame, asyncio.Future, float]] = []
+        self._pending_rows = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    async def predict(self, features: pd.DataFrame) -> np.ndarray:
+        """Model output for features, computed together with concurrent callers."""
+        if features.empty:
+            return np.empty(0)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((features, future, time.perf_counter()))
+        self._pending_rows += len(features)
+        if self._pending_rows >= self.max_batch_rows:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending, self._pending_rows = self._pending, [], 0
+        if batch:
+            asyncio.get_running_loop().create_task(self._run(batch))
+
+    async def _run(self, batch: List[Tuple[pd.DataFrame, asyncio.Future, float]]):
+        # Callers that gave up (e.g. client disconnected) are left out of the batch
+        batch = [entry for entry in batch if not entry[1].done()]
+        if not batch:
+            return
+        started = time.perf_counter()
+        for _, _, enqueued in batch:
+            queue_wait_ms.observe((started - enqueued) * 1000)
+
+        frames = [features for features, _, _ in batch]
+        combined = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+        batch_rows.observe(len(combined))
+        batch_requests.observe(len(batch))
+        try:
+            # One model reference for the whole batch, even if a swap happens meanwhile
+            model = model_registry.model
+            predicted = await asyncio.to_thread(model.predict, combined)
+        except Exception as e:
+            logger.error(f"Batched inference failed for {len(batch)} requests: {str(e)}")
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        predict_ms.observe((time.perf_counter() - started) * 1000)
+
+        predicted = np.asarray(predicted)
+        offset = 0
+        for features, future, _ in batch:
+            if not future.done():
+                future.set_result(predicted[offset:offset + len(features)])
+            offset += len(features)
+
+
+inference_scheduler = InferenceScheduler()
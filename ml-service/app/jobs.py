@@ -0,0 +1,93 @@
+"""CPU-bound jobs run by the executor, in a thread or a worker process.
+
+Everything here must be a picklable top-level function taking picklable
+arguments.
+"""
+import logging
+import time
+from collections import defaultdict
+
+from .artifacts import artifact_store
+from .config import PREDICT_CHUNK_ROWS
+from .executor import SharedFrame, load_shared
+from .forecast import ForecastTable, build_forecast
+from .models import model_registry
+from .predictions import predict_parking_dynamics
+from .prediction_store import PredictionTable, build_table
+from .snapshot import iter_feature_chunks
+from .summary import summarize_chunk, merge_summaries, finalize_summary, generate_free_hotspots, generate_paid_parkings
+from .utils import save_json_to_file
+
+logger = logging.getLogger(__name__)
+
+
+def predict_entire(chunk_rows: int = PREDICT_CHUNK_ROWS) -> dict:
+    """Price and summarise the whole feature table and write the JSON exports.
+
+    The table is streamed in chunks of chunk_rows: each chunk is preprocessed,
+    predicted and folded into per-ID aggregates before the next is read, so
+    memory is bounded by the chunk size plus one summary row per ID.
+    """
+    # A worker process follows model swaps here rather than with a watch loop
+    model_registry.sync()
+    timings = defaultdict(float)
+    rows = 0
+    chunks = 0
+    partial = None
+
+    job_started = started = time.perf_counter()
+    for chunk in iter_feature_chunks(chunk_rows):
+        timings["fetch"] += time.perf_counter() - started
+
+        stage = time.perf_counter()
+        predictions = predict_parking_dynamics(chunk)
+        timings["predict"] += time.perf_counter() - stage
+
+        stage = time.perf_counter()
+        partial = merge_summaries(partial, summarize_chunk(predictions))
+        timings["aggregate"] += time.perf_counter() - stage
+
+        rows += len(chunk)
+        chunks += 1
+        logger.info(f"predict-entire: chunk {chunks} ({len(chunk)} rows, {rows} total, "
+                    f"{len(partial)} spots) after {time.perf_counter() - job_started:.2f}s")
+        started = time.perf_counter()
+
+    if partial is None:
+        return {"rows": 0, "chunks": 0}
+
+    stage = time.perf_counter()
+    summary = finalize_summary(partial)
+    free_hotspots = generate_free_hotspots(summary)
+    paid_parkings = generate_paid_parkings(summary)
+    timings["summarize"] = time.perf_counter() - stage
+
+    stage = time.perf_counter()
+    save_json_to_file("freeHotspots.json", free_hotspots)
+    save_json_to_file("paidParkings.json", paid_parkings)
+    artifacts = {
+        "freeHotspots": artifact_store.publish("freeHotspots", free_hotspots)["version"],
+        "paidParkings": artifact_store.publish("paidParkings", paid_parkings)["version"],
+    }
+    timings["export"] = time.perf_counter() - stage
+
+    timings = {name: round(seconds, 3) for name, seconds in timings.items()}
+    logger.info(f"predict-entire: {rows} rows in {chunks} chunks, stage seconds {timings}")
+    return {
+        "free_hotspots_count": len(free_hotspots),
+        "paid_parkings_count": len(paid_parkings),
+        "rows": rows,
+        "chunks": chunks,
+        "artifacts": artifacts,
+        "timings": timings,
+    }
+
+
+def build_prediction_table(snapshot: SharedFrame, hour_bucket: int) -> PredictionTable:
+    model_registry.sync()
+    return build_table(load_shared(snapshot), snapshot.version, hour_bucket)
+
+
+def build_forecast_table(snapshot: SharedFrame, hour_bucket: int) -> ForecastTable:
+    model_registry.sync()
+    return build_forecast(load_shared(snapshot), snapshot.version, hour_bucket)
@@ -1,72 +1,264 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks, Query
-from .config import supabase, BACKEND_URL, ML_CALLBACK_SECRET
-from .predictions import predict_parking_dynamics, predict_free_parking_availability
-from .summary import generate_summary, generate_free_hotspots, generate_paid_parkings
-from .utils import save_json_to_file
-import pandas as pd
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Query, Body, Header, Request
+from .config import supabase
+from .pricing_worker import ListingPricingWorker
+from .snapshot import feature_snapshot
+from .prediction_store import prediction_store, current_hour_bucket
+from .prediction_cache import prediction_cache
+from .executor import cpu_executor, ExecutorBusy, ClientDisconnected
+from .jobs import predict_entire, build_prediction_table, build_forecast_table
+from .forecast import forecast_store
+from .schema import bytes_per_row
+from .feature_store import feature_store
+from .config import SNAPSHOT_REFRESH_SECONDS, PREDICTION_REFRESH_SECONDS, MODEL_WATCH_SECONDS, ML_ADMIN_SECRET, FORECAST_MAX_HOURS
+from .config import FEATURE_STORE_DIR, FEATURE_STORE_SAVE_SECONDS
+from .models import model_registry
+from .metrics import snapshot as metrics_snapshot
+from .timing import stage, add as add_timing, timing_middleware
+from .artifacts import artifact_store, ENCODINGS
+from fastapi.responses import Response
 import uvicorn
-import httpx
 import asyncio
+import json
 import logging
+import time
 from datetime import datetime, timedelta
 from typing import Optional
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
-# Track processed listings to avoid duplicates
-processed_listings = set()
-
 app = FastAPI(title="ML Service - Parking Predictions", version="1.0.0")
+app.middleware("http")(timing_middleware)
+
+def busy_error(e: ExecutorBusy) -> HTTPException:
+    return HTTPException(status_code=503, detail=f"Server busy: {str(e)}", headers={"Retry-After": "5"})
+
 
 @app.get("/predict-entire")
-async def predict_entire_table():
+async def predict_entire_table(request: Request):
+    """Price and summarise the whole feature table in chunks and write the JSON exports.
+
+    Reports row/chunk counts and seconds per stage (fetch, predict, aggregate, summarize, export).
+    """
     try:
-        response = supabase.schema("parking").table("parking_features").select("*").execute()
-        if not response.data:
+        result = await cpu_executor.run(predict_entire, request=request)
+        # The job ran in the executor, outside this request's timing context
+        for name, seconds in result.get("timings", {}).items():
+            add_timing(name, seconds * 1000)
+        if result["rows"] == 0:
             raise HTTPException(status_code=404, detail="No data found")
-        df = pd.DataFrame(response.data)
-        predictions = predict_parking_dynamics(df)
-        summary = generate_summary(predictions)
-        free_hotspots = generate_free_hotspots(summary)
-        paid_parkings = generate_paid_parkings(summary)
-        save_json_to_file("freeHotspots.json", free_hotspots)
-        save_json_to_file("paidParkings.json", paid_parkings)
-        return {"status":"success", "free_hotspots_count":len(free_hotspots), "paid_parkings_count":len(paid_parkings)}
+        return {"status":"success", **result}
+    except HTTPException:
+        raise
+    except ExecutorBusy as e:
+        raise busy_error(e)
+    except ClientDisconnected:
+        raise HTTPException(status_code=499, detail="Client closed request")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+_table_lock = asyncio.Lock()
+
+async def load_shared_prediction_table(version: int, watermark, hour_bucket: int):
+    """Table from the shared cache, or None plus whether this replica now holds the rebuild lock."""
+    model_version = model_registry.current.version
+    try:
+        table = await prediction_cache.load(model_version, hour_bucket, watermark, version)
+        if table is not None:
+            return table, False
+        if await prediction_cache.acquire(model_version, hour_bucket):
+            return None, True
+        # Another replica is building it
+        return await prediction_cache.wait_for(model_version, hour_bucket, watermark, version), False
+    except Exception as e:
+        logger.warning(f"Prediction cache unavailable, computing locally: {str(e)}")
+        return None, False
+
+
+async def share_prediction_table(table, watermark, hour_bucket: int, locked_model: Optional[str]):
+    try:
+        await prediction_cache.store(table, watermark)
+        if locked_model is not None:
+            await prediction_cache.release(locked_model, hour_bucket)
+    except Exception as e:
+        logger.warning(f"Could not share prediction table: {str(e)}")
+
+
+async def refresh_prediction_table():
+    """Rebuild the prediction store's table if it is stale.
+
+    A table another replica already shared is reused; otherwise it is computed
+    in the CPU executor and shared.
+    """
+    async with _table_lock:
+        if prediction_store.is_stale():
+            # Read before the frame, so the watermark never claims newer rows than were used
+            watermark = feature_snapshot.watermark
+            df, version = await asyncio.to_thread(feature_snapshot.get)
+            hour_bucket = current_hour_bucket()
+            table, locked = None, False
+            if prediction_cache.enabled:
+                locked_model = model_registry.current.version
+                with stage("shared_cache"):
+                    table, locked = await load_shared_prediction_table(version, watermark, hour_bucket)
+            if table is None:
+                snapshot = await asyncio.to_thread(cpu_executor.share, df, version)
+                # On failure the lock expires after LOCK_SECONDS and another replica takes over
+                with stage("recompute"):
+                    table = await cpu_executor.run(build_prediction_table, snapshot, hour_bucket)
+                if prediction_cache.enabled:
+                    await share_prediction_table(table, watermark, hour_bucket, locked_model if locked else None)
+            prediction_store.install(table)
+        return prediction_store.table
+
+
 @app.get("/free-parking/predictions")
 async def get_free_parking_predictions(
     lat: float = Query(..., description="User latitude"),
-    lon: float = Query(..., description="User longitude")
+    lon: float = Query(..., description="User longitude"),
+    radius_meters: Optional[float] = Query(None, gt=0, description="Only spots within this distance"),
+    limit: Optional[int] = Query(None, ge=1, description="At most this many spots (the nearest)")
 ):
     """
-    Get free parking availability predictions near user location.
+    Get free parking availability predictions near user location, nearest first.
+    Without radius_meters or limit every spot is returned.
     
     Returns parking spots with availability probability and ML-computed radius
     based on predicted occupancy:
     - Low occupancy (< 0.3): 1500m radius
     - Medium occupancy (0.3-0.6): 800m radius
     - High occupancy (> 0.6): 300m radius
+    
+    Predictions come from the precomputed store; "freshness" tells when they
+    were generated and from which feature snapshot.
     """
     try:
-        parking_spots = predict_free_parking_availability(lat, lon)
+        table = prediction_store.table or await refresh_prediction_table()
+        parking_spots = table.nearby(lat, lon, radius_meters, limit)
         
         return {
             "parking_spots": parking_spots,
             "count": len(parking_spots),
             "query": {
                 "lat": lat,
-                "lon": lon
-            }
+                "lon": lon,
+                "radius_meters": radius_meters,
+                "limit": limit
+            },
+            "freshness": table.freshness()
         }
+    except ExecutorBusy as e:
+        raise busy_error(e)
     except Exception as e:
         logger.error(f"Error predicting free parking: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
 
 
+_forecast_lock = asyncio.Lock()
+
+async def refresh_forecast_table():
+    """Rebuild the forecast in the CPU executor if the hour or the model changed."""
+    async with _forecast_lock:
+        if forecast_store.is_stale():
+            df, version = await asyncio.to_thread(feature_snapshot.get)
+            snapshot = await asyncio.to_thread(cpu_executor.share, df, version)
+            with stage("recompute"):
+                forecast_store.install(await cpu_executor.run(build_forecast_table, snapshot, current_hour_bucket()))
+        return forecast_store.table
+
+
+@app.get("/free-parking/forecast")
+async def get_free_parking_forecast(
+    lat: float = Query(..., description="User latitude"),
+    lon: float = Query(..., description="User longitude"),
+    hours: int = Query(FORECAST_MAX_HOURS, ge=1, le=FORECAST_MAX_HOURS, description="Hours ahead, from the current hour"),
+    radius_meters: Optional[float] = Query(None, gt=0, description="Only spots within this distance"),
+    limit: Optional[int] = Query(None, ge=1, description="At most this many spots (the nearest)")
+):
+    """
+    Free parking availability near the user for each of the next `hours` hours
+    (the first is the current hour), nearest spots first.
+
+    Every spot gets a "forecast" list of { hour (UTC start), availabilityProbability,
+    radius }, with the same radius rule as /free-parking/predictions. The whole
+    forecast is computed in one model batch once per hour (and model).
+    """
+    try:
+        table = forecast_store.table if not forecast_store.is_stale() else await refresh_forecast_table()
+        parking_spots = table.nearby(lat, lon, hours, radius_meters, limit)
+        return {
+            "parking_spots": parking_spots,
+            "count": len(parking_spots),
+            "hours": hours,
+            "query": {
+                "lat": lat,
+                "lon": lon,
+                "radius_meters": radius_meters,
+                "limit": limit
+            },
+            "freshness": table.freshness()
+        }
+    except ExecutorBusy as e:
+        raise busy_error(e)
+    except Exception as e:
+        logger.error(f"Error forecasting free parking: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Forecast failed: {str(e)}")
+
+
+@app.get("/artifacts/{name}")
+async def get_artifact_info(name: str):
+    """Latest version of an artifact (freeHotspots or paidParkings) and the versions kept for delta sync."""
+    try:
+        versions = artifact_store.manifest(name)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    if not versions:
+        raise HTTPException(status_code=404, detail=f"No versions of {name} published yet")
+    return {"latest": versions[-1], "versions": [v["version"] for v in versions]}
+
+
+@app.get("/artifacts/{name}/delta")
+async def get_artifact_delta(name: str, since: str = Query(..., description="Version the client holds")):
+    """Entries changed or added since a version, plus the keys removed.
+
+    If since is no longer kept, the full latest version is returned with "full": true.
+    """
+    try:
+        delta = await asyncio.to_thread(artifact_store.delta, name, since)
+        if delta is None:
+            latest = artifact_store.latest(name)
+            with open(artifact_store.path(name, latest["version"]), "rb") as f:
+                records = json.loads(f.read())
+            return {"from": since, "to": latest["version"], "full": True, "upserts": records, "removed": []}
+        return {**delta, "full": False}
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@app.get("/artifacts/{name}/{version}")
+async def get_artifact_version(name: str, version: str, accept_encoding: Optional[str] = Header(None)):
+    """One artifact version, served precompressed (br, gzip) when the client accepts it.
+
+    Versions are content hashes and never change, so responses are cacheable forever.
+    """
+    accepted = {e.split(";")[0].strip() for e in (accept_encoding or "").split(",")}
+    headers = {"ETag": f'"{version}"', "Cache-Control": "public, max-age=31536000, immutable", "Vary": "Accept-Encoding"}
+    try:
+        for encoding, _ in ENCODINGS:
+            if encoding in accepted:
+                path = artifact_store.path(name, version, encoding)
+                headers["Content-Encoding"] = encoding
+                break
+        else:
+            path = artifact_store.path(name, version)
+        with open(path, "rb") as f:
+            body = f.read()
+    except (KeyError, FileNotFoundError):
+        raise HTTPException(status_code=404, detail=f"Unknown artifact version: {name}/{version}")
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
 @app.api_route("/health", methods=["GET", "HEAD"])
 async def health():
     return {
@@ -74,90 +266,155 @@ async def health():
         "timestamp": datetime.now().isoformat(),
         "service": "ml-service",
         "version": "1.0.0",
-        "database": "connected" if supabase else "disconnected"
+        "database": "connected" if supabase else "disconnected",
+        "snapshot": {
+            "rows": len(feature_snapshot.frame),
+            "bytes_per_row": bytes_per_row(feature_snapshot.frame),
+            "version": feature_snapshot.version,
+            "watermark": feature_snapshot.watermark.isoformat() if feature_snapshot.watermark is not None else None,
+        },
+        "predictions": prediction_store.table.freshness() if prediction_store.table is not None else None,
+        "model": model_registry.current.version,
+        "cpu_jobs": {"executor": cpu_executor.kind, "pending": cpu_executor.pending, "max_pending": cpu_executor.max_pending}
     }
 
-async def process_new_listing(parking_id: str, feature_data: dict):
-    """Process a single new listing and call backend with price."""
+@app.get("/metrics")
+async def get_metrics():
+    """Histograms of inference batch sizes, queue waits, model latency, request stages and request totals."""
+    return metrics_snapshot()
+
+
+def require_admin(x_admin_secret: Optional[str]):
+    if ML_ADMIN_SECRET is None or x_admin_secret != ML_ADMIN_SECRET:
+        raise HTTPException(status_code=403, detail="Invalid admin secret")
+
+
+@app.get("/admin/model")
+async def get_model_info(x_admin_secret: Optional[str] = Header(None)):
+    """Active model version, load/warm-up time and memory footprint, plus the model files on disk."""
+    require_admin(x_admin_secret)
+    return {"active": model_registry.current.info(), "available": model_registry.available()}
+
+
+@app.post("/admin/model/activate")
+async def activate_model(payload: dict = Body(...), x_admin_secret: Optional[str] = Header(None)):
+    """Hot-swap the occupancy model.
+
+    Body: { "file": "occupancy_regressor_model-v2.joblib" } (a file in MODEL_DIR).
+    The model is loaded and warmed up before it replaces the current one; other
+    workers follow within MODEL_WATCH_SECONDS. Shared predictions of the
+    previous model are deleted.
+    """
+    require_admin(x_admin_secret)
+    if not payload or not payload.get("file"):
+        raise HTTPException(status_code=400, detail="Missing file in payload")
+    previous = model_registry.current.version
     try:
-        # Convert to DataFrame (single row)
-        df = pd.DataFrame([feature_data])
-        
-        # Get predictions including dynamic price
-        predictions = predict_parking_dynamics(df)
-        if predictions.empty:
-            logger.error(f"Failed to generate predictions for parking {parking_id}")
-            return
-        
-        # Extract the predicted price
-        price = float(predictions.iloc[0]['PredictedDynamicPricePerHour'])
-        
-        # Call backend price-callback endpoint
-        async with httpx.AsyncClient(timeout=10) as client:
-            callback_url = f"{BACKEND_URL.rstrip('/')}/parkings/{parking_id}/price-callback"
-            headers = {
-                "X-ML-Secret": ML_CALLBACK_SECRET,
-                "Content-Type": "application/json"
-            }
-            
-            logger.info(f"Calling backend callback for parking {parking_id} with price {price}")
-            response = await client.post(
-                callback_url,
-                headers=headers,
-                json={
-                    "price_per_hour": float(price)  # Ensure price is float
-                }
-            )
-            
-            response_text = await response.aread()
-            if response.status_code == 200:
-                logger.info(f"Successfully set price {price} for parking {parking_id}")
-                # Add to processed set to avoid duplicates
-                processed_listings.add(parking_id)
-            else:
-                logger.error(f"Failed to set price for parking {parking_id}: {response.status_code} - {response_text.decode()}")
-                # Log more details for debugging
-                logger.error(f"Request details: URL={callback_url}, Headers={headers}, Payload={{'price_per_hour': {price}}}")
-    
+        loaded = await asyncio.to_thread(model_registry.publish, str(payload["file"]))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
-        logger.error(f"Error processing parking {parking_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Model activation failed: {str(e)}")
+    if prediction_cache.enabled and loaded.version != previous:
+        # Predictions of the old model are never read again; free them for every replica
+        try:
+            await prediction_cache.invalidate(previous)
+        except Exception as e:
+            logger.warning(f"Could not invalidate cached predictions of {previous}: {str(e)}")
+    return {"status": "success", "active": loaded.info()}
 
-async def check_new_listings():
-    """Background task to check for new listings and process them."""
+async def refresh_feature_snapshot():
+    """Background task keeping the feature snapshot current."""
     while True:
         try:
-            # Query recent entries from parking_features
-            response = supabase.schema("parking").table("parking_features")\
-                .select("*")\
-                .order('created_at', desc=True)\
-                .limit(10)\
-                .execute()
-            
-            if response.data:
-                for feature in response.data:
-                    # Extract parking_id from SystemCodeNumber (format: LISTING_<id>)
-                    if not feature.get('SystemCodeNumber', '').startswith('LISTING_'):
-                        continue
-                        
-                    parking_id = feature['SystemCodeNumber'].split('_')[1]
-                    
-                    # Skip if already processed
-                    if parking_id in processed_listings:
-                        continue
-                    
-                    logger.info(f"Processing new parking: {parking_id}")
-                    await process_new_listing(parking_id, feature)
-            
+            await asyncio.to_thread(feature_snapshot.refresh)
         except Exception as e:
-            logger.error(f"Error checking new listings: {str(e)}")
-        
-        # Wait before next check
-        await asyncio.sleep(5)  # Check every 5 seconds
+            logger.error(f"Error refreshing feature snapshot: {str(e)}")
+        await asyncio.sleep(SNAPSHOT_REFRESH_SECONDS)
+
+async def refresh_prediction_store():
+    """Background task recomputing predictions after feature updates and at each hour boundary."""
+    while True:
+        try:
+            await refresh_prediction_table()
+        except Exception as e:
+            logger.error(f"Error recomputing predictions: {str(e)}")
+        await asyncio.sleep(PREDICTION_REFRESH_SECONDS)
+
+async def watch_model_registry():
+    """Background task following model swaps published by other workers."""
+    while True:
+        await asyncio.sleep(MODEL_WATCH_SECONDS)
+        try:
+            await asyncio.to_thread(model_registry.sync)
+        except Exception as e:
+            logger.error(f"Error syncing model registry: {str(e)}")
+
+def restore_feature_store():
+    """Install the persisted snapshot and, if still current, its predictions."""
+    started = time.perf_counter()
+    restored = feature_store.load()
+    if restored is None:
+        return
+    frame, watermark, table = restored
+    version = feature_snapshot.restore(frame, watermark)
+    if table is not None:
+        table.snapshot_version = version
+        # A table from another hour or model is stale at once and rebuilt by the refresh loop
+        prediction_store.install(table)
+    logger.info(f"Warm start from {FEATURE_STORE_DIR} in {time.perf_counter() - started:.3f}s")
+
+
+_saved_version = None
+
+def save_feature_store():
+    """Persist the snapshot (and its predictions) if it changed since the last save."""
+    global _saved_version
+    frame, version = feature_snapshot.frame, feature_snapshot.version
+    if not feature_snapshot.loaded or version == _saved_version:
+        return
+    feature_store.save(frame, feature_snapshot.watermark, version, prediction_store.table)
+    _saved_version = version
+
+async def persist_feature_store():
+    """Background task writing the local feature store."""
+    while True:
+        await asyncio.sleep(FEATURE_STORE_SAVE_SECONDS)
+        try:
+            await asyncio.to_thread(save_feature_store)
+        except Exception as e:
+            logger.error(f"Error saving feature store: {str(e)}")
 
 @app.on_event("startup")
 async def startup_event():
-    """Start background task on app startup."""
-    asyncio.create_task(check_new_listings())
+    """Start background tasks on app startup."""
+    if FEATURE_STORE_DIR:
+        try:
+            await asyncio.to_thread(restore_feature_store)
+        except Exception as e:
+            logger.error(f"Error restoring feature store, loading from Supabase: {str(e)}")
+        asyncio.create_task(persist_feature_store())
+    asyncio.create_task(refresh_feature_snapshot())
+    asyncio.create_task(refresh_prediction_store())
+    asyncio.create_task(watch_model_registry())
+    app.state.pricing_worker = ListingPricingWorker()
+    app.state.pricing_task = asyncio.create_task(app.state.pricing_worker.run())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    app.state.pricing_task.cancel()
+    try:
+        await app.state.pricing_worker.close()
+    except Exception as e:
+        logger.error(f"Error closing listing pricing worker: {str(e)}")
+    cpu_executor.shutdown()
+    if FEATURE_STORE_DIR:
+        try:
+            save_feature_store()
+        except Exception as e:
+            logger.error(f"Error saving feature store: {str(e)}")
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,95 @@
+"""In-process metrics: fixed-bucket histograms and counters, reported by GET /metrics."""
+import bisect
+import threading
+from typing import Dict, List, Optional, Sequence
+
+# Milliseconds, for latencies
+LATENCY_BUCKETS_MS = (0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+# Counts, for batch sizes
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096, 16384, 65536)
+
+
+class Histogram:
+    def __init__(self, buckets: Sequence[float]):
+        self.bounds = list(buckets)
+        # One count per bound plus an overflow bucket
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.bounds, value)] += 1
+            self.count += 1
+            self.sum += value
+            self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-th quantile (max for the overflow bucket)."""
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "count": self.count,
+                "sum": round(self.sum, 3),
+                "mean": round(self.sum / self.count, 3) if self.count else None,
+                "max": round(self.max, 3),
+                "p50": self.quantile(0.5),
+                "p95": self.quantile(0.95),
+                "p99": self.quantile(0.99),
+                "buckets": {
+                    **{f"le_{bound:g}": count for bound, count in zip(self.bounds, self.counts)},
+                    "overflow": self.counts[-1],
+                },
+            }
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: int = 1):
+        with self._lock:
+            self.value += amount
+
+    def snapshot(self) -> Dict:
+        return {"count": self.value}
+
+
+_histograms: Dict[str, Histogram] = {}
+_counters: Dict[str, Counter] = {}
+_registry_lock = threading.Lock()
+
+
+def histogram(name: str, buckets: Sequence[float] = LATENCY_BUCKETS_MS) -> Histogram:
+    """The histogram registered under name, created on first use."""
+    with _registry_lock:
+        if name not in _histograms:
+            _histograms[name] = Histogram(buckets)
+        return _histograms[name]
+
+
+def counter(name: str) -> Counter:
+    """The counter registered under name, created on first use."""
+    with _registry_lock:
+        if name not in _counters:
+            _counters[name] = Counter()
+        return _counters[name]
+
+
+def snapshot(names: Optional[List[str]] = None) -> Dict[str, Dict]:
+    with _registry_lock:
+        selected = {n: m for n, m in {**_histograms, **_counters}.items() if names is None or n in names}
+    return {name: m.snapshot() for name, m in sorted(selected.items())}
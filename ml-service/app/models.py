@@ -1,9 +1,183 @@
+"""Model registry: versioned, memory-mapped, hot-swappable models.
+
+Models are joblib files in MODEL_DIR. The active one is named by the
+ACTIVE_MODEL pointer file there (OCCUPANCY_MODEL_FILE when it is absent), so
+every worker process converges on the same model: activating a model writes
+the pointer, and each worker's watch loop reloads when the pointer or the
+file it names changes.
+
+Files are loaded with mmap_mode="r", so numpy arrays inside the pickle are
+mapped read-only from the page cache and shared between workers instead of
+copied into each one. A new model is loaded and warmed up before it replaces
+the current one, and callers that already hold the old model finish with it.
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional
+
 import joblib
+import numpy as np
+import pandas as pd
+
+from .config import MODEL_DIR, OCCUPANCY_MODEL_FILE
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_POINTER = "ACTIVE_MODEL"
+WARMUP_ROWS = 64
+
+FEATURE_COLS = [
+    'SystemCodeNumber', 'Capacity', 'DayName', 'VehicleType', 'TrafficConditionNearby',
+    'IsSpecialDay', 'Hour', 'DayOfWeek', 'IsWeekend', 'IsHoliday', 'TimeCategory',
+    'EstimatedDuration_Minutes', 'IsSpecialDay_Flag', 'Hour_sin', 'Hour_cos',
+    'DayOfWeek_sin', 'DayOfWeek_cos'
+]
+
+
+def _rss_bytes() -> Optional[int]:
+    """Resident set size of this process (Linux only)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _file_digest(path: str) -> str:
+    h = hashlib.blake2b(digest_size=6)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _file_state(path: str):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+class LoadedModel:
+    def __init__(self, model, file: str, path: str):
+        self.model = model
+        self.file = file
+        self.path = path
+        self.file_state = _file_state(path)
+        # Content-derived, so every worker reports the same version for the same file
+        self.version = f"{os.path.splitext(file)[0]}@{_file_digest(path)}"
+        self.loaded_at = time.time()
+        self.load_seconds = 0.0
+        self.warmup_seconds = 0.0
+        self.file_bytes = self.file_state[1]
+        self.rss_delta_bytes: Optional[int] = None
+
+    def info(self) -> Dict:
+        return {
+            "version": self.version,
+            "file": self.file,
+            "loaded_at": self.loaded_at,
+            "load_seconds": round(self.load_seconds, 4),
+            "warmup_seconds": round(self.warmup_seconds, 4),
+            "file_bytes": self.file_bytes,
+            "rss_delta_bytes": self.rss_delta_bytes,
+        }
+
+
+class ModelRegistry:
+    def __init__(self, model_dir: str = MODEL_DIR, default_file: str = OCCUPANCY_MODEL_FILE):
+        self.model_dir = model_dir
+        self.default_file = default_file
+        self.current: Optional[LoadedModel] = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        """The active model; grab it once per batch so a swap cannot split the batch."""
+        return self.current.model
+
+    def _path(self, file: str) -> str:
+        # Only plain file names inside MODEL_DIR: joblib files are pickles
+        if os.path.basename(file) != file or file in ("", ".", "..", ACTIVE_POINTER):
+            raise ValueError(f"Invalid model file name: {file!r}")
+        path = os.path.join(self.model_dir, file)
+        if not os.path.isfile(path):
+            raise FileNotFoundError(f"Model file not found: {path}")
+        return path
+
+    def active_file(self) -> str:
+        try:
+            with open(os.path.join(self.model_dir, ACTIVE_POINTER)) as f:
+                return f.read().strip() or self.default_file
+        except FileNotFoundError:
+            return self.default_file
+
+    def _load(self, file: str) -> LoadedModel:
+        path = self._path(file)
+        rss_before = _rss_bytes()
+        started = time.perf_counter()
+        loaded = LoadedModel(joblib.load(path, mmap_mode="r"), file, path)
+        loaded.load_seconds = time.perf_counter() - started
+
+        # Warm up before the switch so the first real request doesn't pay for lazy init
+        started = time.perf_counter()
+        warmup = pd.DataFrame(np.zeros((WARMUP_ROWS, len(FEATURE_COLS))), columns=FEATURE_COLS)
+        warmup['Capacity'] = 1
+        loaded.model.predict(warmup)
+        loaded.warmup_seconds = time.perf_counter() - started
+
+        rss_after = _rss_bytes()
+        if rss_before is not None and rss_after is not None:
+            loaded.rss_delta_bytes = rss_after - rss_before
+        return loaded
+
+    def activate(self, file: str) -> LoadedModel:
+        """Load, warm up and switch to a model file in this process."""
+        with self._lock:
+            loaded = self._load(file)
+            previous = self.current
+            self.current = loaded
+        logger.info(f"Model {loaded.version} active (load {loaded.load_seconds:.3f}s, "
+                    f"warm-up {loaded.warmup_seconds:.3f}s, rss +{loaded.rss_delta_bytes} bytes)"
+                    + (f", replaced {previous.version}" if previous else ""))
+        return loaded
+
+    def publish(self, file: str) -> LoadedModel:
+        """Activate a model here and point every other worker at it."""
+        loaded = self.activate(file)
+        pointer = os.path.join(self.model_dir, ACTIVE_POINTER)
+        tmp = f"{pointer}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            f.write(file)
+        os.replace(tmp, pointer)
+        return loaded
+
+    def sync(self) -> bool:
+        """Reload if the pointer names another file or the active file was replaced."""
+        file = self.active_file()
+        current = self.current
+        if current is not None and current.file == file:
+            try:
+                if _file_state(current.path) == current.file_state:
+                    return False
+            except FileNotFoundError:
+                return False
+        self.activate(file)
+        return True
+
+    def available(self) -> list:
+        return sorted(
+            name for name in os.listdir(self.model_dir)
+            if name.endswith(".joblib") and os.path.isfile(os.path.join(self.model_dir, name))
+        )
+
+
+model_registry = ModelRegistry()
 
 # Load models
 try:
-    loaded_occupancy_model = joblib.load('./models/occupancy_regressor_model.joblib')
-    # loaded_dynamic_price_model = joblib.load('dynamic_price_model.joblib')
+    model_registry.sync()
     print("Models loaded successfully.")
 except FileNotFoundError as e:
     print(f"Error loading models: {e}")
@@ -0,0 +1,158 @@
+"""Prediction tables shared between ML-service replicas through Redis.
+
+A table is stored as one entry per grid cell plus a meta entry, all keyed by
+model version and hour bucket:
+
+    predictions:<model_version>:<hour_bucket>:meta          {"watermark", "cells", "spots"}
+    predictions:<model_version>:<hour_bucket>:cell:<i>:<j>  {"codes", "lat", "lon", "probability", "radius"}
+
+Entries expire at the end of their hour, so an hour rollover needs no
+invalidation; a model swap changes the key prefix and the old model's keys
+are deleted. The replica that rebuilds takes a short lock, so the others
+wait for its result and read it instead of running the same batch.
+A table only counts as a hit if it was built from features at least as
+recent as the reader's own snapshot (compared by created_at watermark).
+
+Spots without coordinates are never returned by nearby queries and are not
+cached.
+"""
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import redis.asyncio as redis
+
+from .config import REDIS_URL, PREDICTION_CACHE_ENABLED, PREDICTION_CACHE_WAIT_SECONDS
+from .prediction_store import PredictionTable
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "predictions"
+LOCK_SECONDS = 120
+POLL_SECONDS = 0.5
+# Keeps entries readable for requests that straddle the hour boundary
+EXPIRY_GRACE_SECONDS = 60
+
+# Delete the lock only while ARGV[1] still holds it: after it expired,
+# another replica may have taken it
+_RELEASE_LOCK = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def _prefix(model_version: str, hour_bucket: int) -> str:
+    return f"{KEY_PREFIX}:{model_version}:{hour_bucket}"
+
+
+class PredictionCache:
+    def __init__(self, redis_client=None, enabled: bool = PREDICTION_CACHE_ENABLED,
+                 wait_seconds: float = PREDICTION_CACHE_WAIT_SECONDS):
+        self.enabled = enabled
+        self.redis = redis_client or (redis.from_url(REDIS_URL, socket_timeout=2, socket_connect_timeout=2)
+                                      if enabled else None)
+        self.wait_seconds = wait_seconds
+        self.owner = f"{socket.gethostname()}-{os.getpid()}"
+
+    async def load(self, model_version: str, hour_bucket: int, watermark: Optional[pd.Timestamp],
+                   snapshot_version: int) -> Optional[PredictionTable]:
+        """The shared table for this model and hour, if one built from recent enough features exists."""
+        prefix = _prefix(model_version, hour_bucket)
+        meta = await self.redis.get(f"{prefix}:meta")
+        if meta is None:
+            return None
+        meta = json.loads(meta)
+        if watermark is not None and (meta["watermark"] is None or pd.Timestamp(meta["watermark"]) < watermark):
+            return None
+
+        cells = await self.redis.mget([f"{prefix}:cell:{cell}" for cell in meta["cells"]]) if meta["cells"] else []
+        if any(cell is None for cell in cells):
+            return None
+        cells = [json.loads(cell) for cell in cells]
+
+        def column(name, dtype):
+            return np.array([v for cell in cells for v in cell[name]], dtype=dtype)
+
+        return PredictionTable(
+            column("codes", object), column("lat", np.float64), column("lon", np.float64),
+            column("probability", np.float64), column("radius", np.int16),
+            snapshot_version, hour_bucket, model_version,
+        )
+
+    async def store(self, table: PredictionTable, watermark: Optional[pd.Timestamp]):
+        """Publish a freshly built table, unless one from newer features is already shared."""
+        prefix = _prefix(table.model_version, table.hour_bucket)
+        existing = await self.redis.get(f"{prefix}:meta")
+        if existing is not None and watermark is not None:
+            shared = json.loads(existing)["watermark"]
+            if shared is not None and pd.Timestamp(shared) > watermark:
+                return
+
+        expire_at = (table.hour_bucket + 1) * 3600 + EXPIRY_GRACE_SECONDS
+        cells = []
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for (i, j), (start, end) in table.index.cells.items():
+                positions = table.index.order[start:end]
+                cell = f"{i}:{j}"
+                cells.append(cell)
+                pipe.set(f"{prefix}:cell:{cell}", json.dumps({
+                    "codes": table.system_codes[positions].tolist(),
+                    "lat": table.lat[positions].tolist(),
+                    "lon": table.lon[positions].tolist(),
+                    "probability": table.probability[positions].tolist(),
+                    "radius": table.radius[positions].tolist(),
+                }), exat=expire_at)
+            # Written last: readers never see a meta entry whose cells are missing
+            pipe.set(f"{prefix}:meta", json.dumps({
+                "watermark": watermark.isoformat() if watermark is not None else None,
+                "cells": cells,
+                "spots": len(table.index),
+                "generated_at": table.generated_at,
+                "by": self.owner,
+            }), exat=expire_at)
+            await pipe.execute()
+        logger.info(f"Shared prediction table: {len(table.index)} spots in {len(cells)} cells ({prefix})")
+
+    async def acquire(self, model_version: str, hour_bucket: int) -> bool:
+        """Claim the rebuild for this model and hour; False if another replica holds it."""
+        return bool(await self.redis.set(f"{_prefix(model_version, hour_bucket)}:lock", self.owner,
+                                         nx=True, ex=LOCK_SECONDS))
+
+    async def release(self, model_version: str, hour_bucket: int):
+        await self.redis.eval(_RELEASE_LOCK, 1, f"{_prefix(model_version, hour_bucket)}:lock", self.owner)
+
+    async def wait_for(self, model_version: str, hour_bucket: int, watermark: Optional[pd.Timestamp],
+                       snapshot_version: int) -> Optional[PredictionTable]:
+        """Poll for the table another replica is building, for up to wait_seconds."""
+        deadline = time.monotonic() + self.wait_seconds
+        while time.monotonic() < deadline:
+            await asyncio.sleep(POLL_SECONDS)
+            table = await self.load(model_version, hour_bucket, watermark, snapshot_version)
+            if table is not None:
+                return table
+        return None
+
+    async def invalidate(self, model_version: str) -> int:
+        """Delete every entry of a model version; returns the number of keys removed."""
+        removed = 0
+        keys = []
+        async for key in self.redis.scan_iter(match=f"{KEY_PREFIX}:{model_version}:*", count=1000):
+            keys.append(key)
+            if len(keys) >= 1000:
+                removed += await self.redis.delete(*keys)
+                keys = []
+        if keys:
+            removed += await self.redis.delete(*keys)
+        logger.info(f"Invalidated {removed} cached prediction keys of model {model_version}")
+        return removed
+
+
+prediction_cache = PredictionCache()
@@ -0,0 +1,141 @@
+"""Precomputed free-parking predictions served from memory.
+
+Predictions only change when the feature snapshot changes, the hour rolls
+over or another model is activated, so the model is run over every spot in one batch at those points and
+requests are answered from the stored arrays.
+"""
+import logging
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .models import model_registry
+from .predictions import compute_free_parking_predictions
+from .snapshot import feature_snapshot
+from .spatial import GridIndex
+from .timing import stage
+
+logger = logging.getLogger(__name__)
+
+
+def current_hour_bucket(now: Optional[float] = None) -> int:
+    return int((time.time() if now is None else now) // 3600)
+
+
+class PredictionTable:
+    """One immutable batch of predictions, stored column-wise."""
+
+    def __init__(self, system_codes: np.ndarray, lat: np.ndarray, lon: np.ndarray,
+                 probability: np.ndarray, radius: np.ndarray,
+                 snapshot_version: int, hour_bucket: int, model_version: str):
+        self.system_codes = system_codes
+        self.lat = lat
+        self.lon = lon
+        self.probability = probability
+        self.radius = radius
+        self.snapshot_version = snapshot_version
+        self.hour_bucket = hour_bucket
+        self.model_version = model_version
+        self.generated_at = time.time()
+        self.index = GridIndex(lat, lon)
+
+    def __len__(self) -> int:
+        return len(self.system_codes)
+
+    def nearby(self, lat: float, lon: float, radius_meters: Optional[float] = None,
+               limit: Optional[int] = None) -> List[Dict]:
+        """Response rows for spots near (lat, lon), nearest first.
+
+        Only the matching spots are serialized.
+        """
+        with stage("spatial"):
+            positions, distances = self.index.query(lat, lon, radius_meters, limit)
+        with stage("serialize"):
+            return self._records(positions, distances)
+
+    def _records(self, positions: np.ndarray, distances: np.ndarray) -> List[Dict]:
+        return [
+            {
+                "systemCode": code,
+                "lat": spot_lat,
+                "lon": spot_lon,
+                "availabilityProbability": probability,
+                "radius": radius,
+                "distanceMeters": round(distance, 1),
+            }
+            for code, spot_lat, spot_lon, probability, radius, distance in zip(
+                self.system_codes[positions].tolist(),
+                self.lat[positions].tolist(),
+                self.lon[positions].tolist(),
+                self.probability[positions].tolist(),
+                self.radius[positions].tolist(),
+                distances.tolist(),
+            )
+        ]
+
+    def freshness(self) -> Dict:
+        return {
+            "generated_at": self.generated_at,
+            "age_seconds": round(time.time() - self.generated_at, 3),
+            "snapshot_version": self.snapshot_version,
+            "hour_bucket": self.hour_bucket,
+            "model_version": self.model_version,
+        }
+
+
+def latest_per_spot(df: pd.DataFrame) -> pd.DataFrame:
+    """The latest row of every spot (by Timestamp), since a snapshot holds several per spot."""
+    return df.assign(_ts=pd.to_datetime(df['Timestamp'], errors='coerce', utc=True))\
+        .sort_values('_ts', kind='stable')\
+        .drop_duplicates('SystemCodeNumber', keep='last')\
+        .drop(columns='_ts')\
+        .reset_index(drop=True)
+
+
+def build_table(df, snapshot_version: int, hour_bucket: int) -> PredictionTable:
+    """Predictions for the latest row of every spot in a snapshot, in one model batch."""
+    started = time.perf_counter()
+    model_version = model_registry.current.version
+    if not df.empty:
+        df = latest_per_spot(df)
+    if df.empty:
+        table = PredictionTable(
+            np.array([], dtype=object), np.array([], dtype=np.float64), np.array([], dtype=np.float64),
+            np.array([], dtype=np.float64), np.array([], dtype=np.int16), snapshot_version, hour_bucket, model_version,
+        )
+    else:
+        processed = compute_free_parking_predictions(df)
+        table = PredictionTable(
+            processed['OriginalSystemCode'].astype(str).to_numpy(dtype=object),
+            processed['Latitude'].to_numpy(dtype=np.float64),
+            processed['Longitude'].to_numpy(dtype=np.float64),
+            processed['availability_probability'].to_numpy(dtype=np.float64),
+            processed['availability_radius'].to_numpy(dtype=np.int16),
+            snapshot_version, hour_bucket, model_version,
+        )
+    logger.info(f"Prediction table built: {len(table)} spots in {time.perf_counter() - started:.2f}s "
+                f"(snapshot v{snapshot_version}, hour {hour_bucket})")
+    return table
+
+
+class PredictionStore:
+    def __init__(self):
+        self.table: Optional[PredictionTable] = None
+
+    def is_stale(self) -> bool:
+        table = self.table
+        return (
+            table is None
+            or table.snapshot_version != feature_snapshot.version
+            or table.hour_bucket != current_hour_bucket()
+            or table.model_version != model_registry.current.version
+        )
+
+    def install(self, table: PredictionTable):
+        # Readers hold a reference to the old table, so a plain swap is safe
+        self.table = table
+
+
+prediction_store = PredictionStore()
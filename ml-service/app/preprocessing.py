@@ -1,71 +1,112 @@
+import zlib
+
 import pandas as pd
 import numpy as np
 import pytz
-import holidays
+
+from .config import LOCAL_TIMEZONE, HOLIDAY_COUNTRY, HOLIDAY_SUBDIVISION
+from .holiday_calendar import holiday_calendar
+
+# The column keeps its historical name; the timezone is LOCAL_TIMEZONE
+local_tz = pytz.timezone(LOCAL_TIMEZONE)
+
+# Mappings
+vehicle_map = {'car':0,'bike':1,'cycle':2,'truck':3}
+traffic_map = {'low':0,'medium':1,'high':2}
+# TimeCategory codes: Evening 0, Night 1, Afternoon 2, Morning 3
+EVENING, NIGHT, AFTERNOON, MORNING = 0, 1, 2, 3
+
+# Estimated duration by (TimeCategory, IsWeekend, IsHoliday); combinations
+# not listed use DEFAULT_DURATION
+DEFAULT_DURATION = 164.16
+avg_duration = {
+    (AFTERNOON, 0, 0): 167.245646, (AFTERNOON, 1, 0): 167.477519,
+    (EVENING, 0, 0): 164.332264, (EVENING, 1, 0): 162.501357,
+    (NIGHT, 0, 0): 163.594921, (NIGHT, 1, 0): 164.153896,
+    (MORNING, 0, 0): 164.16, (MORNING, 1, 0): 164.16,
+}
+duration_table = np.full((4, 2, 2), DEFAULT_DURATION)
+for (category, weekend, holiday), minutes in avg_duration.items():
+    duration_table[category, weekend, holiday] = minutes
+
+SPOT_CODE_BUCKETS = 10000
+
+
+def stable_spot_code(code) -> int:
+    """Encoding of a SystemCodeNumber that is the same in every process.
+
+    (The builtin hash() is salted per process, so it is not usable here.)
+    """
+    return zlib.crc32(str(code).encode("utf-8")) % SPOT_CODE_BUCKETS
+
+
+def encode_spot_codes(codes: pd.Series) -> np.ndarray:
+    # Hash each distinct code once
+    if isinstance(codes.dtype, pd.CategoricalDtype):
+        # Missing values have code -1, i.e. the trailing "nan" entry, as astype(str) would give
+        positions = codes.cat.codes.to_numpy()
+        uniques = list(codes.cat.categories.astype(str)) + ["nan"]
+    else:
+        positions, uniques = pd.factorize(codes.astype(str))
+    lookup = np.fromiter((stable_spot_code(u) for u in uniques), dtype=np.int64, count=len(uniques))
+    return lookup[positions]
+
+
+def encode_labels(values: pd.Series, mapping: dict) -> np.ndarray:
+    """Integer code of each label through mapping; unknown and missing labels are -1."""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # Map the categories once instead of every row
+        lookup = np.array([mapping.get(c, -1) for c in values.cat.categories] + [-1], dtype=np.int64)
+        return lookup[values.cat.codes.to_numpy()]
+    return values.map(mapping).fillna(-1).astype(int).to_numpy()
+
 
 def preprocess_data(df):
     df = df.copy()
     df['Timestamp'] = pd.to_datetime(df['Timestamp'], errors='coerce')
-    wib = pytz.timezone("Asia/Jakarta")
     # Only localize if Timestamp is naive
     if df['Timestamp'].dt.tz is None:
-        df['Timestamp_WIB'] = df['Timestamp'].dt.tz_localize('UTC').dt.tz_convert(wib)
+        df['Timestamp_WIB'] = df['Timestamp'].dt.tz_localize('UTC').dt.tz_convert(local_tz)
     else:
-        df['Timestamp_WIB'] = df['Timestamp'].dt.tz_convert(wib)
-    
+        df['Timestamp_WIB'] = df['Timestamp'].dt.tz_convert(local_tz)
+    local = df['Timestamp_WIB']
+
     # Time features
-    df['Hour'] = df['Timestamp_WIB'].dt.hour
-    df['DayOfWeek'] = df['Timestamp_WIB'].dt.dayofweek
-    df['DayName'] = df['Timestamp_WIB'].dt.day_name()
+    df['Hour'] = local.dt.hour
+    df['DayOfWeek'] = local.dt.dayofweek
+    # DayName is encoded Monday=0..Sunday=6, i.e. the same as DayOfWeek
+    df['DayName'] = df['DayOfWeek'].fillna(-1).astype(int)
     df['IsWeekend'] = df['DayOfWeek'].isin([5,6]).astype(int)
-    
+
     # Holiday flag
-    id_holidays = holidays.country_holidays("ID")
-    df['IsHoliday'] = df['Timestamp_WIB'].dt.date.astype(str).isin(
-        [str(d) for d in id_holidays]
-    ).astype(int)
-    
+    df['IsHoliday'] = holiday_calendar(HOLIDAY_COUNTRY, HOLIDAY_SUBDIVISION).is_holiday(local)
+
     # Time category
-    def map_time_category(hour):
-        if 5 <= hour < 12: return "Morning"
-        if 12 <= hour < 17: return "Afternoon"
-        if 17 <= hour < 21: return "Evening"
-        return "Night"
-    df['TimeCategory'] = df['Hour'].apply(map_time_category)
-    
-    # Estimated duration
-    avg_duration = {
-        ('Afternoon', 0, 0): 167.245646, ('Afternoon', 1, 0): 167.477519,
-        ('Evening', 0, 0): 164.332264, ('Evening', 1, 0): 162.501357,
-        ('Night', 0, 0): 163.594921, ('Night', 1, 0): 164.153896,
-        ('Morning', 0, 0): 164.16, ('Morning', 1, 0): 164.16,
-    }
-    df['AvgDuration_Minutes'] = df.apply(
-        lambda row: avg_duration.get((row['TimeCategory'], row['IsWeekend'], row['IsHoliday']), 164.16), axis=1
+    hour = df['Hour'].to_numpy()
+    df['TimeCategory'] = np.select(
+        [(hour >= 5) & (hour < 12), (hour >= 12) & (hour < 17), (hour >= 17) & (hour < 21)],
+        [MORNING, AFTERNOON, EVENING],
+        default=NIGHT,
     )
+
+    # Estimated duration
+    df['AvgDuration_Minutes'] = duration_table[
+        df['TimeCategory'].to_numpy(), df['IsWeekend'].to_numpy(), df['IsHoliday'].to_numpy()
+    ]
     df['EstimatedDuration_Minutes'] = df['AvgDuration_Minutes'].round()
-    
+
     # Special day flag
     df['IsSpecialDay_Flag'] = df['IsSpecialDay'].astype(int)
-    
-    # Mappings
-    vehicle_map = {'car':0,'bike':1,'cycle':2,'truck':3}
-    day_map = {'Monday':0,'Tuesday':1,'Wednesday':2,'Thursday':3,'Friday':4,'Saturday':5,'Sunday':6}
-    time_map = {'Evening':0,'Night':1,'Afternoon':2,'Morning':3}
-    traffic_map = {'low':0,'medium':1,'high':2}
-    
-    # Use consistent hash-based encoding for SystemCodeNumber instead of dynamic mapping
-    # This ensures same parking spot always gets same encoded value
-    df['SystemCodeNumber'] = df['SystemCodeNumber'].apply(lambda x: hash(str(x)) % 10000).astype(int)
-    df['VehicleType'] = df['VehicleType'].map(vehicle_map).fillna(-1).astype(int)
-    df['DayName'] = df['DayName'].map(day_map).fillna(-1).astype(int)
-    df['TimeCategory'] = df['TimeCategory'].map(time_map).fillna(-1).astype(int)
-    df['TrafficConditionNearby'] = df['TrafficConditionNearby'].map(traffic_map).fillna(-1).astype(int)
-    
+
+    # Stable encoding so the same parking spot gets the same value in every worker
+    df['SystemCodeNumber'] = encode_spot_codes(df['SystemCodeNumber'])
+    df['VehicleType'] = encode_labels(df['VehicleType'], vehicle_map)
+    df['TrafficConditionNearby'] = encode_labels(df['TrafficConditionNearby'], traffic_map)
+
     # Sin/Cos encoding
     df['Hour_sin'] = np.sin(2*np.pi*df['Hour']/24)
     df['Hour_cos'] = np.cos(2*np.pi*df['Hour']/24)
     df['DayOfWeek_sin'] = np.sin(2*np.pi*df['DayOfWeek']/7)
     df['DayOfWeek_cos'] = np.cos(2*np.pi*df['DayOfWeek']/7)
-    
+
     return df
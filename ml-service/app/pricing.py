@@ -0,0 +1,110 @@
+"""Vectorized dynamic pricing driven by a rule table.
+
+price = base_price * occupancy_factor * traffic_multiplier * event_multiplier
+
+where occupancy_factor is read off a piecewise-linear curve of predicted
+occupancy ratio. The rules can be loaded from a JSON file of the form
+
+    {
+      "base_price": 10.0,
+      "traffic_multipliers": {"low": 1.0, "medium": 1.15, "high": 1.4},
+      "event_multiplier": 1.3,
+      "occupancy_curve": [[0.0, 1.0], [1.0, 2.0]],
+      "zones": [
+        {"name": "station", "bbox": [73.87, 18.52, 73.88, 18.53], "base_price": 20.0}
+      ]
+    }
+
+Each zone overrides any of the top-level rules for spots inside its bbox
+([min_lng, min_lat, max_lng, max_lat]); later zones win where zones overlap.
+"""
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Traffic codes as encoded by preprocess_data; unknown (-1) prices as low
+TRAFFIC_LEVELS = ['low', 'medium', 'high']
+
+DEFAULT_RULES: Dict[str, Any] = {
+    "base_price": 10.0,
+    "traffic_multipliers": {"low": 1.0, "medium": 1.15, "high": 1.4},
+    "event_multiplier": 1.3,
+    # 1 + occupancy ratio: empty lots at base price, full lots at double
+    "occupancy_curve": [[0.0, 1.0], [1.0, 2.0]],
+    "zones": [],
+}
+
+RULE_KEYS = ("base_price", "traffic_multipliers", "event_multiplier", "occupancy_curve")
+
+
+class PricingRules:
+    """One set of pricing rules compiled into lookup arrays."""
+
+    def __init__(self, rules: Dict[str, Any]):
+        self.base_price = float(rules["base_price"])
+        multipliers = rules["traffic_multipliers"]
+        # Index with traffic code + 1, so -1 (unknown) lands on slot 0
+        self.traffic_lookup = np.array(
+            [multipliers.get('low', 1.0)] + [multipliers.get(level, 1.0) for level in TRAFFIC_LEVELS],
+            dtype=np.float64,
+        )
+        self.event_multiplier = float(rules["event_multiplier"])
+        curve = sorted((float(x), float(y)) for x, y in rules["occupancy_curve"])
+        if not curve:
+            raise ValueError("occupancy_curve needs at least one point")
+        self.curve_x = np.array([x for x, _ in curve])
+        self.curve_y = np.array([y for _, y in curve])
+
+    def price(self, occupancy_ratio: np.ndarray, traffic_code: np.ndarray, is_special: np.ndarray) -> np.ndarray:
+        codes = np.clip(traffic_code.astype(np.int64), -1, len(TRAFFIC_LEVELS) - 1) + 1
+        return (
+            self.base_price
+            * np.interp(occupancy_ratio, self.curve_x, self.curve_y)
+            * self.traffic_lookup[codes]
+            * np.where(is_special.astype(bool), self.event_multiplier, 1.0)
+        )
+
+
+class PricingEngine:
+    def __init__(self, rules: Optional[Dict[str, Any]] = None):
+        rules = {**DEFAULT_RULES, **(rules or {})}
+        self.default = PricingRules(rules)
+        self.zones: List[tuple] = []
+        for zone in rules.get("zones") or []:
+            bbox = [float(v) for v in zone["bbox"]]
+            if len(bbox) != 4:
+                raise ValueError(f"Zone {zone.get('name')!r} bbox must be [min_lng, min_lat, max_lng, max_lat]")
+            overrides = {key: zone.get(key, rules[key]) for key in RULE_KEYS}
+            self.zones.append((zone.get("name", ""), bbox, PricingRules(overrides)))
+
+    @classmethod
+    def from_file(cls, path: Optional[str]) -> "PricingEngine":
+        """Engine for the rules in a JSON file, or the default rules when path is empty."""
+        if not path:
+            return cls()
+        with open(path) as f:
+            rules = json.load(f)
+        engine = cls(rules)
+        logger.info(f"Loaded pricing rules from {path} ({len(engine.zones)} zones)")
+        return engine
+
+    def price(self, occupancy_ratio, traffic_code, is_special, lat=None, lon=None) -> np.ndarray:
+        """Price per hour for every row; lat/lon are only needed for zone overrides."""
+        occupancy_ratio = np.asarray(occupancy_ratio, dtype=np.float64)
+        traffic_code = np.asarray(traffic_code)
+        is_special = np.asarray(is_special)
+        prices = self.default.price(occupancy_ratio, traffic_code, is_special)
+        if not self.zones or lat is None or lon is None:
+            return prices
+
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        for _, (min_lng, min_lat, max_lng, max_lat), rules in self.zones:
+            inside = (lon >= min_lng) & (lon <= max_lng) & (lat >= min_lat) & (lat <= max_lat)
+            if inside.any():
+                prices[inside] = rules.price(occupancy_ratio[inside], traffic_code[inside], is_special[inside])
+        return prices
@@ -0,0 +1,204 @@
+"""Event-driven pricing of new listings.
+
+The backend appends a listing-created event to the listings:events Redis
+stream once a listing's features are stored. This worker consumes the
+stream with a consumer group, prices each batch of listings with one model
+call and hands the prices to a CallbackDispatcher (see callbacks.py), which
+posts them to the backend's price-callback endpoint concurrently and retries
+failures. The worker reads the next batch while earlier callbacks are still
+in flight.
+
+Progress lives in Redis: an event is acknowledged once its price was
+accepted or, after the dispatcher gave up, copied to the
+listings:pricing:dead stream with the failure reason. A restart resumes
+after the last acknowledged event; events a stopped consumer left
+unacknowledged are reclaimed after PRICING_RETRY_SECONDS. Events still in
+flight here are re-claimed on every loop so their idle time never reaches
+that threshold and no other consumer delivers them twice.
+"""
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+from typing import Dict, List, Set, Tuple
+
+import pandas as pd
+import redis.asyncio as redis
+from redis.exceptions import ResponseError
+
+from .callbacks import CallbackDispatcher, DeliveryResult
+from .config import supabase, REDIS_URL, PRICING_BATCH_SIZE, PRICING_RETRY_SECONDS
+from .metrics import histogram, counter
+from .predictions import predict_parking_dynamics_batched
+from .schema import typed_frame
+
+logger = logging.getLogger(__name__)
+
+LISTING_EVENTS_STREAM = "listings:events"
+DEAD_LETTER_STREAM = "listings:pricing:dead"
+DEAD_LETTER_MAXLEN = 10000
+GROUP = "ml-pricing"
+BLOCK_MS = 5000
+
+# From the listing-created event to the backend accepting its price
+event_to_price_ms = histogram("pricing.event_to_price_ms")
+dead_lettered = counter("pricing.dead_lettered")
+
+
+def fetch_listing_features(system_codes: List[str]) -> pd.DataFrame:
+    """Latest parking_features row of each listing."""
+    response = supabase.schema("parking").table("parking_features")\
+        .select("*")\
+        .in_("SystemCodeNumber", system_codes)\
+        .order("created_at", desc=True)\
+        .execute()
+    rows = typed_frame(response.data or [])
+    if rows.empty:
+        return rows
+    return rows.drop_duplicates("SystemCodeNumber", keep="first").reset_index(drop=True)
+
+
+class ListingPricingWorker:
+    def __init__(self, redis_client=None, dispatcher: CallbackDispatcher = None,
+                 batch_size: int = PRICING_BATCH_SIZE, retry_seconds: float = PRICING_RETRY_SECONDS):
+        self.redis = redis_client or redis.from_url(REDIS_URL)
+        self.dispatcher = dispatcher or CallbackDispatcher()
+        self.batch_size = batch_size
+        self.retry_ms = int(retry_seconds * 1000)
+        # Distinct per process, so every ML worker consumes its own share
+        self.consumer = f"{socket.gethostname()}-{os.getpid()}"
+        # Entry ids handed to the dispatcher and not acknowledged yet
+        self.inflight: Set[bytes] = set()
+
+    async def _ensure_group(self):
+        try:
+            # From the start of the stream: events published before the first deploy are priced too
+            await self.redis.xgroup_create(LISTING_EVENTS_STREAM, GROUP, id="0", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def _keep_inflight(self):
+        """Reset the idle time of events being delivered, so they are not reclaimed."""
+        if self.inflight:
+            await self.redis.xclaim(
+                LISTING_EVENTS_STREAM, GROUP, self.consumer, min_idle_time=0,
+                message_ids=list(self.inflight), justid=True,
+            )
+
+    async def _next_batch(self) -> List[Tuple[bytes, Dict]]:
+        await self._keep_inflight()
+        # Events another consumer (or a previous run) took but never acknowledged
+        claimed = await self.redis.xautoclaim(
+            LISTING_EVENTS_STREAM, GROUP, self.consumer, min_idle_time=self.retry_ms,
+            start_id="0-0", count=self.batch_size,
+        )
+        entries = [(entry_id, fields) for entry_id, fields in claimed[1] if entry_id not in self.inflight]
+        if len(entries) < self.batch_size:
+            # Don't block while there is retry work in hand
+            block = None if entries else BLOCK_MS
+            response = await self.redis.xreadgroup(
+                GROUP, self.consumer, {LISTING_EVENTS_STREAM: ">"},
+                count=self.batch_size - len(entries), block=block,
+            )
+            for _, stream_entries in response or []:
+                entries.extend(stream_entries)
+        return entries
+
+    async def _dead_letter(self, code: str, ids: List[bytes], price: float, result: DeliveryResult):
+        await self.redis.xadd(DEAD_LETTER_STREAM, {
+            "payload": json.dumps({
+                "system_code": code,
+                "price_per_hour": float(price),
+                "attempts": result.attempts,
+                "reason": result.reason,
+                "event_ids": [i.decode() if isinstance(i, bytes) else i for i in ids],
+                "failed_at": time.time(),
+            }),
+        }, maxlen=DEAD_LETTER_MAXLEN, approximate=True)
+        dead_lettered.inc()
+
+    def _finisher(self, code: str, ids: List[bytes], price: float, created_at: float):
+        async def finish(result: DeliveryResult):
+            try:
+                if result.ok:
+                    if created_at:
+                        event_to_price_ms.observe((time.time() - created_at) * 1000)
+                else:
+                    await self._dead_letter(code, ids, price, result)
+                await self.redis.xack(LISTING_EVENTS_STREAM, GROUP, *ids)
+            finally:
+                # Unacknowledged on a Redis error: the events are reclaimed and priced again
+                self.inflight.difference_update(ids)
+        return finish
+
+    async def process(self, entries: List[Tuple[bytes, Dict]]):
+        """Price one batch of events and hand the prices to the dispatcher.
+
+        Events are acknowledged as their callbacks finish; malformed events
+        and events without features are acknowledged here.
+        """
+        events: Dict[str, List[bytes]] = {}
+        created: Dict[str, float] = {}
+        done: List[bytes] = []
+        for entry_id, fields in entries:
+            try:
+                event = json.loads(fields[b"payload"])
+                events.setdefault(event["system_code"], []).append(entry_id)
+                created.setdefault(event["system_code"], event.get("created_at") or 0)
+            except (KeyError, ValueError, TypeError, AttributeError):
+                logger.error(f"Dropping malformed listing event {entry_id}")
+                done.append(entry_id)
+
+        dispatched = 0
+        if events:
+            features = await asyncio.to_thread(fetch_listing_features, list(events))
+            prices = {}
+            if not features.empty:
+                predictions = await predict_parking_dynamics_batched(features)
+                prices = dict(zip(features['SystemCodeNumber'], predictions['PredictedDynamicPricePerHour']))
+            for code, ids in events.items():
+                if code not in prices:
+                    # The backend publishes after the features are stored, so they won't show up later
+                    logger.error(f"No features for {code}, dropping its listing event")
+                    done.extend(ids)
+                    continue
+                self.inflight.update(ids)
+                await self.dispatcher.submit(
+                    code.split('_', 1)[1], prices[code],
+                    self._finisher(code, ids, prices[code], created[code]),
+                )
+                dispatched += 1
+
+        if done:
+            await self.redis.xack(LISTING_EVENTS_STREAM, GROUP, *done)
+        logger.info(f"Pricing batch: {len(entries)} events, {dispatched} prices dispatched, "
+                    f"{len(done)} dropped, {self.dispatcher.pending} callbacks in flight")
+
+    async def close(self, timeout: float = 10):
+        """Let in-flight callbacks finish (briefly) and close the HTTP client.
+
+        Events still unacknowledged are reclaimed after a restart.
+        """
+        await self.dispatcher.drain(timeout)
+        await self.dispatcher.aclose()
+
+    async def run(self):
+        while True:
+            try:
+                # Inside the loop: Redis may not be reachable yet when the service starts
+                await self._ensure_group()
+                break
+            except Exception as e:
+                logger.error(f"Listing pricing worker can't create its consumer group: {str(e)}")
+                await asyncio.sleep(5)
+        while True:
+            try:
+                entries = await self._next_batch()
+                if entries:
+                    await self.process(entries)
+            except Exception as e:
+                logger.error(f"Error in listing pricing worker: {str(e)}")
+                await asyncio.sleep(1)
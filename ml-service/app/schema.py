@@ -0,0 +1,116 @@
+"""Typed, compact columns for parking_features rows.
+
+Supabase returns rows as JSON dicts, so pd.DataFrame(rows) leaves most
+columns as Python objects: every row carries its own copy of strings like
+"car" or "medium" and of its timestamps. typed_frame() applies
+FEATURE_SCHEMA at ingestion instead: repeated strings become categoricals,
+small integers int8/int16, timestamps datetime64, and the time features the
+table stores (Hour, DayName, TimeCategory, ...) are dropped, since
+preprocess_data derives them from Timestamp anyway.
+
+Integer columns that hold nulls or values outside their type's range fall
+back to float32 (or float64 beyond float32's exact range) rather than
+failing. Columns not in the schema are kept as they are.
+"""
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+# Column -> dtype; None drops the column
+FEATURE_SCHEMA: Dict[str, Optional[str]] = {
+    "id": "int64",
+    "ID": "int32",
+    "SystemCodeNumber": "category",
+    # Full precision: the spatial index and responses use exact coordinates
+    "Latitude": "float64",
+    "Longitude": "float64",
+    "Capacity": "int16",
+    "Occupancy": "int16",
+    "QueueLength": "int8",
+    "VehicleType": "category",
+    "TrafficConditionNearby": "category",
+    "IsSpecialDay": "int8",
+    "Timestamp": "datetime",
+    "created_at": "datetime",
+    # Derived again by preprocess_data
+    "Timestamp_WIB": None,
+    "Hour": None,
+    "DayOfWeek": None,
+    "DayName": None,
+    "IsWeekend": None,
+    "IsHoliday": None,
+    "TimeCategory": None,
+    "Duration_Minutes": None,
+    "EstimatedDuration_Minutes": None,
+    "updated_at": None,
+}
+
+FLOAT32_EXACT = 2 ** 24
+
+
+def _integer_column(values: pd.Series, dtype: str) -> pd.Series:
+    numeric = pd.to_numeric(values, errors="coerce")
+    info = np.iinfo(dtype)
+    if numeric.notna().all() and (numeric.empty or (numeric.min() >= info.min and numeric.max() <= info.max)):
+        return numeric.astype(dtype)
+    # Nulls or out of range: floats keep every value (NaN for nulls)
+    fits_float32 = numeric.abs().max() < FLOAT32_EXACT if numeric.notna().any() else True
+    return numeric.astype(np.float32 if fits_float32 else np.float64)
+
+
+def _column(values: pd.Series, dtype: str) -> pd.Series:
+    if dtype == "category":
+        return values.astype("category")
+    if dtype == "datetime":
+        return pd.to_datetime(values, errors="coerce", utc=True, format="ISO8601")
+    if dtype.startswith("int"):
+        return _integer_column(values, dtype)
+    return pd.to_numeric(values, errors="coerce").astype(dtype)
+
+
+def apply_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """df with FEATURE_SCHEMA applied (a new frame; df is not modified)."""
+    columns = {}
+    for name in df.columns:
+        dtype = FEATURE_SCHEMA.get(name, "keep")
+        if dtype is None:
+            continue
+        columns[name] = df[name] if dtype == "keep" else _column(df[name], dtype)
+    return pd.DataFrame(columns, index=df.index)
+
+
+def typed_frame(rows: List[Dict]) -> pd.DataFrame:
+    """Typed frame from Supabase rows."""
+    if not rows:
+        return pd.DataFrame()
+    # Dropped columns are never materialized
+    columns = [name for name in rows[0] if FEATURE_SCHEMA.get(name, "keep") is not None]
+    return apply_schema(pd.DataFrame(rows, columns=columns))
+
+
+def concat_typed(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """Concatenate typed frames, keeping categorical columns categorical.
+
+    (pd.concat turns categoricals with different categories into objects.)
+    """
+    frames = [f for f in frames if not f.empty] or frames[:1]
+    if len(frames) == 1:
+        return frames[0].reset_index(drop=True)
+    categorical = [
+        name for name in frames[0].columns
+        if all(name in f.columns and isinstance(f[name].dtype, pd.CategoricalDtype) for f in frames)
+    ]
+    frames = [f.copy() for f in frames]
+    for name in categorical:
+        categories = union_categoricals([f[name] for f in frames]).categories
+        for f in frames:
+            f[name] = f[name].cat.set_categories(categories)
+    return pd.concat(frames, ignore_index=True)
+
+
+def bytes_per_row(df: pd.DataFrame) -> Optional[float]:
+    if df.empty:
+        return None
+    return round(df.memory_usage(deep=True, index=False).sum() / len(df), 1)
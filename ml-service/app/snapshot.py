@@ -0,0 +1,141 @@
+"""In-memory snapshot of the parking_features table.
+
+The table is read once with paginated requests (a single select is silently
+truncated by PostgREST's row cap) and then refreshed incrementally: each
+refresh only reads rows whose created_at is at or after the watermark, minus
+a small overlap, and drops rows it already holds by id.
+"""
+import logging
+import threading
+import time
+from datetime import timedelta
+from typing import Iterator, Optional, Tuple
+
+import pandas as pd
+
+from .config import supabase, SNAPSHOT_PAGE_SIZE, SNAPSHOT_OVERLAP_SECONDS
+from .schema import typed_frame, concat_typed, bytes_per_row
+from .timing import stage
+
+logger = logging.getLogger(__name__)
+
+
+class FeatureSnapshot:
+    def __init__(self, page_size: int = SNAPSHOT_PAGE_SIZE, overlap_seconds: float = SNAPSHOT_OVERLAP_SECONDS):
+        self.page_size = page_size
+        self.overlap = timedelta(seconds=overlap_seconds)
+        self.frame = pd.DataFrame()
+        self.watermark: Optional[pd.Timestamp] = None
+        # Bumped whenever rows are added, so derived caches know to rebuild
+        self.version = 0
+        self.refreshed_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self.refreshed_at is not None
+
+    def _fetch(self, since: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+        rows = []
+        offset = 0
+        while True:
+            query = supabase.schema("parking").table("parking_features").select("*")
+            if since is not None:
+                query = query.gte("created_at", since.isoformat())
+            with stage("fetch"):
+                response = query.order("created_at").order("id")\
+                    .range(offset, offset + self.page_size - 1)\
+                    .execute()
+            page = response.data or []
+            rows.extend(page)
+            if len(page) < self.page_size:
+                with stage("frame"):
+                    return typed_frame(rows)
+            offset += self.page_size
+
+    def _advance_watermark(self, rows: pd.DataFrame):
+        if "created_at" in rows.columns and not rows.empty:
+            # Typed at ingestion (datetime64, UTC)
+            latest = rows["created_at"].max()
+            if self.watermark is None or latest > self.watermark:
+                self.watermark = latest
+
+    def load(self):
+        """Replace the snapshot with a full paginated read of the table."""
+        with self._lock:
+            started = time.perf_counter()
+            frame = self._fetch()
+            self._advance_watermark(frame)
+            self.frame = frame
+            self.version += 1
+            self.refreshed_at = time.time()
+            logger.info(f"Feature snapshot loaded: {len(frame)} rows in {time.perf_counter() - started:.2f}s, "
+                        f"{bytes_per_row(frame)} bytes/row")
+
+    def restore(self, frame: pd.DataFrame, watermark: Optional[pd.Timestamp]) -> int:
+        """Install a persisted snapshot (see feature_store.py); returns its version.
+
+        The next refresh only fetches rows from the watermark on.
+        """
+        with self._lock:
+            self.frame = frame
+            self.watermark = watermark
+            self.version += 1
+            self.refreshed_at = time.time()
+            logger.info(f"Feature snapshot restored: {len(frame)} rows up to {watermark}")
+            return self.version
+
+    def refresh(self) -> int:
+        """Append rows created since the watermark; returns the number of new rows."""
+        if not self.loaded or self.watermark is None:
+            self.load()
+            return len(self.frame)
+
+        with self._lock:
+            fresh = self._fetch(self.watermark - self.overlap)
+            if "id" in fresh.columns and "id" in self.frame.columns:
+                fresh = fresh[~fresh["id"].isin(self.frame["id"])]
+            self.refreshed_at = time.time()
+            if fresh.empty:
+                return 0
+            self._advance_watermark(fresh)
+            # Build the new frame before swapping so readers never see a partial one
+            self.frame = concat_typed([self.frame, fresh])
+            self.version += 1
+            logger.info(f"Feature snapshot refreshed: +{len(fresh)} rows (total {len(self.frame)})")
+            return len(fresh)
+
+    def get(self) -> Tuple[pd.DataFrame, int]:
+        """Current rows and version, loading the snapshot first if needed.
+
+        Callers must treat the frame as read-only.
+        """
+        if not self.loaded:
+            self.load()
+        return self.frame, self.version
+
+
+def iter_feature_chunks(chunk_rows: int, page_size: int = SNAPSHOT_PAGE_SIZE) -> Iterator[pd.DataFrame]:
+    """Stream the parking_features table in chunks of about chunk_rows rows.
+
+    Pages by id (keyset), so each request costs the same however deep into
+    the table it is, and only one chunk is held at a time.
+    """
+    rows = []
+    last_id = None
+    while True:
+        query = supabase.schema("parking").table("parking_features").select("*")
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        page = query.order("id").limit(page_size).execute().data or []
+        rows.extend(page)
+        if page:
+            last_id = page[-1]["id"]
+        if len(rows) >= chunk_rows or (len(page) < page_size and rows):
+            yield typed_frame(rows)
+            rows = []
+        if len(page) < page_size:
+            return
+
+
+feature_snapshot = FeatureSnapshot()
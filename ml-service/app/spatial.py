@@ -0,0 +1,142 @@
+"""Grid index over spot coordinates for radius and nearest-spot queries."""
+import math
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+EARTH_RADIUS_METERS = 6371000
+# Same sphere as haversine_distance, so candidate boxes match its distances
+METERS_PER_DEGREE = EARTH_RADIUS_METERS * math.pi / 180
+# Candidate boxes are widened by this much against rounding at the edge
+BOX_PADDING_METERS = 1.0
+# ~1.1 km cells; one query around a user touches a handful of them
+GRID_CELL_DEGREES = 0.01
+
+
+def haversine_distance(lat1, lon1, lat2, lon2):
+    """
+    Great circle distance in meters between points given in decimal degrees.
+    Works element-wise on numpy arrays as well as on scalars.
+    """
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_METERS * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+class GridIndex:
+    """Points bucketed into fixed-size lat/lon cells.
+
+    Positions are sorted by cell so each cell is one contiguous slice of
+    self.order; queries only compute distances for points in nearby cells.
+    """
+
+    def __init__(self, lat: np.ndarray, lon: np.ndarray, cell_degrees: float = GRID_CELL_DEGREES):
+        self.lat = lat
+        self.lon = lon
+        self.cell_degrees = cell_degrees
+        self.cells: Dict[Tuple[int, int], Tuple[int, int]] = {}
+        self.order = np.array([], dtype=np.int64)
+
+        # Spots without usable coordinates are left out of every query
+        located = np.flatnonzero(np.isfinite(lat) & np.isfinite(lon))
+        if len(located) == 0:
+            return
+        ci = np.floor(lat[located] / cell_degrees).astype(np.int64)
+        cj = np.floor(lon[located] / cell_degrees).astype(np.int64)
+        by_cell = np.lexsort((cj, ci))
+        self.order = located[by_cell]
+        keys = np.stack((ci[by_cell], cj[by_cell]), axis=1)
+        unique, starts, counts = np.unique(keys, axis=0, return_index=True, return_counts=True)
+        self.cells = {
+            (int(i), int(j)): (int(start), int(start + count))
+            for (i, j), start, count in zip(unique, starts, counts)
+        }
+        self.min_cell = (int(ci.min()), int(cj.min()))
+        self.max_cell = (int(ci.max()), int(cj.max()))
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    def _cell_of(self, lat: float, lon: float) -> Tuple[int, int]:
+        return math.floor(lat / self.cell_degrees), math.floor(lon / self.cell_degrees)
+
+    def _gather(self, i0: int, i1: int, j0: int, j1: int) -> np.ndarray:
+        """Positions of all points in cells [i0, i1] x [j0, j1]."""
+        if (i1 - i0 + 1) * (j1 - j0 + 1) > len(self.cells):
+            # Window wider than the data: walking the occupied cells is cheaper
+            slices = [s for (i, j), s in self.cells.items() if i0 <= i <= i1 and j0 <= j <= j1]
+        else:
+            slices = [
+                self.cells[(i, j)]
+                for i in range(i0, i1 + 1)
+                for j in range(j0, j1 + 1)
+                if (i, j) in self.cells
+            ]
+        if not slices:
+            return np.array([], dtype=np.int64)
+        return np.concatenate([self.order[start:end] for start, end in slices])
+
+    def _within(self, lat: float, lon: float, radius_meters: float) -> np.ndarray:
+        """Candidate positions whose cells intersect the radius around (lat, lon)."""
+        radius_meters += BOX_PADDING_METERS
+        dlat = radius_meters / METERS_PER_DEGREE
+        # Longitude half-width of a spherical circle: asin(sin(r/R) / cos(lat))
+        angle = radius_meters / EARTH_RADIUS_METERS
+        ratio = math.sin(min(angle, math.pi / 2)) / max(math.cos(math.radians(lat)), 1e-12)
+        if abs(lat) + dlat >= 90.0 or ratio >= 1.0:
+            dlon = 180.0
+        else:
+            dlon = math.degrees(math.asin(ratio))
+        i0, j0 = self._cell_of(lat - dlat, lon - dlon)
+        i1, j1 = self._cell_of(lat + dlat, lon + dlon)
+        return self._gather(i0, i1, j0, j1)
+
+    def query(self, lat: float, lon: float, radius_meters: Optional[float] = None,
+              limit: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Positions and distances of points near (lat, lon), nearest first.
+
+        With radius_meters only points within it are returned; with limit at
+        most that many (the k nearest). With neither every point is returned.
+        """
+        if len(self) == 0:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.float64)
+
+        if radius_meters is not None:
+            candidates = self._within(lat, lon, radius_meters)
+        elif limit is not None and limit < len(self):
+            # Grow a square of cells until it holds k points; the k-th of
+            # those bounds the true k-th nearest distance, so one radius
+            # query with it is exact. The square starts at the first ring
+            # reaching the data and doubles, so a user far from every spot
+            # costs a few passes, not one per ring.
+            ci, cj = self._cell_of(lat, lon)
+            ring = max(0, self.min_cell[0] - ci, ci - self.max_cell[0],
+                       self.min_cell[1] - cj, cj - self.max_cell[1])
+            max_ring = max(abs(ci - self.min_cell[0]), abs(ci - self.max_cell[0]),
+                           abs(cj - self.min_cell[1]), abs(cj - self.max_cell[1]))
+            while True:
+                if ring >= max_ring:
+                    # The square covers all the data
+                    candidates = self.order
+                    break
+                candidates = self._gather(ci - ring, ci + ring, cj - ring, cj + ring)
+                if len(candidates) >= limit:
+                    break
+                ring = max(ring + 1, 2 * ring)
+            if len(candidates) >= limit:
+                distances = haversine_distance(lat, lon, self.lat[candidates], self.lon[candidates])
+                kth = np.partition(distances, limit - 1)[limit - 1]
+                candidates = self._within(lat, lon, kth)
+        else:
+            candidates = self.order
+
+        distances = haversine_distance(lat, lon, self.lat[candidates], self.lon[candidates])
+        if radius_meters is not None:
+            keep = distances <= radius_meters
+            candidates, distances = candidates[keep], distances[keep]
+        nearest = np.argsort(distances, kind="stable")
+        if limit is not None:
+            nearest = nearest[:limit]
+        return candidates[nearest], distances[nearest]
@@ -1,43 +1,73 @@
-def generate_summary(predictions_df):
-    summary = predictions_df.groupby('ID').agg({
-        'Latitude':'first',
-        'Longitude':'first',
-        'Capacity':'first',
-        'PredOccupancy':'mean',
-        'PredictedDynamicPricePerHour':'mean',
-        'SystemCodeNumber':'first'
-    }).reset_index()
+import pandas as pd
+
+# Per-ID partial aggregates: "first" columns plus sums and counts for the means,
+# so chunks can be summarised separately and merged
+FIRST_COLUMNS = ['Latitude', 'Longitude', 'Capacity', 'SystemCodeNumber']
+MEAN_COLUMNS = ['PredOccupancy', 'PredictedDynamicPricePerHour']
+
+def summarize_chunk(predictions_df):
+    """Partial per-ID aggregate of one chunk of predictions."""
+    grouped = predictions_df.groupby('ID')
+    partial = grouped[FIRST_COLUMNS].first()
+    for col in MEAN_COLUMNS:
+        partial[f'{col}_sum'] = grouped[col].sum()
+        partial[f'{col}_count'] = grouped[col].count()
+    return partial
+
+def merge_summaries(partial, other):
+    """Combine two partial aggregates; partial comes first in table order."""
+    if partial is None:
+        return other
+    combined = pd.concat([partial, other]).groupby(level=0)
+    merged = combined[FIRST_COLUMNS].first()
+    sums = [c for c in partial.columns if c.endswith(('_sum', '_count'))]
+    merged[sums] = combined[sums].sum()
+    return merged
+
+def finalize_summary(partial):
+    summary = partial[FIRST_COLUMNS[:3]].copy()
+    for col in MEAN_COLUMNS:
+        summary[col] = partial[f'{col}_sum'] / partial[f'{col}_count']
+    summary['SystemCodeNumber'] = partial['SystemCodeNumber']
+    summary = summary.reset_index()
     summary['available'] = (summary['Capacity'] - summary['PredOccupancy'].round()).clip(lower=0)
     summary['price'] = summary['PredictedDynamicPricePerHour'].round(0).astype(int)
     summary['free_probability'] = summary['available']/summary['Capacity']
     return summary
 
+def generate_summary(predictions_df):
+    return finalize_summary(summarize_chunk(predictions_df))
+
 def generate_free_hotspots(summary_df):
-    free_df = summary_df[summary_df['free_probability']>0.5].copy()
-    free_list = [{"lat":float(r['Latitude']), "lng":float(r['Longitude']),
-                  "probability":round(float(r['free_probability']),2),
-                  "label":f"Free Hotspot {r['ID']}",
-                  "radius":100} for _, r in free_df.iterrows()]
-    return free_list
+    free_df = summary_df[summary_df['free_probability']>0.5]
+    ids = free_df['ID'].astype(int).astype(str)
+    records = pd.DataFrame({
+        "lat": free_df['Latitude'].astype(float),
+        "lng": free_df['Longitude'].astype(float),
+        "probability": free_df['free_probability'].astype(float).round(2),
+        "label": "Free Hotspot " + ids,
+        "radius": 100,
+    })
+    return records.to_dict('records')
 
 def generate_paid_parkings(summary_df):
     default_amenities = ["CCTV"]
     default_image = "https://images.unsplash.com/photo-1590674899484-d5640e854abe?w=800"
-    default_reviews = []
     default_rating = 4.3
-    paid_list = []
-    for _, row in summary_df.iterrows():
-        paid_list.append({
-            "id":f"p{row['ID']}",
-            "name":f"Parking {row['ID']}",
-            "lat":float(row['Latitude']),
-            "lng":float(row['Longitude']),
-            "price":int(row['price']),
-            "slots":int(row['Capacity']),
-            "available":int(row['available']),
-            "rating":default_rating,
-            "amenities":default_amenities,
-            "images":[default_image],
-            "reviews":default_reviews
-        })
-    return paid_list
+    ids = summary_df['ID'].astype(int).astype(str)
+    records = pd.DataFrame({
+        "id": "p" + ids,
+        "name": "Parking " + ids,
+        "lat": summary_df['Latitude'].astype(float),
+        "lng": summary_df['Longitude'].astype(float),
+        "price": summary_df['price'].astype(int),
+        "slots": summary_df['Capacity'].astype(int),
+        "available": summary_df['available'].astype(int),
+        "rating": default_rating,
+    }).to_dict('records')
+    # Fresh lists per record, as JSON consumers may mutate them
+    for record in records:
+        record["amenities"] = list(default_amenities)
+        record["images"] = [default_image]
+        record["reviews"] = []
+    return records
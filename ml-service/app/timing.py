@@ -0,0 +1,74 @@
+"""Per-stage request timing.
+
+    with stage("preprocess"):
+        processed = preprocess_data(df)
+
+Every stage is observed in the stage.<name>_ms histogram (see /metrics).
+Within an HTTP request the durations are also collected for the response's
+Server-Timing header, and with TIMING_DEBUG requests slower than
+SLOW_REQUEST_MS log their breakdown. Outside a request (background tasks,
+process workers) only the histograms are fed.
+
+The request's timings live in a context variable, so stages run through
+asyncio.to_thread are attributed to it; work submitted with
+run_in_executor is not, and reports its timings back with add().
+"""
+import contextvars
+import logging
+import re
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from fastapi import Request
+
+from .config import TIMING_DEBUG, SLOW_REQUEST_MS
+from .metrics import histogram
+
+logger = logging.getLogger(__name__)
+
+_current: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar("request_timings", default=None)
+
+
+def add(name: str, milliseconds: float):
+    """Record a stage duration measured elsewhere."""
+    histogram(f"stage.{name}_ms").observe(milliseconds)
+    timings = _current.get()
+    if timings is not None:
+        # Repeated stages (e.g. per chunk) add up
+        timings[name] = timings.get(name, 0.0) + milliseconds
+
+
+@contextmanager
+def stage(name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        add(name, (time.perf_counter() - started) * 1000)
+
+
+def server_timing(timings: Dict[str, float]) -> str:
+    """Server-Timing header value, e.g. 'preprocess;dur=12.3, total;dur=15.0'."""
+    # Metric names are HTTP tokens
+    return ", ".join(f"{re.sub(r'[^A-Za-z0-9_.-]', '_', name)};dur={ms:.1f}" for name, ms in timings.items())
+
+
+async def timing_middleware(request: Request, call_next):
+    timings: Dict[str, float] = {}
+    token = _current.set(timings)
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        _current.reset(token)
+    total = (time.perf_counter() - started) * 1000
+    timings["total"] = total
+    # The route template, not the raw path, so /artifacts/{name}/{version} is one histogram
+    route = request.scope.get("route")
+    histogram(f"request.{getattr(route, 'path', 'unmatched')}_ms").observe(total)
+    response.headers["Server-Timing"] = server_timing(timings)
+    if TIMING_DEBUG and total >= SLOW_REQUEST_MS:
+        breakdown = ", ".join(f"{name}={ms:.1f}ms" for name, ms in timings.items())
+        logger.info(f"Slow request {request.method} {request.url.path}: {breakdown}")
+    return response
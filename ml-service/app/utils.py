@@ -1,9 +1,21 @@
 import json
 import os
+import tempfile
 from .config import JSON_OUTPUT_DIR
 
 def save_json_to_file(filename, data_list):
     filepath = os.path.join(JSON_OUTPUT_DIR, filename)
-    with open(filepath,'w') as f:
-        json.dump(data_list,f,indent=2)
+    # Write to a temp file and rename, so readers never see a half-written file.
+    # The temp name is unique, so concurrent jobs in one process don't collide.
+    fd, tmp_path = tempfile.mkstemp(dir=JSON_OUTPUT_DIR, prefix=f"{filename}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data_list,f,indent=2)
+        # mkstemp creates the file private; output files stay world-readable as before
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
     print(f"Saved {len(data_list)} entries to {filepath}")
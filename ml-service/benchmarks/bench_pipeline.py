@@ -0,0 +1,180 @@
+"""
+End-to-end ML pipeline benchmark on synthetic parking_features tables.
+
+Times every stage separately and records each one's peak traced (Python
+and numpy) memory:
+
+    preprocess    preprocess_data
+    inference     occupancy model predict
+    pricing       dynamic pricing
+    free_parking  compute_free_parking_predictions (the prediction store batch)
+    summary       per-spot summary, hotspots and paid parkings
+    serialize     JSON export and gzip of both artifacts
+
+Results are written as JSON (one entry per table size and stage). With
+--baseline, stages slower than the baseline by more than --tolerance are
+reported and the exit status is 1, so a pipeline or model change can be
+checked before it is deployed.
+
+Usage (from ml-service/, with MODEL_DIR pointing at the model to measure):
+    python -m benchmarks.bench_pipeline [--sizes 1000,100000,1000000] [--output results.json]
+                                        [--baseline previous.json] [--tolerance 0.2]
+"""
+import argparse
+import gzip
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+from app.models import model_registry
+from app.predictions import occupancy_features, apply_occupancy, apply_dynamic_price, compute_free_parking_predictions
+from app.preprocessing import preprocess_data
+from app.summary import generate_summary, generate_free_hotspots, generate_paid_parkings
+from benchmarks.synthetic import feature_rows
+
+DEFAULT_SIZES = [1_000, 100_000, 1_000_000]
+# Distinct spots per table size: a real table holds many readings per spot
+SPOTS_PER_ROW = 0.05
+# Differences below this are timer noise, never a regression
+MIN_REGRESSION_SECONDS = 0.01
+
+
+def measure(fn: Callable, *args) -> tuple:
+    """fn(*args) with its wall time in seconds and peak traced allocation in bytes.
+
+    Tracing slows allocation-heavy code, so the stage runs twice: timed
+    untraced, then traced for memory. Stages must be safe to repeat.
+    """
+    started = time.perf_counter()
+    result = fn(*args)
+    seconds = time.perf_counter() - started
+    tracemalloc.start()
+    try:
+        fn(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, seconds, peak
+
+
+def serialize(free_hotspots: List[Dict], paid_parkings: List[Dict]) -> int:
+    size = 0
+    for records in (free_hotspots, paid_parkings):
+        body = json.dumps(records, separators=(",", ":")).encode("utf-8")
+        size += len(gzip.compress(body, mtime=0))
+    return size
+
+
+def run_size(rows: int, seed: int) -> Dict:
+    raw = feature_rows(rows, seed=seed, spots=max(1, int(rows * SPOTS_PER_ROW)))
+    model = model_registry.model
+    stages = {}
+
+    def record(name, fn, *args):
+        result, seconds, peak = measure(fn, *args)
+        stages[name] = {"seconds": round(seconds, 4), "rows_per_second": round(rows / seconds) if seconds else None,
+                        "peak_bytes": peak}
+        return result
+
+    processed = record("preprocess", preprocess_data, raw)
+    features = occupancy_features(processed)
+    predicted = record("inference", lambda: np.asarray(model.predict(features)))
+    apply_occupancy(processed, predicted)
+    priced = record("pricing", apply_dynamic_price, processed)
+    record("free_parking", compute_free_parking_predictions, raw)
+
+    def summarize():
+        summary = generate_summary(priced)
+        return generate_free_hotspots(summary), generate_paid_parkings(summary)
+    free_hotspots, paid_parkings = record("summary", summarize)
+    compressed = record("serialize", serialize, free_hotspots, paid_parkings)
+
+    return {
+        "rows": rows,
+        "free_hotspots": len(free_hotspots),
+        "paid_parkings": len(paid_parkings),
+        "input_bytes": int(raw.memory_usage(deep=True).sum()),
+        "artifact_gzip_bytes": compressed,
+        "total_seconds": round(sum(stage["seconds"] for stage in stages.values()), 4),
+        "stages": stages,
+    }
+
+
+def environment() -> Dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "model": model_registry.current.version,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "timestamp": time.time(),
+    }
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Stages more than tolerance (a fraction) slower than in the baseline."""
+    previous = {run["rows"]: run["stages"] for run in baseline["runs"]}
+    regressions = []
+    for run in results["runs"]:
+        for name, stage in run["stages"].items():
+            before = previous.get(run["rows"], {}).get(name)
+            if before and stage["seconds"] > before["seconds"] * (1 + tolerance) \
+                    and stage["seconds"] - before["seconds"] >= MIN_REGRESSION_SECONDS:
+                regressions.append(f"{name} @ {run['rows']} rows: {before['seconds']:.3f}s -> {stage['seconds']:.3f}s")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    # One-time costs (holiday calendar, lazy imports) must not land in the first size measured
+    compute_free_parking_predictions(feature_rows(100, seed=args.seed))
+
+    results = {"environment": environment(), "runs": []}
+    for rows in (int(size) for size in args.sizes.split(",")):
+        run = run_size(rows, args.seed)
+        results["runs"].append(run)
+        print(f"{rows:>9} rows: " + "  ".join(
+            f"{name} {stage['seconds']:.3f}s/{stage['peak_bytes'] / 2**20:.1f}MiB" for name, stage in run["stages"].items()))
+    # Peak RSS of the whole run, including memory tracemalloc cannot see
+    results["environment"]["max_rss_bytes"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+        print(f"no stage slower than baseline by more than {args.tolerance:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+"""
+Preprocessing benchmark and parity check: vectorized preprocess_data vs the
+old row-wise pipeline.
+
+The old pipeline is kept below unchanged except for three injectable pieces
+that were bugs rather than behaviour: the spot encoding (builtin hash() is
+salted per process), the holiday list (an unpopulated holidays object
+iterates as empty, so IsHoliday was always 0) and the timezone (Jakarta,
+for an app in Pune). The parity run gives it the stable encoding and the
+configured timezone and holiday calendar, and then requires identical
+output for every feature column.
+
+Usage (from ml-service/):
+    python -m benchmarks.bench_preprocessing [rows]
+"""
+import sys
+import time
+
+import holidays
+import numpy as np
+import pandas as pd
+import pytz
+
+from app.config import LOCAL_TIMEZONE, HOLIDAY_COUNTRY, HOLIDAY_SUBDIVISION
+from app.preprocessing import preprocess_data, stable_spot_code
+from benchmarks.synthetic import feature_rows
+
+COMPARED_COLUMNS = [
+    'SystemCodeNumber', 'Hour', 'DayOfWeek', 'DayName', 'IsWeekend', 'IsHoliday', 'TimeCategory',
+    'AvgDuration_Minutes', 'EstimatedDuration_Minutes', 'IsSpecialDay_Flag', 'VehicleType',
+    'TrafficConditionNearby', 'Hour_sin', 'Hour_cos', 'DayOfWeek_sin', 'DayOfWeek_cos',
+]
+
+
+def legacy_preprocess(df, encode=lambda x: hash(str(x)) % 10000, holiday_list=None, tz="Asia/Jakarta"):
+    df = df.copy()
+    df['Timestamp'] = pd.to_datetime(df['Timestamp'], errors='coerce')
+    wib = pytz.timezone(tz)
+    if df['Timestamp'].dt.tz is None:
+        df['Timestamp_WIB'] = df['Timestamp'].dt.tz_localize('UTC').dt.tz_convert(wib)
+    else:
+        df['Timestamp_WIB'] = df['Timestamp'].dt.tz_convert(wib)
+
+    df['Hour'] = df['Timestamp_WIB'].dt.hour
+    df['DayOfWeek'] = df['Timestamp_WIB'].dt.dayofweek
+    df['DayName'] = df['Timestamp_WIB'].dt.day_name()
+    df['IsWeekend'] = df['DayOfWeek'].isin([5,6]).astype(int)
+
+    if holiday_list is None:
+        holiday_list = [str(d) for d in holidays.country_holidays("ID")]
+    df['IsHoliday'] = df['Timestamp_WIB'].dt.date.astype(str).isin(holiday_list).astype(int)
+
+    def map_time_category(hour):
+        if 5 <= hour < 12: return "Morning"
+        if 12 <= hour < 17: return "Afternoon"
+        if 17 <= hour < 21: return "Evening"
+        return "Night"
+    df['TimeCategory'] = df['Hour'].apply(map_time_category)
+
+    avg_duration = {
+        ('Afternoon', 0, 0): 167.245646, ('Afternoon', 1, 0): 167.477519,
+        ('Evening', 0, 0): 164.332264, ('Evening', 1, 0): 162.501357,
+        ('Night', 0, 0): 163.594921, ('Night', 1, 0): 164.153896,
+        ('Morning', 0, 0): 164.16, ('Morning', 1, 0): 164.16,
+    }
+    df['AvgDuration_Minutes'] = df.apply(
+        lambda row: avg_duration.get((row['TimeCategory'], row['IsWeekend'], row['IsHoliday']), 164.16), axis=1
+    )
+    df['EstimatedDuration_Minutes'] = df['AvgDuration_Minutes'].round()
+    df['IsSpecialDay_Flag'] = df['IsSpecialDay'].astype(int)
+
+    vehicle_map = {'car':0,'bike':1,'cycle':2,'truck':3}
+    day_map = {'Monday':0,'Tuesday':1,'Wednesday':2,'Thursday':3,'Friday':4,'Saturday':5,'Sunday':6}
+    time_map = {'Evening':0,'Night':1,'Afternoon':2,'Morning':3}
+    traffic_map = {'low':0,'medium':1,'high':2}
+
+    df['SystemCodeNumber'] = df['SystemCodeNumber'].apply(encode).astype(int)
+    df['VehicleType'] = df['VehicleType'].map(vehicle_map).fillna(-1).astype(int)
+    df['DayName'] = df['DayName'].map(day_map).fillna(-1).astype(int)
+    df['TimeCategory'] = df['TimeCategory'].map(time_map).fillna(-1).astype(int)
+    df['TrafficConditionNearby'] = df['TrafficConditionNearby'].map(traffic_map).fillna(-1).astype(int)
+
+    df['Hour_sin'] = np.sin(2*np.pi*df['Hour']/24)
+    df['Hour_cos'] = np.cos(2*np.pi*df['Hour']/24)
+    df['DayOfWeek_sin'] = np.sin(2*np.pi*df['DayOfWeek']/7)
+    df['DayOfWeek_cos'] = np.cos(2*np.pi*df['DayOfWeek']/7)
+    return df
+
+
+def check_parity(df: pd.DataFrame):
+    calendar = holidays.country_holidays(HOLIDAY_COUNTRY, subdiv=HOLIDAY_SUBDIVISION or None, years=range(2024, 2027))
+    holiday_list = [d.strftime("%Y-%m-%d") for d in calendar]
+    expected = legacy_preprocess(df, encode=stable_spot_code, holiday_list=holiday_list, tz=LOCAL_TIMEZONE)
+    actual = preprocess_data(df)
+    for column in COMPARED_COLUMNS:
+        pd.testing.assert_series_equal(actual[column], expected[column], check_dtype=False, check_names=True)
+    print(f"parity: {len(COMPARED_COLUMNS)} columns identical on {len(df)} rows "
+          f"({int(actual['IsHoliday'].sum())} holiday rows)")
+
+
+def main(rows: int = 100_000):
+    df = feature_rows(rows)
+    # A few unparseable timestamps, which both versions must handle alike
+    df.loc[df.index[10:13], 'Timestamp'] = "not a timestamp"
+
+    check_parity(df.head(min(rows, 20000)))
+
+    started = time.perf_counter()
+    preprocess_data(df)
+    vectorized = time.perf_counter() - started
+
+    started = time.perf_counter()
+    legacy_preprocess(df)
+    legacy = time.perf_counter() - started
+
+    print(f"rows: {rows}")
+    print(f"vectorized: {vectorized:.3f} s ({rows / vectorized:,.0f} rows/s)")
+    print(f"row-wise:   {legacy:.3f} s ({rows / legacy:,.0f} rows/s)")
+    print(f"speedup:    {legacy / vectorized:.1f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
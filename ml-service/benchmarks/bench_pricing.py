@@ -0,0 +1,71 @@
+"""
+Pricing benchmark: vectorized PricingEngine vs the old row-wise pricing.
+
+The row-wise version is far too slow for a million rows, so it runs on a
+sample and its full-table time is extrapolated. Results must match exactly.
+
+Usage (from ml-service/):
+    python -m benchmarks.bench_pricing [rows]
+"""
+import sys
+import time
+
+import numpy as np
+
+from app.pricing import PricingEngine
+from benchmarks.synthetic import predicted_rows
+
+LEGACY_SAMPLE = 20000
+
+
+# Row-wise pricing as it was in predictions.py, kept for comparison
+def traffic_multiplier(traffic_str):
+    if traffic_str == 'high': return 1.4
+    if traffic_str in ['medium', 'average']: return 1.15
+    return 1.0
+
+def event_multiplier(is_special):
+    return 1.3 if is_special else 1.0
+
+def dynamic_price(row, base=10.0):
+    dfactor = 1.0 + row['PredOccupancy_Ratio']
+    tmult = traffic_multiplier(row['TrafficConditionNearby'])
+    emult = event_multiplier(row['IsSpecialDay'])
+    return base * dfactor * tmult * emult
+
+def legacy_price(df):
+    df = df.copy()
+    reverse_traffic_map = {0:'low',1:'medium',2:'high'}
+    df['TrafficConditionNearby_Str'] = df['TrafficConditionNearby'].map(reverse_traffic_map).fillna('low')
+
+    def apply_dynamic_price(row):
+        price_row = row.copy()
+        price_row['TrafficConditionNearby'] = price_row['TrafficConditionNearby_Str']
+        return dynamic_price(price_row)
+
+    return df.apply(apply_dynamic_price, axis=1).to_numpy()
+
+
+def main(rows: int = 1_000_000):
+    df = predicted_rows(rows)
+    engine = PricingEngine()
+
+    started = time.perf_counter()
+    prices = engine.price(df['PredOccupancy_Ratio'].to_numpy(), df['TrafficConditionNearby'].to_numpy(),
+                          df['IsSpecialDay'].to_numpy(), df['Latitude'].to_numpy(), df['Longitude'].to_numpy())
+    vectorized = time.perf_counter() - started
+
+    sample = df.head(min(rows, LEGACY_SAMPLE))
+    started = time.perf_counter()
+    legacy = legacy_price(sample)
+    legacy_seconds = (time.perf_counter() - started) * rows / len(sample)
+
+    assert np.allclose(prices[:len(sample)], legacy), "vectorized prices differ from row-wise prices"
+    print(f"rows: {rows}")
+    print(f"vectorized: {vectorized * 1000:.1f} ms")
+    print(f"row-wise:   {legacy_seconds:.1f} s (extrapolated from {len(sample)} rows)")
+    print(f"speedup:    {legacy_seconds / vectorized:.0f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
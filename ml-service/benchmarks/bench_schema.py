@@ -0,0 +1,63 @@
+"""
+Feature frame memory: untyped pd.DataFrame(rows) vs the typed schema.
+
+Builds both frames from the same JSON-like rows (as Supabase returns them),
+reports bytes per row and build time, and checks that preprocessing and
+predictions give identical results on both.
+
+Usage (from ml-service/, with MODEL_DIR set):
+    python -m benchmarks.bench_schema [rows]
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.predictions import compute_free_parking_predictions, predict_parking_dynamics
+from app.schema import typed_frame, bytes_per_row
+from benchmarks.synthetic import feature_rows
+
+COMPARED_COLUMNS = ['PredOccupancy', 'PredictedDynamicPricePerHour', 'Hour', 'DayOfWeek', 'TimeCategory',
+                    'IsHoliday', 'SystemCodeNumber', 'VehicleType', 'TrafficConditionNearby']
+
+
+def check_parity(untyped: pd.DataFrame, typed: pd.DataFrame):
+    expected = predict_parking_dynamics(untyped)
+    actual = predict_parking_dynamics(typed)
+    for column in COMPARED_COLUMNS:
+        np.testing.assert_array_equal(actual[column].to_numpy(), expected[column].to_numpy(), err_msg=column)
+    expected = compute_free_parking_predictions(untyped)['availability_probability']
+    actual = compute_free_parking_predictions(typed)['availability_probability']
+    np.testing.assert_array_equal(actual.to_numpy(), expected.to_numpy())
+    print(f"parity: predictions identical on {len(untyped)} rows")
+
+
+def main(rows: int = 100_000):
+    records = feature_rows(rows).to_dict("records")
+
+    started = time.perf_counter()
+    untyped = pd.DataFrame(records)
+    untyped_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    typed = typed_frame(records)
+    typed_seconds = time.perf_counter() - started
+
+    check_parity(untyped.head(20000), typed.head(20000))
+
+    before, after = bytes_per_row(untyped), bytes_per_row(typed)
+    print(f"rows: {rows}")
+    print(f"untyped: {before:8.1f} bytes/row, {len(untyped.columns)} columns, built in {untyped_seconds:.3f} s")
+    print(f"typed:   {after:8.1f} bytes/row, {len(typed.columns)} columns, built in {typed_seconds:.3f} s")
+    print(f"ratio:   {before / after:.1f}x smaller")
+    print("per column (bytes/row):")
+    for name in untyped.columns:
+        size = untyped[name].memory_usage(deep=True, index=False) / rows
+        typed_size = typed[name].memory_usage(deep=True, index=False) / rows if name in typed else 0
+        print(f"  {name:<28}{str(untyped[name].dtype):>10} {size:7.1f} -> "
+              f"{str(typed[name].dtype) if name in typed else 'dropped':>20} {typed_size:6.1f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
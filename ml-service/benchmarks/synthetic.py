@@ -0,0 +1,59 @@
+"""Synthetic parking data for the benchmarks, shaped like the Supabase tables."""
+import numpy as np
+import pandas as pd
+
+# Rough Pune bounding box, so spatial code sees realistic densities
+PUNE_BBOX = (73.75, 18.42, 73.98, 18.62)
+TRAFFIC = np.array(['low', 'medium', 'high', 'Normal'])
+VEHICLES = np.array(['car', 'bike', 'cycle', 'truck'])
+
+
+def feature_rows(n: int, seed: int = 0, spots: int = 5000) -> pd.DataFrame:
+    """n raw parking_features rows spread over `spots` distinct spots."""
+    rng = np.random.default_rng(seed)
+    spot = rng.integers(0, spots, n)
+    spot_lng = rng.uniform(PUNE_BBOX[0], PUNE_BBOX[2], spots)
+    spot_lat = rng.uniform(PUNE_BBOX[1], PUNE_BBOX[3], spots)
+    capacity = rng.integers(10, 1000, spots)
+    start = pd.Timestamp("2025-01-01", tz="UTC").value
+    timestamps = pd.to_datetime(start + rng.integers(0, 365 * 24 * 3600, n) * 10**9, utc=True)
+    ist = timestamps.tz_convert("Asia/Kolkata")
+    return pd.DataFrame({
+        "id": np.arange(n),
+        "ID": spot + 1,
+        "SystemCodeNumber": np.char.add("OSM_", spot.astype(str)),
+        "Capacity": capacity[spot],
+        "Latitude": spot_lat[spot],
+        "Longitude": spot_lng[spot],
+        "Occupancy": (capacity[spot] * rng.uniform(0.2, 0.6, n)).astype(int),
+        "VehicleType": VEHICLES[rng.integers(0, len(VEHICLES), n)],
+        "TrafficConditionNearby": TRAFFIC[rng.integers(0, len(TRAFFIC), n)],
+        "QueueLength": rng.integers(0, 3, n),
+        "IsSpecialDay": rng.integers(0, 2, n),
+        "Timestamp": timestamps.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        # Time features as the collector stores them (preprocessing derives its own)
+        "Timestamp_WIB": ist.strftime("%Y-%m-%dT%H:%M:%S"),
+        "Hour": ist.hour,
+        "DayOfWeek": ist.dayofweek,
+        "DayName": ist.day_name(),
+        "IsWeekend": (ist.dayofweek >= 5).astype(int),
+        "IsHoliday": 0,
+        "TimeCategory": np.select([(ist.hour >= 5) & (ist.hour < 12), (ist.hour >= 12) & (ist.hour < 17),
+                                   (ist.hour >= 17) & (ist.hour < 21)], ["Morning", "Afternoon", "Evening"], "Night"),
+        "Duration_Minutes": rng.integers(15, 300, n),
+        "EstimatedDuration_Minutes": 164,
+        "created_at": timestamps.strftime("%Y-%m-%dT%H:%M:%S+00:00"),
+        "updated_at": timestamps.strftime("%Y-%m-%dT%H:%M:%S+00:00"),
+    })
+
+
+def predicted_rows(n: int, seed: int = 0) -> pd.DataFrame:
+    """n preprocessed rows with model output, i.e. the input of the pricing step."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "PredOccupancy_Ratio": rng.uniform(0, 1, n),
+        "TrafficConditionNearby": rng.integers(-1, 3, n),
+        "IsSpecialDay": rng.integers(0, 2, n),
+        "Latitude": rng.uniform(PUNE_BBOX[1], PUNE_BBOX[3], n),
+        "Longitude": rng.uniform(PUNE_BBOX[0], PUNE_BBOX[2], n),
+    })
@@ -0,0 +1,42 @@
+import os
+import tempfile
+
+import joblib
+import numpy as np
+
+# Same columns as app.models.FEATURE_COLS, which cannot be imported here:
+# importing app.models loads the model this file is about to create.
+FEATURE_COLS = [
+    'SystemCodeNumber', 'Capacity', 'DayName', 'VehicleType', 'TrafficConditionNearby',
+    'IsSpecialDay', 'Hour', 'DayOfWeek', 'IsWeekend', 'IsHoliday', 'TimeCategory',
+    'EstimatedDuration_Minutes', 'IsSpecialDay_Flag', 'Hour_sin', 'Hour_cos',
+    'DayOfWeek_sin', 'DayOfWeek_cos'
+]
+
+
+class HalfFullModel:
+    """Predicts every spot half full; checks it is given exactly the feature columns."""
+
+    def predict(self, X):
+        assert list(X.columns) == FEATURE_COLS
+        return np.asarray(X['Capacity'], dtype=np.float64) * 0.5
+
+
+def _test_model_dir() -> str:
+    """A model directory holding a stand-in occupancy model.
+
+    The trained model is not checked in; the tests only need something
+    app.models can load and warm up at import.
+    """
+    model_dir = tempfile.mkdtemp(prefix="ml-test-models-")
+    joblib.dump(HalfFullModel(), os.path.join(model_dir, "occupancy_regressor_model.joblib"))
+    return model_dir
+
+
+# app.config creates the Supabase client at import time; it does not connect
+# until used, so placeholder settings are enough for the unit tests.
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_KEY", "test-key")
+os.environ.setdefault("JSON_OUTPUT_DIR", tempfile.mkdtemp(prefix="ml-test-data-"))
+if "MODEL_DIR" not in os.environ:
+    os.environ["MODEL_DIR"] = _test_model_dir()
@@ -0,0 +1,32 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.holiday_calendar import HolidayCalendar
+
+SOURCE = Path(__file__).resolve().parents[1] / "app" / "holiday_calendar.py"
+COLLECTOR_COPY = Path(__file__).resolve().parents[2] / "collector-service" / "holiday_calendar.py"
+
+
+@pytest.mark.skipif(not COLLECTOR_COPY.exists(), reason="collector-service is not checked out alongside")
+def test_collector_copy_matches_source():
+    # The collector's IsHoliday (training) must match the one derived when serving
+    assert COLLECTOR_COPY.read_bytes() == SOURCE.read_bytes(), \
+        "collector-service/holiday_calendar.py differs; copy ml-service/app/holiday_calendar.py over it"
+
+
+def test_lookup_flags_local_dates():
+    calendar = HolidayCalendar("IN", "MH", first_year=2025, last_year=2025)
+    # Republic Day, in IST: 18:29 UTC on the 25th is still the 25th locally, 18:30 is the 26th
+    timestamps = pd.Series(pd.to_datetime(["2025-01-25 18:29", "2025-01-25 18:30", "2025-01-27 12:00"], utc=True))
+    flags = calendar.is_holiday(timestamps.dt.tz_convert("Asia/Kolkata"))
+    assert flags.tolist() == [0, 1, 0]
+
+
+def test_lookup_extends_past_the_covered_years_and_ignores_nat():
+    calendar = HolidayCalendar("IN", "MH", first_year=2025, last_year=2025)
+    days = pd.Series(pd.to_datetime(["2030-01-26", None]))
+    assert calendar.is_holiday(days).tolist() == [1, 0]
+    assert np.all(calendar.lookup(np.array([], dtype=np.int64)) == 0)
@@ -0,0 +1,38 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app import prediction_store
+
+
+def fake_predictions(df):
+    # Probability taken from the row's occupancy, so the test can tell which row was kept
+    return df.assign(
+        OriginalSystemCode=df['SystemCodeNumber'],
+        availability_probability=1 - df['Occupancy'] / df['Capacity'],
+        availability_radius=np.full(len(df), 800),
+    )
+
+
+def test_nearby_returns_each_spot_once(monkeypatch):
+    monkeypatch.setattr(prediction_store, "compute_free_parking_predictions", fake_predictions)
+    monkeypatch.setattr(prediction_store, "model_registry", SimpleNamespace(current=SimpleNamespace(version="test")))
+    # Several snapshot rows per spot, out of time order
+    df = pd.DataFrame({
+        "SystemCodeNumber": ["OSM_203", "OSM_203", "OSM_204", "OSM_203", "OSM_205"],
+        "Latitude": [18.52, 18.52, 18.53, 18.52, 18.60],
+        "Longitude": [73.85, 73.85, 73.85, 73.85, 73.85],
+        "Capacity": [10, 10, 10, 10, 10],
+        "Occupancy": [2, 9, 5, 4, 1],
+        "Timestamp": ["2026-10-19 08:00", "2026-10-19 10:00", "2026-10-19 09:00",
+                      "2026-10-19 09:00", "2026-10-19 09:00"],
+    })
+    table = prediction_store.build_table(df, snapshot_version=1, hour_bucket=0)
+    assert len(table) == 3
+
+    rows = table.nearby(18.52, 73.85, limit=2)
+    assert [row["systemCode"] for row in rows] == ["OSM_203", "OSM_204"]
+    # The latest OSM_203 row (10:00) is the one served
+    assert rows[0]["availabilityProbability"] == pytest.approx(0.1)
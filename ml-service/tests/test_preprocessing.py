@@ -0,0 +1,61 @@
+import holidays
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.config import LOCAL_TIMEZONE, HOLIDAY_COUNTRY, HOLIDAY_SUBDIVISION
+from app.preprocessing import preprocess_data, stable_spot_code
+from benchmarks.bench_preprocessing import COMPARED_COLUMNS, legacy_preprocess
+from benchmarks.synthetic import feature_rows
+
+
+def legacy(df):
+    """The old row-wise pipeline with its known bugs fixed, as in the benchmark's parity check."""
+    years = range(2024, 2027)
+    calendar = holidays.country_holidays(HOLIDAY_COUNTRY, subdiv=HOLIDAY_SUBDIVISION or None, years=years)
+    holiday_list = [d.strftime("%Y-%m-%d") for d in calendar]
+    return legacy_preprocess(df, encode=stable_spot_code, holiday_list=holiday_list, tz=LOCAL_TIMEZONE)
+
+
+def assert_same_features(df):
+    expected = legacy(df)
+    actual = preprocess_data(df)
+    for column in COMPARED_COLUMNS:
+        pd.testing.assert_series_equal(actual[column], expected[column], check_dtype=False)
+    return actual
+
+
+def test_matches_legacy_on_synthetic_rows():
+    assert_same_features(feature_rows(2000, seed=1, spots=50))
+
+
+def test_matches_legacy_on_holidays():
+    holiday = next(iter(sorted(holidays.country_holidays(
+        HOLIDAY_COUNTRY, subdiv=HOLIDAY_SUBDIVISION or None, years=[2025]))))
+    local_midnight = pd.Timestamp(holiday, tz=LOCAL_TIMEZONE)
+    df = feature_rows(6, seed=2, spots=3)
+    # Just before, at and after the holiday's local midnight, noon, and the day after
+    df['Timestamp'] = [
+        (local_midnight + offset).tz_convert("UTC").strftime("%Y-%m-%dT%H:%M:%SZ")
+        for offset in pd.to_timedelta(["-1min", "0min", "1min", "12h", "23h59min", "24h"])
+    ]
+    actual = assert_same_features(df)
+    assert actual['IsHoliday'].tolist() == [0, 1, 1, 1, 1, 0]
+
+
+def test_matches_legacy_on_unknown_categories_and_missing_values():
+    df = feature_rows(8, seed=3, spots=4)
+    df['VehicleType'] = ['car', 'van', None, np.nan, 'bike', 'CAR', 'truck', '']
+    df['TrafficConditionNearby'] = ['low', 'Normal', None, np.nan, 'high', 'medium', 'LOW', '']
+    df.loc[[2, 5], 'Timestamp'] = [None, "not a timestamp"]
+    actual = assert_same_features(df)
+    assert actual['VehicleType'].tolist()[1:4] == [-1, -1, -1]
+    assert actual['TrafficConditionNearby'].tolist()[1:4] == [-1, -1, -1]
+    assert np.isnan(actual['Hour_sin'].iloc[2]) and np.isnan(actual['Hour_sin'].iloc[5])
+
+
+@pytest.mark.parametrize("timestamp", ["2025-06-01T10:00:00Z", "2025-06-01T10:00:00+05:30", "2025-06-01 10:00:00"])
+def test_matches_legacy_on_timestamp_formats(timestamp):
+    df = feature_rows(3, seed=4, spots=2)
+    df['Timestamp'] = timestamp
+    assert_same_features(df)
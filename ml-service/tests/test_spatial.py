@@ -0,0 +1,61 @@
+import math
+
+import numpy as np
+
+from app.spatial import GridIndex, haversine_distance, EARTH_RADIUS_METERS
+
+
+def brute_force(lat, lon, lats, lons, radius_meters=None, limit=None):
+    distances = haversine_distance(lat, lon, lats, lons)
+    order = np.argsort(distances, kind="stable")
+    if radius_meters is not None:
+        order = order[distances[order] <= radius_meters]
+    return order[:limit] if limit is not None else order
+
+
+def test_radius_keeps_spots_at_the_edge():
+    # Placed so a cell boundary (18.56) falls between 5,000 m north measured
+    # at 111,320 m per degree and the true 4,997.5 m north on the sphere
+    lat, lon = 18.56 - 0.04493, 73.85
+    # 4,997.5 m due north and due east, just inside a 5,000 m radius
+    north = lat + math.degrees(4997.5 / EARTH_RADIUS_METERS)
+    east_distance = 4997.5
+    east = lon + math.degrees(2 * math.asin(math.sin(east_distance / (2 * EARTH_RADIUS_METERS))
+                                            / math.cos(math.radians(lat))))
+    lats = np.array([north, lat, lat + 0.2])
+    lons = np.array([lon, east, lon])
+    positions, distances = GridIndex(lats, lons).query(lat, lon, radius_meters=5000)
+    assert sorted(positions.tolist()) == [0, 1]
+    assert np.all(distances <= 5000)
+
+
+def test_matches_brute_force():
+    rng = np.random.default_rng(7)
+    lats = rng.uniform(18.4, 18.7, 5000)
+    lons = rng.uniform(73.7, 74.0, 5000)
+    index = GridIndex(lats, lons)
+    for lat, lon in rng.uniform((18.3, 73.6), (18.8, 74.1), (50, 2)):
+        positions, _ = index.query(lat, lon, radius_meters=3000)
+        assert sorted(positions.tolist()) == sorted(brute_force(lat, lon, lats, lons, 3000).tolist())
+        positions, _ = index.query(lat, lon, limit=10)
+        expected = brute_force(lat, lon, lats, lons, limit=10)
+        np.testing.assert_allclose(haversine_distance(lat, lon, lats[positions], lons[positions]),
+                                   haversine_distance(lat, lon, lats[expected], lons[expected]))
+
+
+def test_nearest_from_far_away():
+    rng = np.random.default_rng(3)
+    lats = rng.uniform(18.4, 18.7, 10000)
+    lons = rng.uniform(73.7, 74.0, 10000)
+    positions, _ = GridIndex(lats, lons).query(40.0, -74.0, limit=5)
+    expected = brute_force(40.0, -74.0, lats, lons, limit=5)
+    assert positions.tolist() == expected.tolist()
+
+
+def test_nearest_at_the_edge_of_the_kth_box():
+    lat, lon = 18.56 - 0.04493, 73.85
+    north = lat + math.degrees(4997.5 / EARTH_RADIUS_METERS)
+    lats = np.array([north, lat - 0.2])
+    lons = np.array([lon, lon])
+    positions, _ = GridIndex(lats, lons).query(lat, lon, limit=1)
+    assert positions.tolist() == [0]